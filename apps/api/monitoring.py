@@ -323,4 +323,34 @@ class APIPerformance:
             
         except Exception as e:
             logger.error(f"Error getting endpoint performance: {e}")
-            return {} 
\ No newline at end of file
+            return {} 
+    
+    @staticmethod
+    def get_game_db_performance():
+        """Obtém latência, linhas e erros por método de query do banco do jogo"""
+        try:
+            from apps.lineage.server.metrics import query_metrics
+            
+            report = query_metrics.report(slow_limit=0)
+            return {
+                'workers': report['workers'],
+                'buckets_ms': report['buckets_ms'],
+                'queries': report['queries'],
+                'counters': report['counters'],
+            }
+            
+        except Exception as e:
+            logger.error(f"Error getting game db performance: {e}")
+            return {}
+    
+    @staticmethod
+    def get_game_db_slow_queries(limit=10):
+        """Obtém as instruções mais lentas do banco do jogo (com EXPLAIN, se capturado)"""
+        try:
+            from apps.lineage.server.metrics import query_metrics
+            
+            return query_metrics.report(slow_limit=limit)['slow_queries']
+            
+        except Exception as e:
+            logger.error(f"Error getting game db slow queries: {e}")
+            return []
@@ -0,0 +1,51 @@
+"""
+Chaves de cache das views públicas da API, nos mesmos formatos e tempos
+de `views.py` (com o `limit` padrão de 10 dos rankings).
+"""
+from apps.lineage.server.prewarm import register_prewarm, warm_key
+from apps.lineage.server.rankings import get_ranking, ranking_params
+from utils.dynamic_import import get_query_class
+
+LineageStats = get_query_class("LineageStats")
+
+DEFAULT_LIMIT = 10
+
+RANKING_KEYS = {
+    "api_top_pvp": "pvp",
+    "api_top_pk": "pk",
+    "api_top_clan": "clans",
+    "api_top_rich": "adena",
+    "api_top_online": "online",
+    "api_top_level": "level",
+}
+
+# chave -> (método do LineageStats, tempo em segundos)
+STATUS_KEYS = {
+    "api_players_online": ("players_online", 30),
+    "api_olympiad_ranking": ("olympiad_ranking", 300),
+    "api_olympiad_all_heroes": ("olympiad_all_heroes", 300),
+    "api_olympiad_current_heroes": ("olympiad_current_heroes", 300),
+    "api_grandboss_status": ("grandboss_status", 60),
+    "api_siege": ("siege", 300),
+    "api_raidboss_status": ("raidboss_status", 60),
+}
+
+
+def _register_ranking(prefix, ranking):
+    key = f"{prefix}_{DEFAULT_LIMIT}"
+    register_prewarm(f"api:{key}")(
+        lambda: warm_key(key, 60, lambda: get_ranking(ranking, limit=DEFAULT_LIMIT, **ranking_params(ranking)))
+    )
+
+
+def _register_status(key, method, timeout):
+    def load():
+        return getattr(LineageStats, method)() if hasattr(LineageStats, method) else []
+    register_prewarm(f"api:{key}")(lambda: warm_key(key, timeout, load))
+
+
+for _prefix, _ranking in RANKING_KEYS.items():
+    _register_ranking(_prefix, _ranking)
+
+for _key, (_method, _timeout) in STATUS_KEYS.items():
+    _register_status(_key, _method, _timeout)
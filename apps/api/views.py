@@ -3,7 +3,7 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.throttling import AnonRateThrottle
 from rest_framework.generics import GenericAPIView, ListAPIView, RetrieveAPIView
-from rest_framework.permissions import IsAuthenticated, AllowAny, IsAuthenticatedOrReadOnly
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny, IsAuthenticatedOrReadOnly
 from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from rest_framework_simplejwt.tokens import RefreshToken
@@ -31,6 +31,8 @@ from .schema import ServerAPISchema, AuthAPISchema, UserAPISchema, SearchAPISche
 
 from utils.dynamic_import import get_query_class
 from apps.lineage.server.decorators import endpoint_enabled
+from apps.lineage.server.rankings import adena_params, get_ranking
+from apps.lineage.server.search_index import SearchIndex
 from apps.lineage.server.models import ApiEndpointToggle
 from apps.main.notification.models import PushSubscription
 from rest_framework_simplejwt.authentication import JWTAuthentication
@@ -121,7 +123,7 @@ class TopPvPView(GenericAPIView):
             cached_data = cache.get(cache_key)
             
             if cached_data is None:
-                data = LineageStats.top_pvp(limit=limit)
+                data = get_ranking("pvp", limit=limit)
                 cache.set(cache_key, data, 60)  # Cache por 1 minuto
             else:
                 data = cached_data
@@ -162,7 +164,7 @@ class TopPKView(GenericAPIView):
             cached_data = cache.get(cache_key)
             
             if cached_data is None:
-                data = LineageStats.top_pk(limit=limit)
+                data = get_ranking("pk", limit=limit)
                 cache.set(cache_key, data, 60)
             else:
                 data = cached_data
@@ -203,7 +205,7 @@ class TopClanView(GenericAPIView):
             cached_data = cache.get(cache_key)
             
             if cached_data is None:
-                data = LineageStats.top_clans(limit=limit)
+                data = get_ranking("clans", limit=limit)
                 cache.set(cache_key, data, 60)
             else:
                 data = cached_data
@@ -266,7 +268,7 @@ class TopRichView(GenericAPIView):
             cached_data = cache.get(cache_key)
             
             if cached_data is None:
-                data = LineageStats.top_adena(limit=limit)
+                data = get_ranking("adena", limit=limit, **adena_params())
                 cache.set(cache_key, data, 60)
             else:
                 data = cached_data
@@ -307,7 +309,7 @@ class TopOnlineView(GenericAPIView):
             cached_data = cache.get(cache_key)
             
             if cached_data is None:
-                data = LineageStats.top_online(limit=limit)
+                data = get_ranking("online", limit=limit)
                 cache.set(cache_key, data, 60)
             else:
                 data = cached_data
@@ -348,7 +350,7 @@ class TopLevelView(GenericAPIView):
             cached_data = cache.get(cache_key)
             
             if cached_data is None:
-                data = LineageStats.top_level(limit=limit)
+                data = get_ranking("level", limit=limit)
                 cache.set(cache_key, data, 60)
             else:
                 data = cached_data
@@ -1008,9 +1010,8 @@ class CharacterSearchView(APIView):
             cached_data = cache.get(cache_key)
             
             if cached_data is None:
-                # Aqui você implementaria a busca real no banco do jogo
-                # Por enquanto, retorna dados mock
-                data = LineageStats.search_characters(query) if hasattr(LineageStats, 'search_characters') else []
+                # Índice local sincronizado pelo Celery (sem LIKE no banco do jogo)
+                data = SearchIndex.search_characters(query)
                 cache.set(cache_key, data, 300)  # Cache por 5 minutos
             else:
                 data = cached_data
@@ -1050,8 +1051,7 @@ class ItemSearchView(APIView):
             cached_data = cache.get(cache_key)
             
             if cached_data is None:
-                # Implementar busca real de itens
-                data = LineageStats.search_items(query) if hasattr(LineageStats, 'search_items') else []
+                data = SearchIndex.search_items(query)
                 cache.set(cache_key, data, 600)  # Cache por 10 minutos
             else:
                 data = cached_data
@@ -1085,7 +1085,7 @@ class ClanDetailView(APIView):
             
             if cached_data is None:
                 # Busca dados do clã
-                data = LineageStats.get_clan_details(clan_name) if hasattr(LineageStats, 'get_clan_details') else None
+                data = SearchIndex.get_clan_details(clan_name)
                 if data:
                     cache.set(cache_key, data, 300)  # Cache por 5 minutos
             else:
@@ -1457,7 +1457,7 @@ class DailyMetricsView(APIView):
 )
 class PerformanceMetricsView(APIView):
     """View para métricas de performance"""
-    permission_classes = [IsAuthenticated]  # Apenas usuários autenticados
+    permission_classes = [IsAdminUser]  # Métricas do banco do jogo: apenas administradores
     
     def get(self, request):
         """Retorna métricas de performance por endpoint"""
@@ -1477,6 +1477,7 @@ class PerformanceMetricsView(APIView):
             return Response({
                 'success': True,
                 'data': performance,
+                'game_db': APIPerformance.get_game_db_performance(),
                 'timestamp': timezone.now().isoformat(),
             })
             
@@ -1491,7 +1492,7 @@ class PerformanceMetricsView(APIView):
 @endpoint_enabled('slow_queries')
 @extend_schema(
     summary="Queries Lentas",
-    description="Retorna as queries mais lentas da API",
+    description="Retorna as requisições mais lentas da API e as instruções mais lentas do banco do jogo",
     parameters=[
         OpenApiParameter(
             name="limit",
@@ -1510,7 +1511,7 @@ class PerformanceMetricsView(APIView):
 )
 class SlowQueriesView(APIView):
     """View para queries lentas"""
-    permission_classes = [IsAuthenticated]  # Apenas usuários autenticados
+    permission_classes = [IsAdminUser]  # Métricas do banco do jogo: apenas administradores
     
     def get(self, request):
         """Retorna as queries mais lentas"""
@@ -1529,12 +1530,15 @@ class SlowQueriesView(APIView):
             limit = min(limit, 50)  # Limita a 50 queries
             
             slow_queries = APIPerformance.get_slow_queries(limit)
+            game_db_slow_queries = APIPerformance.get_game_db_slow_queries(limit)
             
             return Response({
                 'success': True,
                 'data': {
                     'slow_queries': slow_queries,
                     'count': len(slow_queries),
+                    'game_db_slow_queries': game_db_slow_queries,
+                    'game_db_count': len(game_db_slow_queries),
                     'limit': limit,
                 },
                 'timestamp': timezone.now().isoformat(),
@@ -2,6 +2,7 @@ from django.db import models
 from django.utils.translation import gettext_lazy as _
 from apps.main.home.models import User
 from core.models import BaseModel
+from utils.config_cache import register_config
 from django.templatetags.static import static
 import random
 from django.utils import timezone
@@ -64,6 +65,9 @@ class GameConfig(BaseModel):
         return f"GameConfig (fail_chance={self.fail_chance}%)"
 
 
+register_config(GameConfig)
+
+
 class Bag(BaseModel):
     user = models.OneToOneField(User, related_name='bag', on_delete=models.CASCADE, verbose_name=_("User"))
     created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Created At"))
@@ -9,6 +9,7 @@ from decimal import Decimal
 from apps.lineage.wallet.models import Wallet
 from apps.lineage.wallet.signals import aplicar_transacao
 from apps.lineage.inventory.models import Inventory, InventoryLog, InventoryItem
+from utils.config_cache import get_config
 from ..services.box_opening import open_box
 from ..services.box_populate import populate_box_with_items
 from django.db import transaction
@@ -71,7 +72,7 @@ def spin_ajax(request):
 
     # Configurável via GameConfig
     from ..models import GameConfig
-    cfg = GameConfig.objects.first()
+    cfg = get_config(GameConfig)
     fail_chance = cfg.fail_chance if cfg else 20  # fallback para 20%
     total_weight = sum(p.weight for p in prizes)
     fail_weight = total_weight * (fail_chance / (100 - fail_chance))
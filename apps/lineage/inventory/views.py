@@ -1,7 +1,7 @@
 from django.shortcuts import get_object_or_404, redirect, render
 from apps.main.home.decorator import conditional_otp_required
 from django.contrib import messages
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from django.contrib.auth import authenticate
 from django.utils.translation import gettext as _
 
@@ -12,6 +12,8 @@ from apps.main.home.models import PerfilGamer
 
 from .models import Inventory, InventoryItem, BlockedServerItem, InventoryLog
 from apps.lineage.server.database import LineageDB
+from apps.lineage.server.adena_aggregator import AdenaAggregator
+from apps.lineage.server.delivery import enqueue_delivery, new_idempotency_key
 from utils.dynamic_import import get_query_class
 from django.core.paginator import Paginator
 from django.http import JsonResponse
@@ -113,6 +115,7 @@ def retirar_item_servidor(request):
         if not success:
             messages.error(request, 'Falha ao remover o item do jogo.')
             return redirect(f"{request.path}?char_id={char_id}")
+        AdenaAggregator.mark_dirty(personagem[0]['char_name'])
         
         # Localiza ou cria o inventário online do personagem
         inventory, created = Inventory.objects.get_or_create(
@@ -203,37 +206,57 @@ def inserir_item_servidor(request, char_name, item_id):
                 messages.error(request, 'O personagem precisa estar offline.')
                 return redirect(request.path)
 
-        success = TransferFromWalletToChar.insert_coin(personagem[0]['char_name'], item_id, quantity, item.enchant)
-        if not success:
-            messages.error(request, 'Falha ao inserir o item no servidor.')
-            return redirect(request.path)
+        try:
+            with transaction.atomic():
+                item = InventoryItem.objects.select_for_update().get(pk=item.pk)
+                if item.quantity < quantity:
+                    raise ValueError('Quantidade insuficiente no inventário.')
 
-        item.quantity -= quantity
+                item.quantity -= quantity
 
-        if item.quantity == 0:
-            item.delete()
-        else:
-            item.save()
+                if item.quantity == 0:
+                    item.delete()
+                else:
+                    item.save()
 
-        # Registrar o log de inserção
-        InventoryLog.objects.create(
-            user=request.user,
-            inventory=inventory,
-            item_id=item_id,
-            item_name=item.item_name,
-            enchant=item.enchant,
-            quantity=quantity,
-            acao='INSERIU_NO_JOGO',
-            origem='Inventário Online',
-            destino=personagem[0]['char_name']
-        )
+                # A baixa no inventário e a entrega na fila ficam gravadas juntas; o worker grava no jogo
+                enqueue_delivery(
+                    user=request.user,
+                    char_name=personagem[0]['char_name'],
+                    item_id=item_id,
+                    amount=quantity,
+                    enchant=item.enchant,
+                    origem='inventory',
+                    estorno={'inventory_id': inventory.pk, 'item_name': item.item_name},
+                    idempotency_key=request.POST.get('idempotency_key') or None,
+                )
+
+                # Registrar o log de inserção
+                InventoryLog.objects.create(
+                    user=request.user,
+                    inventory=inventory,
+                    item_id=item_id,
+                    item_name=item.item_name,
+                    enchant=item.enchant,
+                    quantity=quantity,
+                    acao='INSERIU_NO_JOGO',
+                    origem='Inventário Online',
+                    destino=personagem[0]['char_name']
+                )
+        except IntegrityError:
+            messages.warning(request, 'Esta inserção já foi registrada.')
+            return redirect('inventory:inventario_dashboard')
+        except (InventoryItem.DoesNotExist, ValueError):
+            messages.error(request, 'Quantidade insuficiente no inventário.')
+            return redirect(request.path)
 
-        messages.success(request, f'{quantity}x {item.item_name} inserido no servidor com sucesso!')
+        messages.success(request, f'{quantity}x {item.item_name} enviado ao servidor; a entrega no jogo é feita em instantes.')
         return redirect('inventory:inventario_dashboard')
 
     return render(request, 'pages/inserir_item_direct.html', {
         'personagem': personagem[0],
         'item': item,
+        'idempotency_key': new_idempotency_key(),
     })
 
 
@@ -0,0 +1,302 @@
+import os
+import time
+import uuid
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from apps.lineage.server.database import LineageDB
+from apps.lineage.server.metrics import query_metrics
+from apps.lineage.server.utils.cache import get_redis_client
+from utils.dynamic_import import get_query_class
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "lineage_adena"
+# Quantos personagens por consulta na tabela `items` (IN da lista de donos)
+CHUNK_SIZE = int(os.getenv("LINEAGE_ADENA_CHUNK_SIZE", "500"))
+# Reconstrução completa periódica: limpa personagens apagados e corrige o que
+# o incremental não enxerga (ex.: item movido por GM com o personagem offline)
+FULL_REBUILD_INTERVAL = int(os.getenv("LINEAGE_ADENA_FULL_REBUILD_INTERVAL", "86400"))
+LOCK_TTL = int(os.getenv("LINEAGE_ADENA_LOCK_TTL", "900"))
+# Personagens marcados pelo painel (insert_coin/remove_ingame_coin) por rodada
+DIRTY_BATCH = 5000
+
+# `lastAccess` existe em todos os dialetos e só cresce; o valor lido antes de
+# varrer os personagens vira a marca d'água da próxima rodada
+SQL_HIGH_WATER_MARK = "SELECT MAX(lastAccess) AS hwm FROM characters"
+
+
+def _keys() -> Tuple[str, str, str, str, str]:
+    return (
+        f"{KEY_PREFIX}:z",      # dono -> patrimônio (score do ranking)
+        f"{KEY_PREFIX}:h",      # dono -> "adena:itens_bonus" (valores exatos)
+        f"{KEY_PREFIX}:meta",   # parâmetros, marca d'água, datas
+        f"{KEY_PREFIX}:dirty",  # nomes de personagens alterados pelo painel
+        f"{KEY_PREFIX}:lock",
+    )
+
+
+def params_signature(adn_billion_item: int, value_item: int) -> str:
+    # Sem item bônus o valor dele não altera o total
+    if not adn_billion_item:
+        return "0:0"
+    return f"{int(adn_billion_item)}:{int(value_item)}"
+
+
+def wealth(adena: int, bonus: int, value_item: int) -> int:
+    return int(adena) + int(bonus) * int(value_item)
+
+
+def _chunks(items: List, size: int) -> Iterable[List]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _select(query: str, params: Dict) -> List[Dict]:
+    """SELECT que falha de verdade: zerar o patrimônio por erro de conexão seria pior que não atualizar."""
+    return LineageDB().select_or_raise(query, params)
+
+
+def merge_top_rows(owner_ids: List[str], totals: List[Optional[bytes]], details: List[Dict],
+                   value_item: int) -> List[Dict]:
+    """
+    Junta a janela do sorted set com os dados atuais dos personagens, no mesmo
+    formato e ordem do `top_adena` em SQL. Donos sem detalhes (apagados ou que
+    viraram GM) ficam de fora.
+    """
+    by_owner = {str(row["owner_id"]): row for row in details}
+    rows = []
+    for owner_id, raw in zip(owner_ids, totals):
+        detail = by_owner.get(owner_id)
+        if detail is None or raw is None:
+            continue
+        adena, bonus = (raw.decode() if isinstance(raw, bytes) else raw).split(":")
+        row = {key: value for key, value in dict(detail).items() if key != "owner_id"}
+        row["adenas"] = wealth(adena, bonus, value_item)
+        rows.append(row)
+    rows.sort(key=lambda row: (-row["adenas"], -(row.get("onlinetime") or 0), row.get("char_name") or ""))
+    return rows
+
+
+class AdenaAggregator:
+    """
+    Patrimônio (adena + item bônus * valor) por personagem mantido no Redis,
+    para que o `top_adena` não precise somar a tabela `items` inteira a cada
+    geração do ranking.
+
+    `refresh()` (task `atualizar_agregado_adena`) recalcula só os personagens
+    com `lastAccess` acima da marca d'água da rodada anterior, os que estão
+    online e os marcados pelo painel com `mark_dirty()`; a reconstrução
+    completa percorre os personagens em blocos de CHUNK_SIZE pela chave
+    primária e troca o agregado de uma vez (RENAME dentro de MULTI/EXEC).
+    """
+
+    @staticmethod
+    def _stats():
+        return get_query_class("LineageStats")
+
+    @staticmethod
+    def _owner_totals(stats, owner_ids: List[int], adn_billion_item: int) -> Dict[str, str]:
+        totals = {}
+        for chunk in _chunks(owner_ids, CHUNK_SIZE):
+            rows = _select(stats.SQL_ADENA_OWNER_TOTALS, {
+                "owner_ids": chunk,
+                "adn_billion_item": adn_billion_item,
+            })
+            for row in rows:
+                adena, bonus = int(row["adena"] or 0), int(row["bonus"] or 0)
+                if adena or bonus:
+                    totals[str(row["owner_id"])] = f"{adena}:{bonus}"
+        return totals
+
+    @staticmethod
+    def _write(client, zkey: str, hkey: str, owner_ids: List[int], totals: Dict[str, str], value_item: int):
+        pipe = client.pipeline(transaction=False)
+        for owner_id in owner_ids:
+            member = str(owner_id)
+            raw = totals.get(member)
+            if raw is None:
+                # Sem adena nem item bônus: não ocupa memória no ranking
+                pipe.zrem(zkey, member)
+                pipe.hdel(hkey, member)
+            else:
+                adena, bonus = raw.split(":")
+                pipe.zadd(zkey, {member: float(wealth(adena, bonus, value_item))})
+                pipe.hset(hkey, member, raw)
+        pipe.execute()
+
+    @staticmethod
+    def _high_water_mark() -> int:
+        rows = _select(SQL_HIGH_WATER_MARK, {})
+        return int(rows[0]["hwm"] or 0) if rows else 0
+
+    @staticmethod
+    def mark_dirty(char_name: str):
+        """Marca um personagem alterado pelo painel (ex.: moeda entregue com ele offline)."""
+        client = get_redis_client()
+        if client is None or not char_name:
+            return
+        try:
+            client.sadd(_keys()[3], char_name)
+        except Exception as e:
+            logger.warning(f"Erro ao marcar personagem no agregado de adena: {e}")
+
+    @staticmethod
+    def info() -> Dict[str, str]:
+        client = get_redis_client()
+        if client is None:
+            return {}
+        meta = client.hgetall(_keys()[2])
+        return {k.decode(): v.decode() for k, v in meta.items()}
+
+    @staticmethod
+    def refresh(adn_billion_item: int = 0, value_item: int = 1000000, full: bool = False) -> Dict:
+        """
+        Atualiza o agregado. Faz a reconstrução completa se ainda não existir,
+        se os parâmetros do item bônus mudaram, se passou FULL_REBUILD_INTERVAL
+        ou se `full=True`; senão, só o incremental.
+        """
+        client = get_redis_client()
+        if client is None:
+            return {}
+        zkey, hkey, metakey, dirtykey, lockkey = _keys()
+        token = uuid.uuid4().hex
+        if not client.set(lockkey, token, nx=True, ex=LOCK_TTL):
+            return {"mode": "locked"}
+
+        try:
+            meta = AdenaAggregator.info()
+            signature = params_signature(adn_billion_item, value_item)
+            stale = time.time() - float(meta.get("built_at", 0)) > FULL_REBUILD_INTERVAL
+            if full or stale or meta.get("params") != signature:
+                return AdenaAggregator._rebuild(client, adn_billion_item, value_item)
+            return AdenaAggregator._incremental(client, meta, adn_billion_item, value_item)
+        finally:
+            if client.get(lockkey) == token.encode():
+                client.delete(lockkey)
+
+    @staticmethod
+    def _incremental(client, meta: Dict[str, str], adn_billion_item: int, value_item: int) -> Dict:
+        stats = AdenaAggregator._stats()
+        zkey, hkey, metakey, dirtykey, _ = _keys()
+        started = time.perf_counter()
+
+        hwm = AdenaAggregator._high_water_mark()
+        dirty = [name.decode() for name in client.spop(dirtykey, DIRTY_BATCH) or []]
+        try:
+            rows = _select(stats.SQL_ADENA_CHANGED_OWNERS, {
+                "since": int(meta.get("hwm", 0)),
+                # Lista vazia no IN não é SQL válido no MySQL
+                "char_names": dirty or [""],
+            })
+            owner_ids = [row["owner_id"] for row in rows]
+            totals = AdenaAggregator._owner_totals(stats, owner_ids, adn_billion_item)
+        except Exception:
+            if dirty:
+                client.sadd(dirtykey, *dirty)
+            raise
+
+        AdenaAggregator._write(client, zkey, hkey, owner_ids, totals, value_item)
+        client.hset(metakey, mapping={"hwm": max(hwm, int(meta.get("hwm", 0))), "updated_at": time.time()})
+        query_metrics.incr("adena.incremental_owners", len(owner_ids))
+        return {
+            "mode": "incremental",
+            "owners": len(owner_ids),
+            "seconds": round(time.perf_counter() - started, 2),
+        }
+
+    @staticmethod
+    def _rebuild(client, adn_billion_item: int, value_item: int) -> Dict:
+        stats = AdenaAggregator._stats()
+        zkey, hkey, metakey, _, _ = _keys()
+        started = time.perf_counter()
+
+        # Lida antes da varredura: quem mudar durante ela entra no próximo incremental
+        hwm = AdenaAggregator._high_water_mark()
+
+        token = uuid.uuid4().hex[:8]
+        tmp_z, tmp_h = f"{zkey}:tmp:{token}", f"{hkey}:tmp:{token}"
+        after, scanned, holders = 0, 0, 0
+        try:
+            while True:
+                page = _select(stats.SQL_ADENA_OWNERS_PAGE, {"after": after, "limit": CHUNK_SIZE})
+                if not page:
+                    break
+                owner_ids = [row["owner_id"] for row in page]
+                after = owner_ids[-1]
+                scanned += len(owner_ids)
+                totals = AdenaAggregator._owner_totals(stats, owner_ids, adn_billion_item)
+                if totals:
+                    AdenaAggregator._write(client, tmp_z, tmp_h, list(totals), totals, value_item)
+                    client.expire(tmp_z, LOCK_TTL)
+                    client.expire(tmp_h, LOCK_TTL)
+                    holders += len(totals)
+                if len(page) < CHUNK_SIZE:
+                    break
+        except Exception:
+            client.delete(tmp_z, tmp_h)
+            raise
+
+        pipe = client.pipeline(transaction=True)
+        if holders:
+            pipe.rename(tmp_z, zkey)
+            pipe.rename(tmp_h, hkey)
+            pipe.persist(zkey)
+            pipe.persist(hkey)
+        else:
+            pipe.delete(zkey, hkey)
+        pipe.delete(metakey)
+        now = time.time()
+        pipe.hset(metakey, mapping={
+            "params": params_signature(adn_billion_item, value_item),
+            "hwm": hwm,
+            "built_at": now,
+            "updated_at": now,
+            "owners": holders,
+        })
+        pipe.execute()
+        query_metrics.incr("adena.rebuilds")
+        return {
+            "mode": "rebuild",
+            "owners": scanned,
+            "holders": holders,
+            "seconds": round(time.perf_counter() - started, 2),
+        }
+
+    @staticmethod
+    def top(limit: int = 10, adn_billion_item: int = 0, value_item: int = 1000000) -> Optional[List[Dict]]:
+        """
+        Top de adena a partir do agregado, ou None se ele não existir (ou foi
+        montado com outro item bônus) e o chamador deve usar o SQL do dialeto.
+        """
+        client = get_redis_client()
+        if client is None:
+            return None
+        zkey, hkey, metakey, _, _ = _keys()
+        try:
+            if client.hget(metakey, "params") != params_signature(adn_billion_item, value_item).encode():
+                return None
+
+            stats = AdenaAggregator._stats()
+            # Folga para personagens apagados/GMs e empates na borda da janela
+            window = limit * 2 + 10
+            start, rows = 0, []
+            while True:
+                owner_ids = [member.decode() for member in client.zrange(zkey, start, start + window - 1, desc=True)]
+                if not owner_ids:
+                    break
+                totals = client.hmget(hkey, owner_ids)
+                details = _select(stats.SQL_ADENA_OWNER_DETAILS, {"owner_ids": [int(o) for o in owner_ids]})
+                rows.extend(merge_top_rows(owner_ids, totals, details, value_item))
+                if len(rows) >= limit or len(owner_ids) < window:
+                    break
+                start += window
+        except Exception as e:
+            logger.warning(f"Erro ao ler agregado de adena: {e}")
+            return None
+
+        if len(rows) < limit:
+            # Poucos personagens com adena: o SQL original também lista quem tem zero
+            return None
+        rows.sort(key=lambda row: (-row["adenas"], -(row.get("onlinetime") or 0), row.get("char_name") or ""))
+        return rows[:limit]
@@ -105,6 +105,21 @@ class ActiveAdenaExchangeItemAdmin(BaseModelAdmin):
     search_fields = ('item_type',)
 
 
+@admin.register(ObjectIdRange)
+class ObjectIdRangeAdmin(BaseModelAdmin):
+    list_display = ('name', 'next_id', 'updated_at')
+    # Alterado só pelo alocador (SELECT ... FOR UPDATE); editar à mão pode repetir ids
+    readonly_fields = ('name', 'next_id')
+
+
+@admin.register(GameDelivery)
+class GameDeliveryAdmin(BaseModelAdmin):
+    list_display = ('char_name', 'user', 'item_id', 'amount', 'origem', 'status', 'attempts', 'created_at', 'delivered_at')
+    list_filter = ('status', 'origem')
+    search_fields = ('char_name', 'account_name', 'user__username', 'idempotency_key')
+    readonly_fields = ('idempotency_key', 'claimed_by', 'claimed_at', 'delivered_at', 'last_error')
+
+
 @admin.register(Apoiador)
 class ApoiadorAdmin(BaseModelAdmin):
     list_display = ('nome_publico', 'user', 'ativo')
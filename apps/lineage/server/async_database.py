@@ -0,0 +1,155 @@
+import os
+import time
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from urllib.parse import quote_plus
+
+from apps.lineage.server.database import LineageDB
+from apps.lineage.server.metrics import query_metrics, resolve_caller_label
+
+load_dotenv()
+
+
+class AsyncLineageDB:
+    """
+    Cliente assíncrono do banco Lineage para views ASGI e consumers do Channels.
+
+    Mesma interface do `LineageDB` (select/insert/update/delete/execute_raw), só
+    que com `await`, sobre o engine asyncio do SQLAlchemy (driver aiomysql), com
+    pool e timeout por query próprios. O pool do aiomysql pertence a um event
+    loop, por isso há um engine por loop (o daphne usa um só; `async_to_sync`
+    cria um novo a cada chamada). As instruções entram nas mesmas métricas do
+    `LineageDB` (comando `lineage_db_stats`).
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(AsyncLineageDB, cls).__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self.enabled = os.getenv("LINEAGE_DB_ENABLED", "false").lower() == "true"
+        self._engines: Dict[asyncio.AbstractEventLoop, AsyncEngine] = {}
+        self._engines_lock = threading.Lock()
+        self._query_timeout_seconds: int = int(os.getenv("LINEAGE_DB_ASYNC_QUERY_TIMEOUT", os.getenv("LINEAGE_DB_READ_TIMEOUT", "3")))
+        self.metrics = query_metrics
+
+        self._initialized = True
+
+    def _create_engine(self) -> AsyncEngine:
+        user = os.getenv("LINEAGE_DB_USER")
+        password = os.getenv("LINEAGE_DB_PASSWORD")
+        host = os.getenv("LINEAGE_DB_HOST")
+        port = os.getenv("LINEAGE_DB_PORT", "3306")
+        dbname = os.getenv("LINEAGE_DB_NAME")
+
+        # 🔒 Codifica a senha pra evitar erro com caracteres especiais
+        safe_password = quote_plus(password)
+
+        url = f"mysql+aiomysql://{user}:{safe_password}@{host}:{port}/{dbname}"
+
+        return create_async_engine(
+            url,
+            echo=False,
+            pool_pre_ping=True,
+            pool_recycle=180,
+            pool_size=int(os.getenv("LINEAGE_DB_ASYNC_POOL_SIZE", "5")),
+            max_overflow=int(os.getenv("LINEAGE_DB_ASYNC_MAX_OVERFLOW", "10")),
+            pool_timeout=int(os.getenv("LINEAGE_DB_POOL_TIMEOUT", "3")),
+            connect_args={
+                "connect_timeout": int(os.getenv("LINEAGE_DB_CONNECT_TIMEOUT", "3")),
+            },
+        )
+
+    def _engine(self) -> Optional[AsyncEngine]:
+        loop = asyncio.get_running_loop()
+        with self._engines_lock:
+            engine = self._engines.get(loop)
+            if engine is not None:
+                return engine
+            # Loops já fechados (ex.: de chamadas `async_to_sync`) não voltam: solta os engines deles
+            for old_loop in [old for old in self._engines if old.is_closed()]:
+                del self._engines[old_loop]
+            try:
+                engine = self._engines[loop] = self._create_engine()
+                print("✅ Conectado ao banco Lineage (async) com SQLAlchemy")
+            except Exception as e:
+                print(f"❌ Falha ao conectar ao banco Lineage (async): {e}")
+                return None
+            return engine
+
+    def _record_query(self, query: str, params: Dict[str, Any], started: float, rows: Optional[int] = None,
+                      error: bool = False):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        try:
+            self.metrics.record(resolve_caller_label(), query, params, elapsed_ms, rows=rows, error=error)
+        except Exception as e:
+            print(f"⚠️ Falha ao registrar métricas da query: {e}")
+
+    async def _execute(self, query: str, params: Dict[str, Any], write: bool, fetch: Optional[str] = None):
+        if not self.enabled:
+            return None
+        engine = self._engine()
+        if not engine:
+            print("⚠️ Sem conexão com o banco")
+            return None
+        stmt, params = LineageDB._prepare(query, params)
+        started = time.perf_counter()
+        try:
+            context = engine.begin() if write else engine.connect()
+            async with context as conn:
+                result = await asyncio.wait_for(conn.execute(stmt, params), timeout=self._query_timeout_seconds)
+                value = result.mappings().all() if fetch == "rows" else (getattr(result, fetch) if fetch else True)
+            self._record_query(query, params, started, rows=result.rowcount)
+            return value
+        except asyncio.TimeoutError:
+            self._record_query(query, params, started, error=True)
+            print(f"❌ Tempo esgotado na execução ({self._query_timeout_seconds}s)")
+            return None
+        except SQLAlchemyError as e:
+            self._record_query(query, params, started, error=True)
+            print(f"❌ Erro na execução: {e}")
+            return None
+
+    def is_connected(self) -> bool:
+        """Mesmo estado do `LineageDB`: o circuit breaker mantido pelo heartbeat (O(1))."""
+        return self.enabled and LineageDB().is_connected()
+
+    async def select(self, query: str, params: Dict[str, Any] = {}) -> List[Dict]:
+        if not self.enabled:
+            return []
+        rows = await self._execute(query, params, write=False, fetch="rows")
+        return rows if rows is not None else []
+
+    async def insert(self, query: str, params: Dict[str, Any] = {}) -> Optional[int]:
+        return await self._execute(query, params, write=True, fetch="lastrowid")
+
+    async def update(self, query: str, params: Dict[str, Any] = {}) -> Optional[int]:
+        return await self._execute(query, params, write=True, fetch="rowcount")
+
+    async def delete(self, query: str, params: Dict[str, Any] = {}) -> Optional[int]:
+        return await self._execute(query, params, write=True, fetch="rowcount")
+
+    async def execute_raw(self, query: str, params: Dict[str, Any] = {}) -> bool:
+        if not self.enabled:
+            return False
+        return await self._execute(query, params, write=True) is not None
+
+    async def dispose(self):
+        """Fecha o pool do event loop atual (ex.: no shutdown do daphne)."""
+        with self._engines_lock:
+            engine = self._engines.pop(asyncio.get_running_loop(), None)
+        if engine is not None:
+            await engine.dispose()
@@ -0,0 +1,51 @@
+from apps.lineage.server.async_database import AsyncLineageDB
+from apps.lineage.server.utils.cache import acached_lineage_call
+from utils.dynamic_import import get_query_class
+
+LineageStats = get_query_class("LineageStats")  # carrega a classe certa com base no .env
+
+
+def _ranking(sql):
+    async def run(limit=10):
+        return await AsyncLineageDB().select(sql, {"limit": limit})
+    return run
+
+
+async def _players_online():
+    return await AsyncLineageDB().select(LineageStats.SQL_PLAYERS_ONLINE)
+
+
+class AsyncLineageStats:
+    """
+    Variantes assíncronas dos métodos mais acessados de `LineageStats`
+    (jogadores online e rankings), para views ASGI e consumers do Channels.
+
+    Usam o SQL do dialeto configurado em LINEAGE_QUERY_MODULE e passam pelo
+    mesmo cache de `cache_lineage_result` que a versão síncrona (chave, TTLs,
+    single-flight e métricas), então o resultado calculado por um lado serve
+    ao outro.
+    """
+
+    @staticmethod
+    async def players_online():
+        return await acached_lineage_call(LineageStats.players_online, _players_online)
+
+    @staticmethod
+    async def top_pvp(limit=10):
+        return await acached_lineage_call(LineageStats.top_pvp, _ranking(LineageStats.SQL_TOP_PVP), limit=limit)
+
+    @staticmethod
+    async def top_pk(limit=10):
+        return await acached_lineage_call(LineageStats.top_pk, _ranking(LineageStats.SQL_TOP_PK), limit=limit)
+
+    @staticmethod
+    async def top_online(limit=10):
+        return await acached_lineage_call(LineageStats.top_online, _ranking(LineageStats.SQL_TOP_ONLINE), limit=limit)
+
+    @staticmethod
+    async def top_level(limit=10):
+        return await acached_lineage_call(LineageStats.top_level, _ranking(LineageStats.SQL_TOP_LEVEL), limit=limit)
+
+    @staticmethod
+    async def top_clans(limit=10):
+        return await acached_lineage_call(LineageStats.top_clans, _ranking(LineageStats.SQL_TOP_CLANS), limit=limit)
@@ -0,0 +1,53 @@
+from typing import Optional
+
+# Quantas subclasses a listagem de personagens mostra (subclass1..subclass3)
+SUBCLASS_SLOTS = 3
+
+
+def _slot_condition(slot: int, owner_column: str, owner: str, base_flag: Optional[str],
+                    rank_by: str, alias: str) -> str:
+    if base_flag is None:
+        # aCis/L2J: class_index já é a posição (0 = base, que vem de `characters`)
+        return f"{alias}{slot}.class_index = {slot}"
+    if slot == 0:
+        return f"{alias}0.{base_flag} = '1'"
+    # Sem class_index: a subclasse N é a menor em `rank_by` depois da N-1 (a ordem
+    # da chave primária que os `LIMIT n,1` sem ORDER BY devolviam); cada posição
+    # custa uma busca no índice (dono, rank_by), sem contar nem agrupar linhas
+    after = f" AND X.{rank_by} > {alias}{slot - 1}.{rank_by}" if slot > 1 else ""
+    return (
+        f"{alias}{slot}.{rank_by} = (SELECT MIN(X.{rank_by}) FROM character_subclasses AS X "
+        f"WHERE X.{owner_column} = {owner} AND X.{base_flag} = '0'{after})"
+    )
+
+
+def subclass_joins(owner_column: str, char_id_column: str = "obj_Id", base_flag: Optional[str] = None,
+                   rank_by: str = "class_id", slots: int = SUBCLASS_SLOTS, char_alias: str = "C",
+                   alias: str = "SUB") -> str:
+    """
+    Um `LEFT JOIN character_subclasses` por posição (`SUB1`, `SUB2`, ...) para o
+    personagem `char_alias`. Substitui as subqueries correlacionadas (duas por
+    subclasse, para cada personagem) dos `find_chars`: cada posição é uma única
+    busca na chave de `character_subclasses`, que devolve classe e nível juntos.
+
+    Com `base_flag` (coluna `isBase` dos schemas Classic/Lucera), a classe
+    base também sai da tabela (`SUB0`) e as subclasses são numeradas pela
+    ordem de `rank_by`; sem ele, a posição é o `class_index` (uma lacuna
+    deixada por subclasse removida continua vazia) e a base vem de
+    `characters.classid/level`.
+    """
+    owner = f"{char_alias}.{char_id_column}"
+    first_slot = 0 if base_flag else 1
+    return "\n            ".join(
+        f"LEFT JOIN character_subclasses AS {alias}{slot} ON {alias}{slot}.{owner_column} = {owner} "
+        f"AND {_slot_condition(slot, owner_column, owner, base_flag, rank_by, alias)}"
+        for slot in range(first_slot, slots + 1)
+    )
+
+
+def subclass_columns(alias: str = "SUB", include_base: bool = False, slots: int = SUBCLASS_SLOTS) -> str:
+    """Colunas das junções de `subclass_joins` para o SELECT do dialeto."""
+    columns = [f"{alias}0.class_id AS base_class", f"{alias}0.level AS base_level"] if include_base else []
+    for slot in range(1, slots + 1):
+        columns += [f"{alias}{slot}.class_id AS subclass{slot}", f"{alias}{slot}.level AS subclass{slot}_level"]
+    return ", ".join(columns)
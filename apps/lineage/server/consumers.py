@@ -0,0 +1,73 @@
+import asyncio
+import json
+import logging
+import os
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+
+from apps.lineage.server.async_database import AsyncLineageDB
+from apps.lineage.server.async_stats import AsyncLineageStats
+from apps.lineage.server.models import ApiEndpointToggle
+from utils.config_cache import get_config
+
+logger = logging.getLogger(__name__)
+
+# Intervalo (s) entre os envios do status; o cache das queries dura 300 s
+STATUS_INTERVAL = int(os.getenv("LINEAGE_WS_STATUS_INTERVAL", "30"))
+
+# Seção do payload -> (toggle em ApiEndpointToggle, método de AsyncLineageStats)
+RANKINGS = {
+    "top_pvp": ("top_pvp", AsyncLineageStats.top_pvp),
+    "top_pk": ("top_pk", AsyncLineageStats.top_pk),
+    "top_level": ("top_level", AsyncLineageStats.top_level),
+    "top_online": ("top_online", AsyncLineageStats.top_online),
+    "top_clans": ("top_clan", AsyncLineageStats.top_clans),
+}
+
+
+class ServerStatusConsumer(AsyncWebsocketConsumer):
+    """
+    Status público do servidor (jogadores online e rankings) enviado ao conectar
+    e a cada LINEAGE_WS_STATUS_INTERVAL segundos, sem prender thread do worker:
+    as queries usam o cliente assíncrono do banco do jogo e o mesmo cache das views.
+    """
+
+    async def connect(self):
+        await self.accept()
+        self.push_task = asyncio.ensure_future(self.push_status())
+
+    async def disconnect(self, close_code):
+        task = getattr(self, "push_task", None)
+        if task:
+            task.cancel()
+
+    async def receive(self, text_data):
+        # Qualquer mensagem do frontend pede um envio imediato
+        await self.send_status()
+
+    async def push_status(self):
+        while True:
+            try:
+                await self.send_status()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Erro ao enviar status do servidor: {e}")
+            await asyncio.sleep(STATUS_INTERVAL)
+
+    async def send_status(self):
+        await self.send(text_data=json.dumps(await self.get_status(), default=str))
+
+    async def get_status(self):
+        toggle = await database_sync_to_async(get_config)(ApiEndpointToggle)
+        if not AsyncLineageDB().is_connected():
+            return {"online": False}
+
+        status = {"online": True}
+        if toggle and toggle.players_online:
+            rows = await AsyncLineageStats.players_online()
+            status["players_online"] = rows[0].get("quant", 0) if rows else 0
+        for section, (field, method) in RANKINGS.items():
+            if toggle and getattr(toggle, field, False):
+                status[section] = await method(limit=10)
+        return status
@@ -1,15 +1,256 @@
 import os
+import sys
 import time
 import threading
-from typing import Any, Dict, Tuple, List, Optional
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Dict, Iterator, Tuple, List, Optional
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, text
-from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.engine import Engine, Result
+from sqlalchemy import bindparam, create_engine, text
+from sqlalchemy.exc import DBAPIError, OperationalError, SQLAlchemyError
+from sqlalchemy.engine import Connection, Engine, Result
+from sqlalchemy.sql.elements import TextClause
 from urllib.parse import quote_plus
 
+from apps.lineage.server.metrics import query_metrics, resolve_caller_label
+
 load_dotenv()
 
+
+class LineageResultCache:
+    """
+    Cache LRU com TTL por entrada para resultados do banco Lineage.
+
+    Limitado por quantidade de entradas e por bytes estimados, seguro para uso
+    concorrente (threads do ASGI/gunicorn) e com contadores de hit/miss/eviction.
+    """
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 16 * 1024 * 1024, default_ttl: int = 60):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._data: "OrderedDict[Tuple[str, Tuple[Any, ...]], Tuple[List[Dict], float, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def _estimate_size(rows: List[Dict]) -> int:
+        size = sys.getsizeof(rows)
+        for row in rows:
+            size += sys.getsizeof(row)
+            for key, value in row.items():
+                size += sys.getsizeof(key) + sys.getsizeof(value)
+        return size
+
+    def get(self, key: Tuple[str, Tuple[Any, ...]]) -> Optional[List[Dict]]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            data, expires_at, size = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def set(self, key: Tuple[str, Tuple[Any, ...]], data: List[Dict], ttl: Optional[int] = None):
+        ttl = self.default_ttl if ttl is None else ttl
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        size = self._estimate_size(data)
+        if size > self.max_bytes:
+            # Resultado maior que o orçamento inteiro: não vale a pena guardar
+            return
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (data, time.monotonic() + ttl, size)
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key: Tuple[str, Tuple[Any, ...]]):
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class LineageCircuitBreaker:
+    """
+    Circuit breaker (fechado/aberto/meio-aberto) para o banco Lineage.
+
+    - fechado: tráfego normal; falhas consecutivas acima do limite abrem o circuito
+    - aberto: `allow_request()` responde False sem tocar no banco até `reset_timeout`
+    - meio-aberto: após o `reset_timeout`, só uma requisição de teste é liberada; as
+      demais continuam recusadas até `record_success`/`record_failure` decidir se
+      fecha ou reabre (ou até outro `reset_timeout`, se o teste nunca reportar)
+
+    `changed_at` (epoch) permite sincronizar o estado entre workers via cache.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 2, reset_timeout: int = 20):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.changed_at = 0.0
+        self.probe_started = 0.0  # quando o teste do meio-aberto foi liberado (0 = nenhum)
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        now = time.time()
+        if state == self.OPEN and now - self.opened_at < self.reset_timeout:
+            return False
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if now - self.opened_at < self.reset_timeout:
+                    return False
+                self._set_state(self.HALF_OPEN)
+            if self.probe_started and now - self.probe_started < self.reset_timeout:
+                return False
+            self.probe_started = now
+            return True
+
+    def record_success(self) -> bool:
+        """Retorna True se o estado mudou."""
+        with self._lock:
+            self.failures = 0
+            if self.state != self.CLOSED:
+                self._set_state(self.CLOSED)
+                return True
+            return False
+
+    def record_failure(self) -> bool:
+        """Retorna True se o estado mudou."""
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                self._set_state(self.OPEN)
+                self.opened_at = time.time()
+                return True
+            return False
+
+    def apply_shared(self, state: str, changed_at: float, opened_at: float = 0.0):
+        """Aplica o estado publicado por outro worker, se for mais recente que o local."""
+        with self._lock:
+            if changed_at <= self.changed_at or state == self.state:
+                return
+            self.state = state
+            self.changed_at = changed_at
+            self.probe_started = 0.0
+            if state == self.OPEN:
+                self.opened_at = opened_at or changed_at
+            else:
+                self.failures = 0
+
+    def _set_state(self, state: str):
+        self.state = state
+        self.changed_at = time.time()
+        self.probe_started = 0.0
+
+
+class LineageTransaction:
+    """
+    Unidade de trabalho sobre uma única conexão do banco Lineage.
+
+    Todas as instruções executadas aqui compartilham a mesma transação e são
+    confirmadas com um único commit ao sair de `LineageDB.transaction()`.
+    Diferente dos métodos do `LineageDB`, erros não são engolidos: qualquer
+    exceção desfaz a transação inteira e é propagada para o chamador.
+    """
+
+    def __init__(self, db: "LineageDB", conn: Connection):
+        self.db = db
+        self.conn = conn
+
+    def _execute(self, query: str, params: Dict[str, Any]) -> Result:
+        stmt, params = self.db._prepare(query, params)
+        started = time.perf_counter()
+        try:
+            result = self.conn.execute(stmt, params)
+        except SQLAlchemyError:
+            self.db._record_query(query, params, started, error=True)
+            raise
+        self.db._record_query(query, params, started, rows=result.rowcount)
+        return result
+
+    def select(self, query: str, params: Dict[str, Any] = {}) -> List[Dict]:
+        return self._execute(query, params).mappings().all()
+
+    def insert(self, query: str, params: Dict[str, Any] = {}) -> Optional[int]:
+        return getattr(self._execute(query, params), "lastrowid", None)
+
+    def update(self, query: str, params: Dict[str, Any] = {}) -> Optional[int]:
+        return getattr(self._execute(query, params), "rowcount", None)
+
+    def delete(self, query: str, params: Dict[str, Any] = {}) -> Optional[int]:
+        return getattr(self._execute(query, params), "rowcount", None)
+
+    def execute_raw(self, query: str, params: Dict[str, Any] = {}) -> bool:
+        self._execute(query, params)
+        return True
+
+    def execute_many(self, query: str, params_list: List[Dict[str, Any]]) -> Optional[int]:
+        """
+        Executa a mesma instrução para vários conjuntos de parâmetros num único
+        round trip (executemany do driver). Parâmetros em lista não são expandidos aqui.
+        """
+        if not params_list:
+            return 0
+        stmt = self.db._compile_statement(query, ())
+        started = time.perf_counter()
+        # Uma métrica por lote (não por linha), com o primeiro conjunto de parâmetros como amostra
+        try:
+            result = self.conn.execute(stmt, params_list)
+        except SQLAlchemyError:
+            self.db._record_query(query, params_list[0], started, error=True)
+            raise
+        self.db._record_query(query, params_list[0], started, rows=result.rowcount)
+        return getattr(result, "rowcount", None)
+
+
 class LineageDB:
     _instance = None
     _lock = threading.Lock()
@@ -27,14 +268,31 @@ class LineageDB:
             return
 
         self.engine: Optional[Engine] = None
-        self.cache: Dict[Tuple[str, Tuple[Any, ...]], Tuple[List[Dict], float]] = {}
-        self.cache_ttl = 60  # segundos
+        # Cache local (por processo) limitado em entradas/bytes, com LRU e TTL
+        self.cache = LineageResultCache(
+            max_entries=int(os.getenv("LINEAGE_DB_CACHE_MAX_ENTRIES", "512")),
+            max_bytes=int(os.getenv("LINEAGE_DB_CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+            default_ttl=int(os.getenv("LINEAGE_DB_CACHE_TTL", "60")),  # segundos
+        )
         self.enabled = os.getenv("LINEAGE_DB_ENABLED", "false").lower() == "true"
-        # Estado do healthcheck
-        self._last_check_time: float = 0.0
-        self._last_check_ok: bool = False
-        self._check_cooldown_seconds: int = int(os.getenv("LINEAGE_DB_CHECK_COOLDOWN", "20"))
-        self._ping_timeout_seconds: int = int(os.getenv("LINEAGE_DB_PING_TIMEOUT", "2"))
+        # Réplicas de leitura (opcionais) com round-robin e failover por saúde
+        self.replicas: List[Engine] = []
+        self._replica_cursor: int = 0
+        self._replica_lock = threading.Lock()
+        self._replica_down_until: Dict[int, float] = {}
+        self._replica_cooldown_seconds: int = int(os.getenv("LINEAGE_DB_REPLICA_COOLDOWN", "30"))
+        # Estado do healthcheck: heartbeat em background + circuit breaker
+        self.breaker = LineageCircuitBreaker(
+            failure_threshold=int(os.getenv("LINEAGE_DB_BREAKER_FAILURES", "2")),
+            reset_timeout=int(os.getenv("LINEAGE_DB_CHECK_COOLDOWN", "20")),
+        )
+        self._heartbeat_interval: int = int(os.getenv("LINEAGE_DB_HEARTBEAT_INTERVAL", "10"))
+        self._heartbeat_pid: Optional[int] = None
+        self._heartbeat_lock = threading.Lock()
+
+        # Métricas por instrução (latência, linhas, erros, queries lentas)
+        self.metrics = query_metrics
+        self._metrics_flush_interval: int = int(os.getenv("LINEAGE_DB_METRICS_FLUSH_INTERVAL", "15"))
         
         if self.enabled:
             self._connect()
@@ -56,24 +314,7 @@ class LineageDB:
 
             url = f"mysql+pymysql://{user}:{safe_password}@{host}:{port}/{dbname}"
 
-            # Timeouts para evitar travar o worker caso o DB esteja inacessível
-            connect_timeout = int(os.getenv("LINEAGE_DB_CONNECT_TIMEOUT", "3"))
-            read_timeout = int(os.getenv("LINEAGE_DB_READ_TIMEOUT", "3"))
-            write_timeout = int(os.getenv("LINEAGE_DB_WRITE_TIMEOUT", "3"))
-            pool_timeout = int(os.getenv("LINEAGE_DB_POOL_TIMEOUT", "3"))
-
-            self.engine = create_engine(
-                url,
-                echo=False,
-                pool_pre_ping=True,
-                pool_recycle=180,
-                pool_timeout=pool_timeout,
-                connect_args={
-                    "connect_timeout": connect_timeout,
-                    "read_timeout": read_timeout,
-                    "write_timeout": write_timeout,
-                },
-            )
+            self.engine = self._create_engine(url)
 
             print("✅ Conectado ao banco Lineage com SQLAlchemy")
 
@@ -81,48 +322,169 @@ class LineageDB:
             print(f"❌ Falha ao conectar ao banco Lineage: {e}")
             self.engine = None
 
-    def _normalize_params(self, query: str, params: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
-        new_params = {}
-        for key, val in params.items():
-            if isinstance(val, list):
-                placeholders = []
-                for i, item in enumerate(val):
-                    new_key = f"{key}_{i}"
-                    placeholders.append(f":{new_key}")
-                    new_params[new_key] = item
-                query = query.replace(f":{key}", f"({', '.join(placeholders)})")
-            else:
-                new_params[key] = val
-        return query, new_params
-
-    def _get_cache(self, query: str, params: Tuple) -> Optional[List[Dict]]:
-        key = (query, params)
-        if key in self.cache:
-            data, timestamp = self.cache[key]
-            if time.time() - timestamp < self.cache_ttl:
-                print("⚡ Consulta retornada do cache")
-                return data
-            else:
-                del self.cache[key]
-        return None
+        self._connect_replicas()
+
+    def _create_engine(self, url: str) -> Engine:
+        # Timeouts para evitar travar o worker caso o DB esteja inacessível
+        connect_timeout = int(os.getenv("LINEAGE_DB_CONNECT_TIMEOUT", "3"))
+        read_timeout = int(os.getenv("LINEAGE_DB_READ_TIMEOUT", "3"))
+        write_timeout = int(os.getenv("LINEAGE_DB_WRITE_TIMEOUT", "3"))
+        pool_timeout = int(os.getenv("LINEAGE_DB_POOL_TIMEOUT", "3"))
+
+        return create_engine(
+            url,
+            echo=False,
+            pool_pre_ping=True,
+            pool_recycle=180,
+            pool_timeout=pool_timeout,
+            connect_args={
+                "connect_timeout": connect_timeout,
+                "read_timeout": read_timeout,
+                "write_timeout": write_timeout,
+            },
+        )
+
+    def _connect_replicas(self):
+        """
+        Réplicas de leitura opcionais. Aceita URLs completas em
+        LINEAGE_DB_REPLICA_URLS ou apenas host[:porta] em LINEAGE_DB_REPLICA_HOSTS
+        (reaproveitando usuário, senha e banco do primário), separados por vírgula.
+        """
+        urls = [u.strip() for u in os.getenv("LINEAGE_DB_REPLICA_URLS", "").split(",") if u.strip()]
+
+        hosts = [h.strip() for h in os.getenv("LINEAGE_DB_REPLICA_HOSTS", "").split(",") if h.strip()]
+        if hosts:
+            user = os.getenv("LINEAGE_DB_USER")
+            safe_password = quote_plus(os.getenv("LINEAGE_DB_PASSWORD") or "")
+            dbname = os.getenv("LINEAGE_DB_NAME")
+            default_port = os.getenv("LINEAGE_DB_PORT", "3306")
+            for host in hosts:
+                if ":" not in host:
+                    host = f"{host}:{default_port}"
+                urls.append(f"mysql+pymysql://{user}:{safe_password}@{host}/{dbname}")
+
+        for url in urls:
+            try:
+                self.replicas.append(self._create_engine(url))
+            except Exception as e:
+                print(f"❌ Falha ao configurar réplica do banco Lineage: {e}")
+
+        if self.replicas:
+            print(f"✅ {len(self.replicas)} réplica(s) de leitura do banco Lineage configurada(s)")
+
+    def _read_engines(self, consistent: bool = False) -> List[Engine]:
+        """
+        Ordem de tentativa para leituras: réplicas saudáveis em round-robin e,
+        por último, o primário. Com `consistent=True` (leitura logo após escrita)
+        vai direto ao primário.
+        """
+        engines: List[Engine] = []
+        if not consistent and self.replicas:
+            with self._replica_lock:
+                start = self._replica_cursor
+                self._replica_cursor = (self._replica_cursor + 1) % len(self.replicas)
+            now = time.monotonic()
+            for offset in range(len(self.replicas)):
+                index = (start + offset) % len(self.replicas)
+                if self._replica_down_until.get(index, 0.0) <= now:
+                    engines.append(self.replicas[index])
+        if self.engine:
+            engines.append(self.engine)
+        return engines
+
+    def _mark_replica_down(self, engine: Engine):
+        if engine is self.engine:
+            return
+        try:
+            index = self.replicas.index(engine)
+        except ValueError:
+            return
+        self._replica_down_until[index] = time.monotonic() + self._replica_cooldown_seconds
+        print(f"⚠️ Réplica {index} do banco Lineage indisponível, usando a próxima")
+
+    @staticmethod
+    @lru_cache(maxsize=int(os.getenv("LINEAGE_DB_STATEMENT_CACHE_SIZE", "1024")))
+    def _compile_statement(query: str, list_keys: Tuple[str, ...]) -> TextClause:
+        """
+        Constrói (uma única vez por SQL) o `text()` com os parâmetros em lista
+        marcados como `bindparam(expanding=True)`: `IN :ids` é expandido pelo
+        próprio SQLAlchemy na execução, qualquer que seja o tamanho da lista,
+        sem montar string nem reparsear o SQL a cada chamada.
+        """
+        stmt = text(query)
+        if list_keys:
+            stmt = stmt.bindparams(*(bindparam(key, expanding=True) for key in list_keys))
+        return stmt
+
+    @staticmethod
+    def _prepare(query: str, params: Dict[str, Any]) -> Tuple[TextClause, Dict[str, Any]]:
+        params = params or {}
+        list_keys = tuple(sorted(key for key, val in params.items() if isinstance(val, list)))
+        return LineageDB._compile_statement(query, list_keys), params
+
+    @staticmethod
+    def _cache_key(query: str, params: Dict[str, Any]) -> Tuple[str, Tuple[Any, ...]]:
+        items = tuple(sorted(
+            (key, tuple(val) if isinstance(val, list) else val) for key, val in (params or {}).items()
+        ))
+        return query, items
+
+    def _get_cache(self, key: Tuple[str, Tuple[Any, ...]]) -> Optional[List[Dict]]:
+        return self.cache.get(key)
 
-    def _set_cache(self, query: str, params: Tuple, data: List[Dict]):
-        self.cache[(query, params)] = (data, time.time())
+    def _set_cache(self, key: Tuple[str, Tuple[Any, ...]], data: List[Dict], ttl: Optional[int] = None):
+        self.cache.set(key, data, ttl=ttl)
 
-    def _safe_execute_read(self, query: str, params: Dict[str, Any]) -> Optional[Result]:
+    def _connect_read(self, query: str, params: Dict[str, Any], engines: List[Engine]) -> Tuple[Engine, Connection]:
+        """
+        Abre a conexão de leitura no primeiro engine (na ordem de `_read_engines`)
+        que aceitar. Só falha na fase de conexão (réplica recusou, caiu, sem
+        slots) marca a réplica como indisponível e passa para a próxima: erro ou
+        timeout na execução da query não é problema da réplica, e outra só
+        repetiria a mesma query pesada.
+        """
+        last_error: Optional[SQLAlchemyError] = None
+        for engine in engines:
+            started = time.perf_counter()
+            try:
+                return engine, engine.connect()
+            except SQLAlchemyError as e:
+                self._record_query(query, params, started, error=True)
+                if engine is self.engine or not isinstance(e, DBAPIError):
+                    if engine is self.engine and isinstance(e, OperationalError):
+                        self._report_failure()
+                    raise
+                self._mark_replica_down(engine)
+                last_error = e
+        raise last_error
+
+    def _safe_execute_read(self, query: str, params: Dict[str, Any], consistent: bool = False) -> Optional[Result]:
         if not self.enabled:
             return None
-        if not self.engine:
+        engines = self._read_engines(consistent)
+        if not engines:
             print("⚠️ Sem conexão com o banco")
             return None
+        stmt, params = self._prepare(query, params)
         try:
-            query, normalized_params = self._normalize_params(query, params)
-            with self.engine.connect() as conn:
-                stmt = text(query)
-                return conn.execute(stmt, normalized_params)
+            engine, conn = self._connect_read(query, params, engines)
         except SQLAlchemyError as e:
             print(f"❌ Erro na execução: {e}")
             return None
+        started = time.perf_counter()
+        try:
+            with conn:
+                result = conn.execute(stmt, params)
+            self._record_query(query, params, started, rows=result.rowcount, engine=engine)
+            if engine is self.engine:
+                self._report_success()
+            return result
+        except SQLAlchemyError as e:
+            self._record_query(query, params, started, error=True)
+            if engine is self.engine and isinstance(e, OperationalError):
+                self._report_failure()
+            print(f"❌ Erro na execução: {e}")
+            return None
 
     def _safe_execute_write(self, query: str, params: Dict[str, Any]) -> Optional[Result]:
         if not self.enabled:
@@ -130,77 +492,240 @@ class LineageDB:
         if not self.engine:
             print("⚠️ Sem conexão com o banco")
             return None
+        stmt, params = self._prepare(query, params)
+        started = time.perf_counter()
         try:
-            query, normalized_params = self._normalize_params(query, params)
             with self.engine.begin() as conn:
-                stmt = text(query)
-                return conn.execute(stmt, normalized_params)
+                result = conn.execute(stmt, params)
+            self._record_query(query, params, started, rows=result.rowcount)
+            self._report_success()
+            return result
         except SQLAlchemyError as e:
+            self._record_query(query, params, started, error=True)
+            if isinstance(e, OperationalError):
+                self._report_failure()
             print(f"❌ Erro na execução: {e}")
             return None
 
+    def _record_query(self, query: str, params: Dict[str, Any], started: float, rows: Optional[int] = None,
+                      error: bool = False, engine: Optional[Engine] = None):
+        """Registra latência/linhas/erros da instrução, rotulada pelo método de query que a chamou."""
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        try:
+            explain = None
+            if engine is not None and not error and self.metrics.should_explain(elapsed_ms, query):
+                explain = self._explain(engine, query, params)
+            self.metrics.record(resolve_caller_label(), query, params, elapsed_ms, rows=rows, error=error, explain=explain)
+        except Exception as e:
+            print(f"⚠️ Falha ao registrar métricas da query: {e}")
+
+    def _explain(self, engine: Engine, query: str, params: Dict[str, Any]) -> Optional[List[Dict]]:
+        try:
+            stmt, params = self._prepare(f"EXPLAIN {query.strip()}", params)
+            with engine.connect() as conn:
+                return [dict(row) for row in conn.execute(stmt, params).mappings().all()]
+        except SQLAlchemyError as e:
+            print(f"⚠️ Não foi possível capturar o EXPLAIN: {e}")
+            return None
+
+    HEALTH_CACHE_KEY = "lineage_db:breaker"
+
     def is_connected(self) -> bool:
+        """
+        Estado da conexão em O(1): apenas consulta o circuit breaker, que é
+        mantido por um heartbeat em background (um por processo) e sincronizado
+        entre workers via cache.
+        """
         if not self.enabled:
             return False
         if not self.engine:
             return False
-        # Respeita cooldown quando último resultado foi negativo
-        now = time.time()
-        if not self._last_check_ok and (now - self._last_check_time) < self._check_cooldown_seconds:
-            return False
-
-        result_container = {"ok": False}
-        done = threading.Event()
-
-        def ping_db():
-            try:
-                with self.engine.connect() as conn:
-                    conn.execute(text("SELECT 1"))
-                result_container["ok"] = True
-            except Exception as e:
-                print(f"❌ Conexão perdida: {e}")
-            finally:
-                done.set()
+        self._ensure_heartbeat()
+        return self.breaker.allow_request()
 
-        t = threading.Thread(target=ping_db, daemon=True)
-        t.start()
-        finished = done.wait(timeout=self._ping_timeout_seconds)
+    def _ensure_heartbeat(self):
+        # O pid muda após o fork dos workers do gunicorn: cada processo tem sua thread
+        if self._heartbeat_pid == os.getpid():
+            return
+        with self._heartbeat_lock:
+            if self._heartbeat_pid == os.getpid():
+                return
+            self._heartbeat_pid = os.getpid()
+            self._sync_shared_health()
+            t = threading.Thread(target=self._heartbeat_loop, name="lineage-db-heartbeat", daemon=True)
+            t.start()
+
+    def _heartbeat_loop(self):
+        ticks = 0
+        while True:
+            if ticks % max(1, self._heartbeat_interval) == 0:
+                self._ping()
+            else:
+                self._sync_shared_health()
+            if ticks % max(1, self._metrics_flush_interval) == 0:
+                self.metrics.publish()
+            ticks += 1
+            time.sleep(1)
 
-        if not finished:
-            # Falha por timeout; descarta conexões do pool para evitar estados zumbis
+    def _ping(self):
+        try:
+            with self.engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            changed = self.breaker.record_success()
+        except Exception as e:
+            print(f"❌ Conexão perdida: {e}")
+            # Descarta conexões do pool para evitar estados zumbis
             try:
                 if self.engine:
                     self.engine.dispose()
             except Exception:
                 pass
-            self._last_check_ok = False
-            self._last_check_time = now
-            return False
+            changed = self.breaker.record_failure()
+        if changed:
+            self._publish_shared_health()
+
+    def _report_failure(self):
+        """Falha de conexão observada numa consulta: alimenta o breaker."""
+        if self.breaker.record_failure():
+            self._publish_shared_health()
+
+    def _report_success(self):
+        """Consulta no primário com o circuito não fechado (ex.: o teste do meio-aberto) deu certo: fecha."""
+        if self.breaker.state != self.breaker.CLOSED and self.breaker.record_success():
+            self._publish_shared_health()
+
+    @staticmethod
+    def _shared_cache():
+        try:
+            from django.core.cache import cache
+            return cache
+        except Exception:
+            return None
 
-        self._last_check_ok = result_container["ok"]
-        self._last_check_time = now
-        return self._last_check_ok
+    def _publish_shared_health(self):
+        cache = self._shared_cache()
+        if cache is None:
+            return
+        try:
+            cache.set(self.HEALTH_CACHE_KEY, {
+                "state": self.breaker.state,
+                "changed_at": self.breaker.changed_at,
+                "opened_at": self.breaker.opened_at,
+            }, timeout=max(60, self.breaker.reset_timeout * 3))
+        except Exception:
+            pass
+
+    def _sync_shared_health(self):
+        cache = self._shared_cache()
+        if cache is None:
+            return
+        try:
+            shared = cache.get(self.HEALTH_CACHE_KEY)
+        except Exception:
+            return
+        if shared:
+            self.breaker.apply_shared(shared.get("state"), shared.get("changed_at", 0.0), shared.get("opened_at", 0.0))
 
-    def select(self, query: str, params: Dict[str, Any] = {}, use_cache: bool = False) -> Optional[List[Dict]]:
+    def select(self, query: str, params: Dict[str, Any] = {}, use_cache: bool = False,
+               cache_ttl: Optional[int] = None, consistent: bool = False) -> Optional[List[Dict]]:
+        """
+        Executa um SELECT. Por padrão é roteado para as réplicas de leitura (se
+        configuradas); use `consistent=True` para ler do primário logo após uma escrita.
+        """
         if not self.enabled:
             return []
         params = params or {}
-        query_exp, params_exp = self._normalize_params(query, params)
-        param_tuple = tuple(sorted(params_exp.items()))
-        if use_cache:
-            cached = self._get_cache(query_exp, param_tuple)
+        cache_key = self._cache_key(query, params) if use_cache else None
+        if use_cache and not consistent:
+            cached = self._get_cache(cache_key)
             if cached is not None:
                 return cached
 
-        result = self._safe_execute_read(query, params)
+        result = self._safe_execute_read(query, params, consistent=consistent)
         if result is None:
             return []
 
         rows = result.mappings().all()
         if use_cache:
-            self._set_cache(query_exp, param_tuple, rows)
+            self._set_cache(cache_key, rows, ttl=cache_ttl)
         return rows
 
+    def select_or_raise(self, query: str, params: Dict[str, Any] = {}, consistent: bool = False) -> List[Dict]:
+        """
+        Como `select`, mas levanta RuntimeError quando o banco do jogo não
+        responde, em vez de devolver `[]`. Para rotinas em que "nenhuma linha"
+        e "não deu para consultar" levam a decisões diferentes (agregações,
+        reserva de ids, conferência de entregas).
+        """
+        result = self._safe_execute_read(query, params or {}, consistent=consistent)
+        if result is None:
+            raise RuntimeError("falha ao consultar o banco do jogo")
+        return result.mappings().all()
+
+    def stream_chunks(self, query: str, params: Dict[str, Any] = {}, chunk_size: int = 1000,
+                      consistent: bool = False) -> Iterator[List[Dict]]:
+        """
+        Executa um SELECT com cursor server-side (SSCursor do PyMySQL) e devolve
+        os resultados em blocos de até `chunk_size` linhas, sem carregar o
+        resultado inteiro na memória. A conexão fica presa ao gerador até ele
+        ser consumido ou fechado.
+
+        Diferente do `select`, um erro no meio da leitura é propagado (depois de
+        registrado nas métricas): o chamador não pode confundir um resultado
+        truncado com o resultado completo. Antes da primeira linha ainda dá para
+        trocar de servidor: falha ao conectar numa réplica a marca como
+        indisponível, e conexão perdida antes de qualquer linha repete a leitura
+        no próximo engine.
+        """
+        if not self.enabled:
+            return
+        engines = self._read_engines(consistent)
+        if not engines:
+            print("⚠️ Sem conexão com o banco")
+            return
+        stmt, params = self._prepare(query, params)
+        while engines:
+            try:
+                engine, conn = self._connect_read(query, params, engines)
+            except SQLAlchemyError as e:
+                print(f"❌ Erro na execução: {e}")
+                raise
+            engines = engines[engines.index(engine) + 1:]
+            started = time.perf_counter()
+            rows = 0
+            error = False
+            try:
+                with conn:
+                    conn = conn.execution_options(stream_results=True, yield_per=chunk_size)
+                    result = conn.execute(stmt, params)
+                    for partition in result.mappings().partitions(chunk_size):
+                        rows += len(partition)
+                        yield partition
+                if engine is self.engine:
+                    self._report_success()
+                return
+            except SQLAlchemyError as e:
+                error = True
+                if not rows and engines and isinstance(e, DBAPIError) and e.connection_invalidated:
+                    print(f"⚠️ Conexão perdida antes da primeira linha, tentando o próximo servidor: {e}")
+                    continue
+                if engine is self.engine and isinstance(e, OperationalError):
+                    self._report_failure()
+                print(f"❌ Erro na execução: {e}")
+                raise
+            finally:
+                # Inclui o tempo de consumo do gerador: é o tempo em que a conexão ficou presa
+                self._record_query(query, params, started, rows=rows, error=error)
+
+    def stream(self, query: str, params: Dict[str, Any] = {}, chunk_size: int = 1000,
+               consistent: bool = False) -> Iterator[Dict]:
+        """
+        Igual ao `select`, mas devolve as linhas de forma preguiçosa (uma a uma).
+        Indicado para resultados grandes (rankings completos, inventários, migrações).
+        """
+        for chunk in self.stream_chunks(query, params, chunk_size=chunk_size, consistent=consistent):
+            yield from chunk
+
     def insert(self, query: str, params: Dict[str, Any] = {}) -> Optional[int]:
         if not self.enabled:
             return None
@@ -227,6 +752,37 @@ class LineageDB:
         if not self.enabled:
             return False
         return self._safe_execute_write(query, params) is not None
+
+    def execute_many(self, query: str, params_list: List[Dict[str, Any]]) -> Optional[int]:
+        """
+        Executa a mesma instrução (INSERT/UPDATE/DELETE) para vários conjuntos de
+        parâmetros numa única transação e num único round trip.
+        """
+        if not self.enabled:
+            return None
+        if not params_list:
+            return 0
+        try:
+            with self.transaction() as tx:
+                return tx.execute_many(query, params_list)
+        except (SQLAlchemyError, RuntimeError) as e:
+            print(f"❌ Erro na execução: {e}")
+            return None
+
+    @contextmanager
+    def transaction(self) -> Iterator[LineageTransaction]:
+        """
+        Abre uma unidade de trabalho: várias instruções na mesma conexão e um
+        único commit no final. Em caso de exceção tudo é desfeito (rollback).
+
+            with LineageDB().transaction() as tx:
+                itens = tx.select("SELECT ... FOR UPDATE", {...})
+                tx.delete("DELETE FROM items WHERE object_id IN :ids", {"ids": ids})
+        """
+        if not self.enabled or not self.engine:
+            raise RuntimeError("Banco Lineage indisponível")
+        with self.engine.begin() as conn:
+            yield LineageTransaction(self, conn)
     
     def get_table_columns(self, table_name: str) -> List[str]:
         """
@@ -249,3 +805,11 @@ class LineageDB:
 
     def clear_cache(self):
         self.cache.clear()
+
+    def cache_stats(self) -> Dict[str, int]:
+        stats = self.cache.stats()
+        statements = self._compile_statement.cache_info()
+        stats["statements"] = statements.currsize
+        stats["statement_hits"] = statements.hits
+        stats["statement_misses"] = statements.misses
+        return stats
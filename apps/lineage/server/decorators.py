@@ -1,6 +1,7 @@
 from django.shortcuts import render, redirect
 from functools import wraps
 from .models import ApiEndpointToggle
+from utils.config_cache import get_config
 from django.http import JsonResponse
 from apps.lineage.server.database import LineageDB
 from django.contrib import messages
@@ -21,7 +22,7 @@ def endpoint_enabled(endpoint_field):
             
             @wraps(original_dispatch)
             def wrapped_dispatch(self, request, *args, **kwargs):
-                toggle = ApiEndpointToggle.objects.first()
+                toggle = get_config(ApiEndpointToggle)
                 if not toggle or not getattr(toggle, endpoint_field, False):
                     # Check if it's a REST API request
                     if request.path.startswith('/api/'):
@@ -40,7 +41,7 @@ def endpoint_enabled(endpoint_field):
             # For function-based views
             @wraps(view_func_or_class)
             def _wrapped_view(request, *args, **kwargs):
-                toggle = ApiEndpointToggle.objects.first()
+                toggle = get_config(ApiEndpointToggle)
                 if not toggle or not getattr(toggle, endpoint_field, False):
                     # Verifica se é uma requisição de API REST
                     if request.path.startswith('/api/'):
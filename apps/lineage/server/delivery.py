@@ -0,0 +1,253 @@
+import os
+import uuid
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.lineage.server import delivery_log
+from apps.lineage.server.adena_aggregator import AdenaAggregator
+from apps.lineage.server.models import GameDelivery
+from utils.dynamic_import import get_query_class
+
+logger = logging.getLogger(__name__)
+
+# Entregas retiradas da fila por rodada do worker
+BATCH_SIZE = int(os.getenv("LINEAGE_DELIVERY_BATCH_SIZE", "200"))
+MAX_ATTEMPTS = int(os.getenv("LINEAGE_DELIVERY_MAX_ATTEMPTS", "5"))
+# Espera antes de tentar de novo (dobra a cada falha); também o intervalo com o personagem online
+RETRY_DELAY = int(os.getenv("LINEAGE_DELIVERY_RETRY_DELAY", "30"))
+# Entrega presa em "processing" por mais que isso: o worker caiu no meio do lote
+STALE_AFTER = int(os.getenv("LINEAGE_DELIVERY_STALE_AFTER", "600"))
+
+
+def new_idempotency_key() -> str:
+    return uuid.uuid4().hex
+
+
+def _wake_worker():
+    from apps.lineage.server.tasks import processar_entregas
+
+    try:
+        processar_entregas.delay()
+    except Exception as e:
+        # O beat drena a fila de qualquer forma; só demora mais
+        logger.warning(f"Não foi possível acionar o worker de entregas: {e}")
+
+
+def enqueue_delivery(user, char_name: str, item_id: int, amount: int, enchant: int = 0, origem: str = "",
+                     estorno: Optional[Dict] = None, idempotency_key: Optional[str] = None) -> GameDelivery:
+    """
+    Grava a entrega na fila. Deve rodar na mesma transação do débito
+    (carteira ou inventário online): os dois ficam gravados, ou nenhum.
+    Uma `idempotency_key` repetida (formulário enviado duas vezes) levanta
+    IntegrityError e desfaz o débito junto.
+    """
+    delivery = GameDelivery.objects.create(
+        user=user,
+        idempotency_key=idempotency_key or new_idempotency_key(),
+        account_name=user.username,
+        char_name=char_name,
+        item_id=item_id,
+        amount=amount,
+        enchant=enchant,
+        origem=origem,
+        estorno=estorno or {},
+    )
+    transaction.on_commit(_wake_worker)
+    return delivery
+
+
+def group_by_character(deliveries: List[GameDelivery]) -> Dict[tuple, List[GameDelivery]]:
+    groups = defaultdict(list)
+    for delivery in deliveries:
+        groups[(delivery.account_name, delivery.char_name)].append(delivery)
+    return groups
+
+
+def _refund(delivery: GameDelivery):
+    """Devolve ao usuário o que foi debitado para uma entrega que não vai acontecer."""
+    from apps.lineage.inventory.models import Inventory, InventoryItem
+    from apps.lineage.wallet.models import Wallet
+    from apps.lineage.wallet.signals import aplicar_transacao, aplicar_transacao_bonus
+
+    estorno = delivery.estorno or {}
+    descricao = f"Estorno: entrega para {delivery.char_name} não realizada"
+    if "valor" in estorno:
+        wallet = Wallet.objects.select_for_update().get(usuario=delivery.user)
+        aplicar = aplicar_transacao_bonus if delivery.origem == "wallet_bonus" else aplicar_transacao
+        aplicar(wallet=wallet, tipo="ENTRADA", valor=Decimal(estorno["valor"]), descricao=descricao,
+                origem=delivery.char_name, destino=delivery.user.username)
+    elif "inventory_id" in estorno:
+        inventory = Inventory.objects.get(pk=estorno["inventory_id"])
+        item, created = InventoryItem.objects.select_for_update().get_or_create(
+            inventory=inventory, item_id=delivery.item_id, enchant=delivery.enchant,
+            defaults={"item_name": estorno.get("item_name", ""), "quantity": delivery.amount},
+        )
+        if not created:
+            item.quantity += delivery.amount
+            item.save()
+
+
+class DeliveryQueue:
+    """
+    Worker da fila de entregas (GameDelivery). Cada rodada reivindica um
+    lote de entregas pendentes, agrupa por personagem e entrega cada grupo
+    numa única transação no banco do jogo (`insert_coins` do dialeto), em
+    vez de uma transação com SELECT/UPDATE/INSERT por requisição HTTP.
+
+    A mesma transação grava a `idempotency_key` de cada entrega em
+    `pdl_delivery_log`: um erro depois do commit (conexão caiu antes da
+    resposta) não vira item duplicado na nova tentativa nem estorno de algo
+    que o personagem recebeu, porque a chave é conferida antes de reenviar
+    ou estornar.
+    """
+
+    @staticmethod
+    def _claim(limit: int) -> List[GameDelivery]:
+        token = uuid.uuid4().hex
+        now = timezone.now()
+        with transaction.atomic():
+            queryset = GameDelivery.objects.filter(
+                status=GameDelivery.STATUS_PENDING, available_at__lte=now
+            ).order_by("id")
+            if connection.features.has_select_for_update_skip_locked:
+                # Vários workers em paralelo pegam lotes diferentes sem esperar um pelo outro
+                queryset = queryset.select_for_update(skip_locked=True)
+            ids = list(queryset.values_list("id", flat=True)[:limit])
+            # Só as que continuam pendentes (no SQLite, sem lock de linha, outro worker pode ter pego)
+            GameDelivery.objects.filter(id__in=ids, status=GameDelivery.STATUS_PENDING).update(
+                status=GameDelivery.STATUS_PROCESSING, claimed_by=token, claimed_at=now
+            )
+        return list(GameDelivery.objects.filter(claimed_by=token, status=GameDelivery.STATUS_PROCESSING)
+                    .select_related("user").order_by("id"))
+
+    @staticmethod
+    def _expire_stale() -> int:
+        """
+        Entregas presas em "processing" (worker caiu no meio do lote) não são
+        reenviadas sozinhas: o lote pode ter sido gravado no jogo antes da
+        queda. Ficam como falha para conferência, sem estorno automático.
+        """
+        limit = timezone.now() - timedelta(seconds=STALE_AFTER)
+        return GameDelivery.objects.filter(
+            status=GameDelivery.STATUS_PROCESSING, claimed_at__lt=limit
+        ).update(
+            status=GameDelivery.STATUS_FAILED,
+            last_error="Entrega interrompida no meio do lote; conferir no jogo antes de reenviar.",
+        )
+
+    @staticmethod
+    def _delivered(deliveries: List[GameDelivery]):
+        GameDelivery.objects.filter(id__in=[d.id for d in deliveries]).update(
+            status=GameDelivery.STATUS_DELIVERED, delivered_at=timezone.now(), last_error=""
+        )
+
+    @staticmethod
+    def _postpone(deliveries: List[GameDelivery], reason: str):
+        GameDelivery.objects.filter(id__in=[d.id for d in deliveries]).update(
+            status=GameDelivery.STATUS_PENDING, claimed_by="", last_error=reason,
+            available_at=timezone.now() + timedelta(seconds=RETRY_DELAY),
+        )
+
+    @staticmethod
+    def _already_in_game(deliveries: List[GameDelivery]) -> List[GameDelivery]:
+        """
+        Entregas de tentativas anteriores que o jogo gravou apesar do erro.
+        Levanta RuntimeError se não der para conferir: reenviar às cegas
+        poderia entregar em dobro.
+        """
+        retried = [d for d in deliveries if d.attempts]
+        keys = delivery_log.delivered_keys(d.idempotency_key for d in retried)
+        return [d for d in retried if d.idempotency_key in keys]
+
+    @staticmethod
+    def _failed(deliveries: List[GameDelivery], reason: str) -> int:
+        """
+        Agenda nova tentativa com espera crescente, ou encerra e estorna após
+        MAX_ATTEMPTS. Antes do estorno confere no jogo se o lote foi gravado
+        apesar do erro; sem como conferir, encerra sem estorno.
+        """
+        final = [d.idempotency_key for d in deliveries if d.attempts + 1 >= MAX_ATTEMPTS]
+        try:
+            in_game = delivery_log.delivered_keys(final)
+        except RuntimeError:
+            in_game = None
+
+        failed = 0
+        for delivery in deliveries:
+            if in_game and delivery.idempotency_key in in_game:
+                DeliveryQueue._delivered([delivery])
+                AdenaAggregator.mark_dirty(delivery.char_name)
+                continue
+            with transaction.atomic():
+                delivery.attempts += 1
+                delivery.last_error = reason
+                delivery.claimed_by = ""
+                if delivery.attempts >= MAX_ATTEMPTS:
+                    delivery.status = GameDelivery.STATUS_FAILED
+                    if in_game is None:
+                        delivery.last_error = f"{reason} Não foi possível conferir no jogo se a entrega foi gravada; conferir antes de estornar."
+                    else:
+                        _refund(delivery)
+                    failed += 1
+                else:
+                    delivery.status = GameDelivery.STATUS_PENDING
+                    delivery.available_at = timezone.now() + timedelta(
+                        seconds=RETRY_DELAY * 2 ** (delivery.attempts - 1)
+                    )
+                delivery.save(update_fields=["attempts", "last_error", "claimed_by", "status",
+                                             "available_at", "updated_at"])
+        return failed
+
+    @staticmethod
+    def drain(batch_size: int = BATCH_SIZE) -> Dict[str, int]:
+        TransferFromWalletToChar = get_query_class("TransferFromWalletToChar")
+        stats = {"entregues": 0, "adiadas": 0, "com_erro": 0, "falhas": 0, "interrompidas": DeliveryQueue._expire_stale()}
+        if not delivery_log.ensure_table():
+            # Sem o registro no jogo não há como conferir erros ambíguos: as entregas esperam na fila
+            logger.error("Não foi possível criar pdl_delivery_log no banco do jogo; fila de entregas parada.")
+            return stats
+
+        for (account, char_name), deliveries in group_by_character(DeliveryQueue._claim(batch_size)).items():
+            try:
+                done = DeliveryQueue._already_in_game(deliveries)
+                if done:
+                    DeliveryQueue._delivered(done)
+                    AdenaAggregator.mark_dirty(char_name)
+                    stats["entregues"] += len(done)
+                    deliveries = [d for d in deliveries if d not in done]
+                    if not deliveries:
+                        continue
+
+                character = TransferFromWalletToChar.find_char(account, char_name)
+                if not character:
+                    # Também é o retorno de find_char com o banco fora: tenta de novo antes de estornar
+                    stats["com_erro"] += len(deliveries)
+                    stats["falhas"] += DeliveryQueue._failed(deliveries, "Personagem não encontrado ou não pertence à conta.")
+                    continue
+                # Sem items_delayed o item é gravado direto em `items`: só com o personagem offline
+                if not TransferFromWalletToChar.items_delayed and character[0]["online"] != 0:
+                    DeliveryQueue._postpone(deliveries, "Aguardando o personagem ficar offline.")
+                    stats["adiadas"] += len(deliveries)
+                    continue
+
+                items = [(d.item_id, d.amount, d.enchant) for d in deliveries]
+                keys = [d.idempotency_key for d in deliveries]
+                if TransferFromWalletToChar.insert_coins(char_name, items, keys=keys):
+                    DeliveryQueue._delivered(deliveries)
+                    AdenaAggregator.mark_dirty(char_name)
+                    stats["entregues"] += len(deliveries)
+                else:
+                    stats["com_erro"] += len(deliveries)
+                    stats["falhas"] += DeliveryQueue._failed(deliveries, "Falha ao gravar no banco do jogo.")
+            except Exception as e:
+                logger.exception(f"Erro ao entregar lote de {char_name}")
+                stats["com_erro"] += len(deliveries)
+                stats["falhas"] += DeliveryQueue._failed(deliveries, str(e))
+
+        return stats
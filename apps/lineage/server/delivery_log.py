@@ -0,0 +1,62 @@
+import logging
+import threading
+from typing import Iterable, Set
+
+from apps.lineage.server.database import LineageDB
+
+logger = logging.getLogger(__name__)
+
+# Tabela do painel no banco do jogo: uma linha por entrega da fila gravada no jogo
+SQL_CREATE_DELIVERY_LOG = """
+    CREATE TABLE IF NOT EXISTS pdl_delivery_log (
+        idempotency_key VARCHAR(64) NOT NULL PRIMARY KEY,
+        char_name VARCHAR(45) NOT NULL,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+SQL_LOG_DELIVERY = """
+    INSERT INTO pdl_delivery_log (idempotency_key, char_name) VALUES (:idempotency_key, :char_name)
+"""
+
+SQL_DELIVERED_KEYS = """
+    SELECT idempotency_key FROM pdl_delivery_log WHERE idempotency_key IN :keys
+"""
+
+_ready = False
+_ready_lock = threading.Lock()
+
+
+def ensure_table() -> bool:
+    """Cria `pdl_delivery_log` no banco do jogo (uma vez por processo); False se não conseguir."""
+    global _ready
+    if _ready:
+        return True
+    with _ready_lock:
+        if not _ready:
+            _ready = LineageDB().execute_raw(SQL_CREATE_DELIVERY_LOG)
+    return _ready
+
+
+def log_delivery(tx, char_name: str, keys: Iterable[str]):
+    """
+    Registra as `idempotency_key` das entregas dentro da transação `tx` que
+    grava os itens: ou os dois entram no jogo, ou nenhum. Assim um erro sem
+    resposta do commit pode ser conferido depois com `delivered_keys`.
+    """
+    rows = [{"idempotency_key": key, "char_name": char_name} for key in keys]
+    if rows:
+        tx.execute_many(SQL_LOG_DELIVERY, rows)
+
+
+def delivered_keys(keys: Iterable[str]) -> Set[str]:
+    """
+    Quais dessas chaves já foram gravadas no jogo. Lê do primário e levanta
+    RuntimeError se o banco não responder: "nenhuma" e "não deu para
+    conferir" levam a decisões diferentes (reenviar/estornar ou esperar).
+    """
+    keys = list(keys)
+    if not keys:
+        return set()
+    rows = LineageDB().select_or_raise(SQL_DELIVERED_KEYS, {"keys": keys}, consistent=True)
+    return {row["idempotency_key"] for row in rows}
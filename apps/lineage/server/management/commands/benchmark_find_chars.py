@@ -0,0 +1,160 @@
+import random
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.lineage.server.character_summary import subclass_columns, subclass_joins
+
+CLAN_JOINS = """
+    LEFT JOIN clan_data AS CLAN ON CLAN.clan_id = C.clanid
+    LEFT JOIN clan_subpledges AS CS ON CS.clan_id = CLAN.clan_id AND CS.sub_pledge_id = 0
+    WHERE C.account_name = :login
+    LIMIT 7
+"""
+
+
+def _correlated(base_columns, where):
+    # find_chars antes das junções por posição: duas subqueries correlacionadas por subclasse
+    subqueries = []
+    for slot in range(3):
+        for column, alias in (("class_id", f"subclass{slot + 1}"), ("level", f"subclass{slot + 1}_level")):
+            subqueries.append(
+                f"(SELECT S.{column} FROM character_subclasses AS S "
+                f"WHERE S.char_obj_id = C.obj_Id AND {where} LIMIT {slot},1) AS {alias}"
+            )
+    return f"SELECT C.*, {base_columns}, {', '.join(subqueries)}, CS.name AS clan_name, CLAN.ally_name " \
+           f"FROM characters AS C {CLAN_JOINS}"
+
+
+SCHEMAS = {
+    # aCis/L2J: posição da subclasse em class_index, base em characters
+    "acis": {
+        "subclasses": """CREATE TABLE character_subclasses (
+            char_obj_id INTEGER, class_id INTEGER, level INTEGER, class_index INTEGER,
+            PRIMARY KEY (char_obj_id, class_index))""",
+        "correlated": _correlated("C.classid AS base_class, C.level AS base_level", "S.class_index > 0"),
+        "joined": f"""SELECT C.*, C.classid AS base_class, C.level AS base_level, {subclass_columns()},
+            CS.name AS clan_name, CLAN.ally_name
+            FROM characters AS C
+            {subclass_joins("char_obj_id")} {CLAN_JOINS}""",
+    },
+    # Classic/Lucera: isBase, sem class_index (ordem pela chave primária)
+    "classic": {
+        "subclasses": """CREATE TABLE character_subclasses (
+            char_obj_id INTEGER, class_id INTEGER, level INTEGER, isBase TEXT,
+            PRIMARY KEY (char_obj_id, class_id))""",
+        "correlated": _correlated(
+            "(SELECT S.class_id FROM character_subclasses AS S WHERE S.char_obj_id = C.obj_Id AND S.isBase = '1' LIMIT 1) AS base_class, "
+            "(SELECT S.level FROM character_subclasses AS S WHERE S.char_obj_id = C.obj_Id AND S.isBase = '1' LIMIT 1) AS base_level",
+            "S.isBase = '0'",
+        ),
+        "joined": f"""SELECT C.*, {subclass_columns(include_base=True)}, CS.name AS clan_name, CLAN.ally_name
+            FROM characters AS C
+            {subclass_joins("char_obj_id", base_flag="isBase")} {CLAN_JOINS}""",
+    },
+}
+
+COMMON_TABLES = """
+    CREATE TABLE characters (
+        obj_Id INTEGER PRIMARY KEY, account_name TEXT, char_name TEXT,
+        classid INTEGER, level INTEGER, clanid INTEGER
+    );
+    CREATE INDEX idx_characters_account ON characters (account_name);
+    CREATE TABLE clan_data (clan_id INTEGER PRIMARY KEY, ally_name TEXT);
+    CREATE TABLE clan_subpledges (clan_id INTEGER, sub_pledge_id INTEGER, name TEXT, PRIMARY KEY (clan_id, sub_pledge_id));
+"""
+
+
+class Command(BaseCommand):
+    help = ('Compara, num schema sintético em SQLite, o find_chars com subqueries correlacionadas '
+            'e a versão com uma junção por posição de subclasse (execuções de subquery, instruções da VM e tempo).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schema', choices=sorted(SCHEMAS), default='acis', help='Layout de character_subclasses')
+        parser.add_argument('--accounts', type=int, default=5000, help='Contas sintéticas (padrão: 5000)')
+        parser.add_argument('--chars', type=int, default=7, help='Personagens por conta (padrão: 7)')
+        parser.add_argument('--lookups', type=int, default=500, help='Consultas por variante (padrão: 500)')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def _populate(self, conn, schema, accounts, chars_per_account, rng):
+        conn.executescript(COMMON_TABLES)
+        conn.execute(SCHEMAS[schema]["subclasses"])
+        clans = max(accounts // 20, 1)
+        conn.executemany("INSERT INTO clan_data VALUES (?, ?)", [(i, f"ally{i % 50}") for i in range(1, clans + 1)])
+        conn.executemany("INSERT INTO clan_subpledges VALUES (?, 0, ?)", [(i, f"clan{i}") for i in range(1, clans + 1)])
+
+        characters, subclasses = [], []
+        obj_id = 268_000_000
+        for account in range(accounts):
+            for _ in range(chars_per_account):
+                obj_id += 1
+                base_class, level = rng.randint(0, 30), rng.randint(1, 80)
+                characters.append((obj_id, f"conta{account}", f"char{obj_id}", base_class, level,
+                                   rng.choice([0, rng.randint(1, clans)])))
+                classes = rng.sample(range(31, 119), rng.randint(0, 3))
+                if schema == "acis":
+                    subclasses.append((obj_id, base_class, level, 0))
+                    subclasses += [(obj_id, class_id, rng.randint(40, 80), index)
+                                   for index, class_id in enumerate(classes, start=1)]
+                else:
+                    subclasses.append((obj_id, base_class, level, '1'))
+                    subclasses += [(obj_id, class_id, rng.randint(40, 80), '0') for class_id in classes]
+        conn.executemany("INSERT INTO characters VALUES (?, ?, ?, ?, ?, ?)", characters)
+        conn.executemany("INSERT INTO character_subclasses VALUES (?, ?, ?, ?)", subclasses)
+        conn.execute("ANALYZE")
+        return len(characters), len(subclasses)
+
+    def _measure(self, conn, sql, logins):
+        steps = [0]
+
+        def count_step():
+            steps[0] += 1
+            return 0
+
+        # Cada subquery correlacionada do plano roda uma vez por personagem retornado
+        plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", {"login": logins[0]}).fetchall()
+        correlated = sum(1 for row in plan if "CORRELATED" in row[-1])
+
+        conn.set_progress_handler(count_step, 1)
+        started = time.perf_counter()
+        results = [conn.execute(sql, {"login": login}).fetchall() for login in logins]
+        elapsed = time.perf_counter() - started
+        conn.set_progress_handler(None, 0)
+        executions = correlated * sum(len(rows) for rows in results)
+        return results, executions, steps[0], elapsed
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        schema = options['schema']
+        conn = sqlite3.connect(':memory:')
+        total_chars, total_subs = self._populate(conn, schema, options['accounts'], options['chars'], rng)
+        logins = [f"conta{rng.randrange(options['accounts'])}" for _ in range(options['lookups'])]
+
+        self.stdout.write(
+            f"Schema sintético ({schema}): {total_chars} personagens, {total_subs} linhas em character_subclasses"
+        )
+
+        measured = {}
+        for name in ("correlated", "joined"):
+            measured[name] = self._measure(conn, SCHEMAS[schema][name], logins)
+
+        # Mesmo resultado (personagem por personagem) nas duas versões
+        normalize = lambda results: [sorted(rows) for rows in results]
+        if normalize(measured["correlated"][0]) != normalize(measured["joined"][0]):
+            self.stdout.write(self.style.ERROR('As duas versões retornaram resultados diferentes!'))
+            return
+
+        self.stdout.write(f"{'variante':<14} {'subqueries':>11} {'instruções VM':>14} {'por consulta':>13} {'tempo (ms)':>11}")
+        for name, label in (("correlated", "correlacionada"), ("joined", "por posição")):
+            _, executions, steps, elapsed = measured[name]
+            self.stdout.write(
+                f"{label:<14} {executions:>11} {steps:>14} {steps // len(logins):>13} {elapsed * 1000:>11.1f}"
+            )
+
+        old, new = measured["correlated"], measured["joined"]
+        self.stdout.write(self.style.SUCCESS(
+            f"{old[1] - new[1]} execuções de subquery correlacionada a menos; "
+            f"instruções VM: {100 * (new[2] / old[2] - 1):+.1f}%, tempo: {100 * (new[3] / old[3] - 1):+.1f}% "
+            f"({len(logins)} consultas)."
+        ))
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.lineage.server.utils.password_hash import available_backends, get_hasher
+
+
+class Command(BaseCommand):
+    help = ('Compara as implementações de hash de senha disponíveis (ex.: whirlpool nativo do OpenSSL, '
+            'extensão em C, Python otimizado e a implementação de referência).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--algorithm', default='whirlpool', help='Algoritmo (padrão: whirlpool)')
+        parser.add_argument('--iterations', type=int, default=2000, help='Hashes por implementação (padrão: 2000)')
+        parser.add_argument('--password', default='s3nh4-d0-j0g4d0r', help='Senha usada no teste')
+
+    def handle(self, *args, **options):
+        algorithm, iterations = options['algorithm'], options['iterations']
+        data = options['password'].encode()
+        backends = available_backends(algorithm)
+        if not backends:
+            self.stdout.write(self.style.ERROR(f"Nenhuma implementação registrada disponível para {algorithm}."))
+            return
+
+        selected, _ = get_hasher(algorithm)
+        expected = None
+        self.stdout.write(f"{'implementação':<18} {'µs/hash':>10} {'hashes/s':>10}")
+        for name, digest in backends.items():
+            result = digest(data)
+            if expected is None:
+                expected = result
+            elif result != expected:
+                self.stdout.write(self.style.ERROR(f"{name}: resultado diverge das outras implementações"))
+                continue
+
+            started = time.perf_counter()
+            for _ in range(iterations):
+                digest(data)
+            per_hash = (time.perf_counter() - started) / iterations
+            marker = ' *' if name == selected else ''
+            self.stdout.write(f"{name:<18} {per_hash * 1e6:>10.1f} {1 / per_hash:>10.0f}{marker}")
+
+        self.stdout.write(self.style.SUCCESS(f"Em uso: {selected} (marcada com *)"))
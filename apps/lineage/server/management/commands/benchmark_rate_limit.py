@@ -0,0 +1,83 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from middlewares.rate_limit_api_external import RateLimitMiddleware
+from utils.rate_limit import LocalTokenBucket, RedisTokenBucket, RouteTable, bucket_key
+from utils.urls_rate_limits import URL_RATE_LIMITS_DICT
+
+# Caminhos de exemplo: páginas sem limite (a maioria do tráfego) e rotas de API limitadas
+SAMPLE_PATHS = [
+    '/',
+    '/app/dashboard/',
+    '/static/assets/css/style.css',
+    '/api/v1/server/players-online/',
+    '/api/v1/server/siege-participants/',
+    '/api/v1/clan/Guardians/',
+    '/api/v1/cache/stats/',
+    '/app/wallet/transfer/jogador/',
+]
+
+
+def linear_match(path):
+    """Busca anterior: uma passada sobre todas as rotas a cada requisição."""
+    for route_path, config in URL_RATE_LIMITS_DICT.items():
+        if path.rstrip('/') == route_path.rstrip('/'):
+            return config
+    return None
+
+
+class Command(BaseCommand):
+    help = ('Mede o custo por requisição do rate limit: busca da rota (passada linear x tabela compilada), '
+            'balde de tokens em memória e no Redis (script Lua), e o middleware completo.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50000, help='Repetições por medida (padrão: 50000)')
+        parser.add_argument('--redis', action='store_true', help='Mede também o balde no Redis (DJANGO_CACHE_REDIS_URI)')
+
+    def _measure(self, label, func, iterations, calls=1):
+        """`func` faz `calls` requisições; imprime o custo médio de uma."""
+        started = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        per_call = (time.perf_counter() - started) / (iterations * calls)
+        self.stdout.write(f"{label:<40} {per_call * 1e6:>10.2f} µs")
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        table = RouteTable(URL_RATE_LIMITS_DICT)
+        paths = SAMPLE_PATHS
+        per_path = max(1, iterations // len(paths))
+
+        def each_path(match):
+            return lambda: [match(path) for path in paths]
+
+        self.stdout.write(f"{'medida (média dos caminhos de exemplo)':<40} {'por requisição':>13}")
+        self._measure('rota: passada linear (anterior)', each_path(linear_match), per_path, len(paths))
+        self._measure('rota: tabela compilada', each_path(table.match), per_path, len(paths))
+
+        route = table.match('/api/v1/server/players-online/')
+        route = route._replace(capacity=10 ** 9)  # sem bloquear durante a medida
+        key = bucket_key(route, 'ipbenchmark')
+        local_bucket = LocalTokenBucket()
+        self._measure('balde em memória', lambda: local_bucket.hit(key, route), iterations)
+
+        if options['redis']:
+            bucket = RedisTokenBucket()
+            try:
+                bucket._get_script()(keys=[key], args=[route.capacity, route.refill_per_ms])
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"Redis indisponível: {e}"))
+            else:
+                self._measure('balde no Redis (1 EVALSHA)', lambda: bucket.hit(key, route), max(1, iterations // 10))
+
+        middleware = RateLimitMiddleware(lambda request: None)
+        middleware.bucket = LocalTokenBucket()
+        middleware.routes = RouteTable({
+            path: dict(config, burst=10 ** 9) for path, config in URL_RATE_LIMITS_DICT.items()
+        })
+        factory = RequestFactory()
+        requests = [factory.get(path) for path in paths]
+        self._measure('middleware completo (balde em memória)',
+                      lambda: [middleware.process_request(request) for request in requests], per_path, len(paths))
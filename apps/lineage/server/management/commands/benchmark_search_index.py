@@ -0,0 +1,102 @@
+import os
+import json
+import random
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.lineage.server import search_index
+from apps.lineage.server.search_index import SearchIndex, build_index
+
+SYLLABLES = ["ka", "ri", "no", "th", "el", "dor", "mi", "ra", "zu", "an", "ven", "sha", "lo", "gri", "ta", "ur"]
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+class Command(BaseCommand):
+    help = ('Mede a latência do índice de busca local (prefixo, substring e com erro de digitação) '
+            'num índice sintético, comparando com LIKE \'%x%\' na mesma base.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chars', type=int, default=200000, help='Personagens sintéticos (padrão: 200000)')
+        parser.add_argument('--clans', type=int, default=5000, help='Clãs sintéticos (padrão: 5000)')
+        parser.add_argument('--lookups', type=int, default=300, help='Buscas por tipo (padrão: 300)')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def _name(self, rng):
+        return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 5))).capitalize() + \
+            (str(rng.randint(1, 99)) if rng.random() < 0.2 else "")
+
+    def _typo(self, rng, value):
+        position = rng.randrange(1, len(value))
+        return value[:position] + rng.choice("aeiou") + value[position + 1:]
+
+    def _timed(self, fn, queries):
+        latencies = []
+        for query in queries:
+            started = time.perf_counter()
+            fn(query)
+            latencies.append((time.perf_counter() - started) * 1000)
+        return latencies
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        names = {self._name(rng) for _ in range(options['chars'])}
+        characters = [
+            {"char_id": 268000000 + i, "char_name": name, "level": rng.randint(1, 85), "class_id": rng.randint(0, 118),
+             "clan_name": None, "online": 0, "last_access": 0}
+            for i, name in enumerate(sorted(names))
+        ]
+        clans = [{"clan_id": i, "clan_name": f"{self._name(rng)}Clan", "leader_name": "", "level": 1,
+                  "member_count": 1, "reputation": 0, "ally_name": None} for i in range(1, options['clans'] + 1)]
+        with open(os.path.join(settings.BASE_DIR, 'utils/data/itens.json'), encoding='utf-8') as f:
+            items = [{"item_id": int(k), "item_name": v[0], "item_type": "game", "description": ""}
+                     for k, v in json.load(f).items() if v and v[0]]
+
+        path = os.path.join(tempfile.mkdtemp(), 'lineage_search.sqlite3')
+        started = time.perf_counter()
+        counts = build_index(path, characters, clans, items)
+        self.stdout.write(
+            f"Índice montado em {time.perf_counter() - started:.1f}s: {counts['characters']} personagens, "
+            f"{counts['clans']} clãs, {counts['items']} itens ({os.path.getsize(path) / 2 ** 20:.1f} MiB)"
+        )
+
+        sample = [rng.choice(characters)["char_name"] for _ in range(options['lookups'])]
+        item_sample = [rng.choice(items)["item_name"] for _ in range(options['lookups'])]
+        workloads = {
+            "prefixo (2-4)": [name[:rng.randint(2, 4)] for name in sample],
+            "substring": [name[1:6] for name in sample],
+            "com erro": [self._typo(rng, name) for name in sample],
+            "itens": [name.split()[0][:rng.randint(3, 8)] for name in item_sample],
+        }
+
+        baseline = sqlite3.connect(path)
+        original_path = search_index.INDEX_PATH
+        search_index.INDEX_PATH = path
+        try:
+            self.stdout.write(f"{'busca':<14} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'LIKE p50':>9}")
+            worst = 0.0
+            for label, queries in workloads.items():
+                fn = SearchIndex.search_items if label == "itens" else SearchIndex.search_characters
+                table, column = ("items", "item_name") if label == "itens" else ("characters", "char_name")
+                latencies = self._timed(fn, queries)
+                like = self._timed(lambda q: baseline.execute(
+                    f"SELECT * FROM {table} WHERE {column} LIKE ? LIMIT 20", (f"%{q}%",)).fetchall(), queries[:50])
+                worst = max(worst, _percentile(latencies, 95))
+                self.stdout.write(
+                    f"{label:<14} {_percentile(latencies, 50):>9.2f} {_percentile(latencies, 95):>9.2f} "
+                    f"{_percentile(latencies, 99):>9.2f} {_percentile(like, 50):>9.2f}"
+                )
+        finally:
+            search_index.INDEX_PATH = original_path
+            baseline.close()
+            os.remove(path)
+
+        style = self.style.SUCCESS if worst < 10 else self.style.WARNING
+        self.stdout.write(style(f"Pior p95: {worst:.2f} ms (meta: < 10 ms)"))
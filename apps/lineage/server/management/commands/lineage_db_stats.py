@@ -0,0 +1,80 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from apps.lineage.server.database import LineageDB
+from apps.lineage.server.metrics import query_metrics
+
+
+class Command(BaseCommand):
+    help = 'Exibe latência, linhas e erros por método de query do banco Lineage e as instruções mais lentas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=10, help='Quantidade de queries lentas a exibir (padrão: 10)')
+        parser.add_argument('--sort', choices=['total', 'avg', 'p95', 'max', 'count', 'errors'], default='total',
+                            help='Ordenação da tabela por método (padrão: total)')
+        parser.add_argument('--json', action='store_true', help='Saída em JSON')
+        parser.add_argument('--explain', action='store_true', help='Mostra o EXPLAIN capturado das queries lentas')
+        parser.add_argument('--reset', action='store_true', help='Zera as métricas publicadas por todos os workers')
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            query_metrics.clear_shared()
+            self.stdout.write(self.style.SUCCESS('Métricas do banco Lineage zeradas.'))
+            return
+
+        report = query_metrics.report(slow_limit=options['limit'])
+        report['cache'] = LineageDB().cache_stats()
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2, default=str, ensure_ascii=False))
+            return
+
+        queries = report['queries']
+        if not queries:
+            self.stdout.write(self.style.WARNING(
+                'Nenhuma métrica registrada ainda (os workers publicam a cada LINEAGE_DB_METRICS_FLUSH_INTERVAL segundos).'
+            ))
+        else:
+            sort_key = {
+                'total': 'total_ms', 'avg': 'avg_ms', 'p95': 'p95_ms',
+                'max': 'max_ms', 'count': 'count', 'errors': 'errors',
+            }[options['sort']]
+            ordered = sorted(queries.items(), key=lambda item: float('inf') if item[1][sort_key] is None else item[1][sort_key], reverse=True)
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f"Métodos de query ({report['workers']} worker(s))"))
+            self.stdout.write(f"{'método':<50} {'chamadas':>9} {'erros':>6} {'linhas':>9} {'média':>9} {'p95':>8} {'máx':>9} {'total':>11}")
+            for label, stats in ordered:
+                p95 = f"{stats['p95_ms']:.0f}" if stats['p95_ms'] is not None else '>10000'
+                self.stdout.write(
+                    f"{label[:50]:<50} {stats['count']:>9} {stats['errors']:>6} {stats['rows']:>9} "
+                    f"{stats['avg_ms']:>9.2f} {p95:>8} {stats['max_ms']:>9.2f} {stats['total_ms']:>11.2f}"
+                )
+
+        slow_queries = report['slow_queries']
+        if slow_queries:
+            self.stdout.write('')
+            self.stdout.write(self.style.MIGRATE_HEADING(f'Queries lentas (top {len(slow_queries)})'))
+            for entry in slow_queries:
+                status = self.style.ERROR(' [erro]') if entry['error'] else ''
+                self.stdout.write(f"{entry['duration_ms']:>10.2f} ms  {entry['label']}  linhas={entry['rows']}{status}")
+                self.stdout.write(f"    {entry['sql'][:300]}")
+                self.stdout.write(f"    params={', '.join(entry['params']) or '-'}")
+                if options['explain'] and entry.get('explain'):
+                    for row in entry['explain']:
+                        self.stdout.write(f"    EXPLAIN {row}")
+
+        counters = report['counters']
+        if counters:
+            self.stdout.write('')
+            self.stdout.write(self.style.MIGRATE_HEADING('Contadores'))
+            for name, value in counters.items():
+                self.stdout.write(f"{name:<30} {value:>10}")
+
+        cache = report['cache']
+        self.stdout.write('')
+        self.stdout.write(self.style.MIGRATE_HEADING('Cache local de resultados (este processo)'))
+        self.stdout.write(
+            f"entradas={cache['entries']} bytes={cache['bytes']} hits={cache['hits']} misses={cache['misses']} "
+            f"evictions={cache['evictions']} statements={cache['statements']}"
+        )
@@ -1,7 +1,7 @@
 import os
 import secrets
 import string
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth import get_user_model
 from django.db import transaction
 from apps.lineage.server.database import LineageDB
@@ -64,8 +64,8 @@ class Command(BaseCommand):
             
         return login if login else None
 
-    def get_l2_accounts(self):
-        """Busca contas do L2 com email válido"""
+    def get_l2_accounts(self, batch_size=1000):
+        """Busca contas do L2 com email válido (streaming via cursor server-side)"""
         try:
             sql = """
                 SELECT login, 
@@ -80,13 +80,10 @@ class Command(BaseCommand):
                 ORDER BY created_time ASC
             """
             
-            accounts = LineageDB().select(sql)
-            return accounts
+            yield from LineageDB().stream(sql, chunk_size=batch_size)
         except Exception as e:
-            self.stderr.write(
-                self.style.ERROR(f'Erro ao buscar contas do L2: {e}')
-            )
-            return []
+            # Interrompe antes de criar usuários: a lista de contas estaria incompleta
+            raise CommandError(f'Erro ao buscar contas do L2: {e}') from e
 
     def check_email_exists(self, email):
         """Verifica se o email já existe no PDL"""
@@ -127,7 +124,7 @@ class Command(BaseCommand):
     def process_accounts(self, l2_accounts, dry_run, prefix, password_length, batch_size):
         """Processa as contas do L2"""
         stats = {
-            'total': len(l2_accounts),
+            'total': 0,
             'created': 0,
             'skipped': 0,
             'errors': 0,
@@ -143,6 +140,7 @@ class Command(BaseCommand):
         self.stdout.write('🔄 Processando emails duplicados no L2...')
         
         for account in l2_accounts:
+            stats['total'] += 1
             login = account.get('login')
             email = account.get('email')
             access_level = account.get('accessLevel', 0)
@@ -177,6 +175,10 @@ class Command(BaseCommand):
                 'created_time': created_time
             })
 
+        if not stats['total']:
+            return stats
+
+        self.stdout.write(f'✅ Encontradas {stats["total"]} contas no L2')
         self.stdout.write(f'✅ Processadas {len(processed_accounts)} contas válidas')
 
         # Processa em lotes
@@ -257,19 +259,17 @@ class Command(BaseCommand):
             self.stderr.write(self.style.ERROR('❌ Não foi possível conectar ao banco do L2'))
             return
 
-        # Busca contas do L2
+        # Busca contas do L2 (lidas sob demanda enquanto são processadas)
         self.stdout.write('📋 Buscando contas do L2...')
-        l2_accounts = self.get_l2_accounts()
-        
-        if not l2_accounts:
-            self.stdout.write(self.style.WARNING('⚠️  Nenhuma conta encontrada no L2'))
-            return
-
-        self.stdout.write(self.style.SUCCESS(f'✅ Encontradas {len(l2_accounts)} contas no L2'))
+        l2_accounts = self.get_l2_accounts(batch_size=batch_size)
 
         # Processa as contas
         stats = self.process_accounts(l2_accounts, dry_run, prefix, password_length, batch_size)
 
+        if not stats['total']:
+            self.stdout.write(self.style.WARNING('⚠️  Nenhuma conta encontrada no L2'))
+            return
+
         # Relatório final
         self.stdout.write('\n' + '='*60)
         self.stdout.write(self.style.SUCCESS('📊 RELATÓRIO DE MIGRAÇÃO'))
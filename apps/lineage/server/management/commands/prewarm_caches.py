@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from apps.lineage.server.database import LineageDB
+from apps.lineage.server.prewarm import PREWARM_WORKERS, collect_targets, prewarm
+
+
+class Command(BaseCommand):
+    help = ('Aquece o cache das leituras do banco do jogo (cache_lineage_result), dos snapshots dos rankings '
+            'e das chaves das páginas/API públicas, para rodar depois de um deploy ou de um flush do Redis.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=PREWARM_WORKERS,
+                            help=f'Consultas simultâneas ao banco do jogo (padrão: {PREWARM_WORKERS})')
+        parser.add_argument('--only', nargs='*', help='Aquece só os alvos cujo nome contém algum destes textos')
+        parser.add_argument('--list', action='store_true', help='Só lista os alvos, sem executar')
+
+    def handle(self, *args, **options):
+        targets = collect_targets(options['only'])
+        if options['list']:
+            for target in targets:
+                self.stdout.write(f"[{target.stage}] {target.name}")
+            return
+
+        if not LineageDB().is_connected():
+            self.stdout.write(self.style.ERROR("Banco do jogo indisponível; nada foi aquecido."))
+            return
+
+        results = prewarm(targets, workers=options['workers'])
+        self.stdout.write(f"{'alvo':<48} {'tempo (ms)':>10}")
+        for result in results:
+            line = f"{result.name:<48} {result.seconds * 1000:>10.1f}"
+            self.stdout.write(line if result.ok else self.style.ERROR(f"{line}  {result.error}"))
+
+        failed = sum(1 for result in results if not result.ok)
+        total = sum(result.seconds for result in results)
+        style = self.style.WARNING if failed else self.style.SUCCESS
+        self.stdout.write(style(f"{len(results) - failed}/{len(results)} alvos aquecidos ({total:.1f}s somados, {failed} com erro)"))
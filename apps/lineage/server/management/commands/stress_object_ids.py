@@ -0,0 +1,62 @@
+import time
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from apps.lineage.server.object_ids import ObjectIdAllocator, reserve_block
+
+
+def _allocate(count):
+    try:
+        allocator = _allocate.allocator
+        return [allocator.next_id() for _ in range(count)]
+    finally:
+        connections.close_all()
+
+
+def _process(args):
+    threads, per_thread, block_size = args
+    # Cada processo simula um worker (gunicorn/celery) com o próprio alocador
+    _allocate.allocator = ObjectIdAllocator(reserve_block, block_size=block_size)
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        batches = list(pool.map(_allocate, [per_thread] * threads))
+    return [object_id for batch in batches for object_id in batch]
+
+
+class Command(BaseCommand):
+    help = ('Teste de estresse do alocador de object_id: vários processos e threads reservando blocos '
+            'no banco do painel ao mesmo tempo, conferindo que nenhum id se repete.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4, help='Processos simultâneos (padrão: 4)')
+        parser.add_argument('--threads', type=int, default=8, help='Threads por processo (padrão: 8)')
+        parser.add_argument('--ids', type=int, default=250, help='Ids pedidos por thread (padrão: 250)')
+        parser.add_argument('--block-size', type=int, default=10,
+                            help='Tamanho do bloco; pequeno para forçar disputa pela reserva (padrão: 10)')
+
+    def handle(self, *args, **options):
+        processes, threads, per_thread = options['processes'], options['threads'], options['ids']
+        connections.close_all()  # os filhos abrem as próprias conexões
+
+        started = time.perf_counter()
+        with multiprocessing.get_context('fork').Pool(processes) as pool:
+            results = pool.map(_process, [(threads, per_thread, options['block_size'])] * processes)
+        elapsed = time.perf_counter() - started
+
+        ids = [object_id for result in results for object_id in result]
+        duplicates = {object_id: n for object_id, n in Counter(ids).items() if n > 1}
+        expected = processes * threads * per_thread
+
+        self.stdout.write(
+            f"{len(ids)} ids em {elapsed:.2f}s ({processes} processos x {threads} threads, "
+            f"blocos de {options['block_size']}): {min(ids)}-{max(ids)}"
+        )
+        if duplicates or len(ids) != expected:
+            self.stdout.write(self.style.ERROR(
+                f"{len(duplicates)} ids repetidos (ex.: {list(duplicates)[:5]}), {len(ids)}/{expected} entregues"
+            ))
+            return
+        self.stdout.write(self.style.SUCCESS("Nenhum object_id repetido."))
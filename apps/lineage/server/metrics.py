@@ -0,0 +1,265 @@
+import os
+import socket
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Limites superiores (ms) dos buckets do histograma de latência; o último é +inf
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Módulos internos ignorados ao descobrir quem chamou o banco
+_INTERNAL_MODULES = (
+    "apps.lineage.server.database",
+    "apps.lineage.server.async_database",
+    "apps.lineage.server.metrics",
+    "contextlib",
+)
+
+# Módulos cujos métodos públicos dão nome às métricas
+_QUERY_MODULES = (
+    "apps.lineage.server.querys",
+    "apps.lineage.server.async_stats",
+)
+
+
+def resolve_caller_label(max_depth: int = 12) -> str:
+    """
+    Descobre o método de query que originou a instrução (ex.: `LineageStats.top_pvp`).
+    Prioriza métodos públicos dos módulos em `querys/`; se não houver, usa o primeiro
+    frame fora da camada de banco (`modulo:funcao`).
+    """
+    frame = sys._getframe(1)
+    fallback = None
+    depth = 0
+    while frame is not None and depth < max_depth:
+        module = frame.f_globals.get("__name__", "")
+        if not module.startswith(_INTERNAL_MODULES):
+            # Compreensões e closures contam para o método que as contém
+            name = getattr(frame.f_code, "co_qualname", frame.f_code.co_name).split(".<locals>")[0]
+            if not module.startswith(_QUERY_MODULES):
+                fallback = fallback or f"{module}:{name}"
+            elif not name.rsplit(".", 1)[-1].startswith("_"):
+                # Helpers privados (ex.: `LineageStats._run_query`) são pulados
+                return name
+        frame = frame.f_back
+        depth += 1
+    return fallback or "desconhecido"
+
+
+def _param_names(params: Optional[Dict[str, Any]]) -> List[str]:
+    # Só os nomes: os valores (logins, e-mails, nomes de personagem) não vão para o log
+    return sorted(params or {})
+
+
+def _empty_stats() -> Dict[str, Any]:
+    return {
+        "count": 0,
+        "errors": 0,
+        "rows": 0,
+        "total_ms": 0.0,
+        "max_ms": 0.0,
+        "buckets": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+    }
+
+
+def percentile_from_buckets(buckets: List[int], pct: float) -> Optional[float]:
+    """Estimativa do percentil pelo limite superior do bucket (None = acima do último)."""
+    total = sum(buckets)
+    if not total:
+        return 0.0
+    target = total * pct / 100.0
+    running = 0
+    for index, count in enumerate(buckets):
+        running += count
+        if running >= target:
+            return float(LATENCY_BUCKETS_MS[index]) if index < len(LATENCY_BUCKETS_MS) else None
+    return None
+
+
+class LineageQueryMetrics:
+    """
+    Métricas por instrução do banco Lineage, agrupadas pelo método de query que
+    a originou: histograma de latência, linhas retornadas/afetadas e erros, além
+    de um ring buffer com as instruções lentas (e o EXPLAIN, quando capturado).
+
+    Os números são por processo; `publish()` grava um snapshot no cache do Django
+    (chamado pelo heartbeat do `LineageDB`) e `collect()` junta os snapshots de
+    todos os workers para as views da API e o comando `lineage_db_stats`.
+    """
+
+    CACHE_PREFIX = "lineage_db:metrics"
+
+    def __init__(self, slow_ms: int = 500, slow_log_size: int = 100, explain_ms: int = 0):
+        self.slow_ms = slow_ms
+        self.explain_ms = explain_ms
+        self.slow_log_size = slow_log_size
+        self.started_at = time.time()
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._slow: deque = deque(maxlen=slow_log_size)
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def worker_id(self) -> str:
+        # Calculado a cada uso: o pid muda após o fork dos workers
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def should_explain(self, elapsed_ms: float, query: str) -> bool:
+        return bool(self.explain_ms) and elapsed_ms >= self.explain_ms and query.lstrip()[:6].upper() == "SELECT"
+
+    def record(self, label: str, query: str, params: Optional[Dict[str, Any]], elapsed_ms: float,
+               rows: Optional[int] = None, error: bool = False, explain: Optional[List[Dict]] = None):
+        bucket = len(LATENCY_BUCKETS_MS)
+        for index, bound in enumerate(LATENCY_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                bucket = index
+                break
+
+        with self._lock:
+            stats = self._stats.get(label)
+            if stats is None:
+                stats = self._stats[label] = _empty_stats()
+            stats["count"] += 1
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+            stats["buckets"][bucket] += 1
+            if error:
+                stats["errors"] += 1
+            elif rows and rows > 0:
+                stats["rows"] += rows
+
+            if elapsed_ms >= self.slow_ms:
+                self._slow.append({
+                    "label": label,
+                    "sql": " ".join(query.split()),
+                    "params": _param_names(params),
+                    "duration_ms": round(elapsed_ms, 2),
+                    "rows": rows,
+                    "error": error,
+                    "explain": explain,
+                    "timestamp": time.time(),
+                })
+
+    def incr(self, name: str, amount: int = 1):
+        """Contador livre (ex.: `cache.stale_served`), agregado entre workers como o resto."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "worker": self.worker_id,
+                "started_at": self.started_at,
+                "queries": {label: dict(stats, buckets=list(stats["buckets"])) for label, stats in self._stats.items()},
+                "slow_queries": list(self._slow),
+                "counters": dict(self._counters),
+            }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._slow.clear()
+            self._counters.clear()
+
+    # ------------------------------------------------------------------
+    # Agregação entre workers via cache do Django
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _cache():
+        try:
+            from django.core.cache import cache
+            return cache
+        except Exception:
+            return None
+
+    def publish(self, ttl: int = 300):
+        cache = self._cache()
+        if cache is None:
+            return
+        try:
+            cache.set(f"{self.CACHE_PREFIX}:{self.worker_id}", self.snapshot(), timeout=ttl)
+            workers = cache.get(f"{self.CACHE_PREFIX}:workers") or []
+            if self.worker_id not in workers:
+                workers = (workers + [self.worker_id])[-256:]
+                cache.set(f"{self.CACHE_PREFIX}:workers", workers, timeout=None)
+        except Exception:
+            pass
+
+    def collect(self) -> List[Dict[str, Any]]:
+        """Snapshots de todos os workers (o deste processo é sempre o atual)."""
+        snapshots = [self.snapshot()]
+        cache = self._cache()
+        if cache is None:
+            return snapshots
+        try:
+            workers = cache.get(f"{self.CACHE_PREFIX}:workers") or []
+            keys = [f"{self.CACHE_PREFIX}:{worker}" for worker in workers if worker != self.worker_id]
+            if keys:
+                snapshots.extend(snap for snap in cache.get_many(keys).values() if snap)
+        except Exception:
+            pass
+        return snapshots
+
+    def clear_shared(self):
+        self.reset()
+        cache = self._cache()
+        if cache is None:
+            return
+        try:
+            workers = cache.get(f"{self.CACHE_PREFIX}:workers") or []
+            cache.delete_many([f"{self.CACHE_PREFIX}:{worker}" for worker in workers])
+            cache.delete(f"{self.CACHE_PREFIX}:workers")
+        except Exception:
+            pass
+
+    @staticmethod
+    def merge(snapshots: List[Dict[str, Any]], slow_limit: int = 50) -> Dict[str, Any]:
+        queries: Dict[str, Dict[str, Any]] = {}
+        slow: List[Dict[str, Any]] = []
+        counters: Dict[str, int] = {}
+        for snap in snapshots:
+            for name, value in snap.get("counters", {}).items():
+                counters[name] = counters.get(name, 0) + value
+            for label, stats in snap.get("queries", {}).items():
+                merged = queries.setdefault(label, _empty_stats())
+                merged["count"] += stats["count"]
+                merged["errors"] += stats["errors"]
+                merged["rows"] += stats["rows"]
+                merged["total_ms"] += stats["total_ms"]
+                merged["max_ms"] = max(merged["max_ms"], stats["max_ms"])
+                merged["buckets"] = [a + b for a, b in zip(merged["buckets"], stats["buckets"])]
+            for entry in snap.get("slow_queries", []):
+                slow.append(dict(entry, worker=snap.get("worker")))
+
+        for stats in queries.values():
+            stats["avg_ms"] = round(stats["total_ms"] / stats["count"], 2) if stats["count"] else 0.0
+            stats["total_ms"] = round(stats["total_ms"], 2)
+            stats["max_ms"] = round(stats["max_ms"], 2)
+            stats["p50_ms"] = percentile_from_buckets(stats["buckets"], 50)
+            stats["p95_ms"] = percentile_from_buckets(stats["buckets"], 95)
+            stats["p99_ms"] = percentile_from_buckets(stats["buckets"], 99)
+
+        slow.sort(key=lambda entry: entry["duration_ms"], reverse=True)
+        return {
+            "workers": len(snapshots),
+            "buckets_ms": list(LATENCY_BUCKETS_MS),
+            "queries": queries,
+            "slow_queries": slow[:slow_limit],
+            "counters": dict(sorted(counters.items())),
+        }
+
+    def report(self, slow_limit: int = 50) -> Dict[str, Any]:
+        return self.merge(self.collect(), slow_limit=slow_limit)
+
+
+query_metrics = LineageQueryMetrics(
+    slow_ms=int(os.getenv("LINEAGE_DB_SLOW_QUERY_MS", "500")),
+    slow_log_size=int(os.getenv("LINEAGE_DB_SLOW_LOG_SIZE", "100")),
+    explain_ms=int(os.getenv("LINEAGE_DB_EXPLAIN_MS", "0")),
+)
@@ -1,8 +1,10 @@
 from django.db import models
 from django.core.exceptions import ValidationError
 from django.utils.text import slugify
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from core.models import BaseModel
+from utils.config_cache import register_config
 from apps.main.home.models import User
 from apps.lineage.shop.models import ShopPurchase
 import os
@@ -223,6 +225,15 @@ class IndexConfigTranslation(BaseModel):
         return f"{self.nome_servidor} ({self.language})"
 
 
+# Configurações lidas a cada requisição: servidas por get_config (memória do processo + Redis)
+register_config(ApiEndpointToggle)
+register_config(
+    IndexConfig,
+    loader=lambda: IndexConfig.objects.prefetch_related('translations').first(),
+    depends_on=(IndexConfigTranslation,),
+)
+
+
 class ServicePrice(BaseModel):
     SERVICO_CHOICES = [
         ('CHANGE_NICKNAME', _('Change Nickname')),
@@ -312,3 +323,67 @@ class ApoiadorDefault(BaseModel):
 
     def __str__(self):
         return f"Imagem Default #{self.pk}"
+
+
+class ObjectIdRange(BaseModel):
+    """
+    Marca d'água da faixa de object_id que o painel usa ao criar itens no
+    banco do jogo. Cada processo reserva um bloco por vez (ver
+    apps/lineage/server/object_ids.py) e distribui os ids da memória.
+    """
+    name = models.CharField(max_length=50, unique=True, verbose_name=_("Name"))
+    next_id = models.BigIntegerField(verbose_name=_("Next Object ID"))
+
+    class Meta:
+        verbose_name = _("Object ID Range")
+        verbose_name_plural = _("Object ID Ranges")
+
+    def __str__(self):
+        return f"{self.name}: {self.next_id}"
+
+
+class GameDelivery(BaseModel):
+    """
+    Fila (outbox) de entregas de moedas/itens no banco do jogo. A view grava
+    a entrega na mesma transação do débito (carteira ou inventário online) e
+    o worker do Celery (`processar_entregas`) entrega em lotes por personagem.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSING = 'processing'
+    STATUS_DELIVERED = 'delivered'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, _('Pending')),
+        (STATUS_PROCESSING, _('Processing')),
+        (STATUS_DELIVERED, _('Delivered')),
+        (STATUS_FAILED, _('Failed')),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='entregas_jogo', verbose_name=_("User"))
+    idempotency_key = models.CharField(max_length=64, unique=True, verbose_name=_("Idempotency Key"))
+    account_name = models.CharField(max_length=45, verbose_name=_("Account Name"))
+    char_name = models.CharField(max_length=45, db_index=True, verbose_name=_("Character Name"))
+    item_id = models.PositiveIntegerField(verbose_name=_("Item ID"))
+    amount = models.PositiveBigIntegerField(verbose_name=_("Amount"))
+    enchant = models.IntegerField(default=0, verbose_name=_("Enchant Level"))
+    origem = models.CharField(max_length=30, verbose_name=_("Origin"))
+    # O que devolver ao usuário se a entrega falhar de vez (ex.: {"valor": "10.00"})
+    estorno = models.JSONField(default=dict, blank=True, verbose_name=_("Refund Data"))
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name=_("Status"))
+    attempts = models.PositiveIntegerField(default=0, verbose_name=_("Attempts"))
+    last_error = models.TextField(blank=True, default='', verbose_name=_("Last Error"))
+    available_at = models.DateTimeField(default=timezone.now, verbose_name=_("Available At"))
+    claimed_by = models.CharField(max_length=32, blank=True, default='', verbose_name=_("Claimed By"))
+    claimed_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Claimed At"))
+    delivered_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Delivered At"))
+
+    class Meta:
+        verbose_name = _("Game Delivery")
+        verbose_name_plural = _("Game Deliveries")
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+            models.Index(fields=['user', '-created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.amount}x {self.item_id} -> {self.char_name} ({self.get_status_display()})"
@@ -0,0 +1,110 @@
+import os
+import time
+import logging
+import threading
+from contextlib import nullcontext
+from typing import Callable, Optional, Tuple
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.lineage.server.database import LineageDB
+
+logger = logging.getLogger(__name__)
+
+# Faixa de object_id do painel (a do servidor começa em 0x10000000 e cresce a partir daí;
+# o IdFactory do servidor lê todos os ids de `items` ao iniciar, então os do painel não colidem)
+OBJECT_ID_MIN = int(os.getenv("LINEAGE_OBJECT_ID_MIN", "700000000"))
+OBJECT_ID_MAX = int(os.getenv("LINEAGE_OBJECT_ID_MAX", "799999999"))
+# Ids reservados por ida ao banco; o que sobrar quando o processo reinicia é descartado
+BLOCK_SIZE = int(os.getenv("LINEAGE_OBJECT_ID_BLOCK_SIZE", "100"))
+RANGE_NAME = "items"
+RESERVE_RETRIES = 20
+
+# Range na chave primária: busca direta no índice, ao contrário de `object_id LIKE '7%'`
+SQL_RANGE_HIGH_WATER_MARK = "SELECT MAX(object_id) AS hwm FROM items WHERE object_id BETWEEN :low AND :high"
+
+
+def next_block(stored_next: int, game_high_water_mark: int, size: int) -> Tuple[int, int]:
+    """
+    Bloco `[início, fim)` a reservar: depois da marca d'água do painel e de
+    qualquer id da faixa que já exista no banco do jogo (itens criados antes
+    do alocador, ou uma marca d'água perdida).
+    """
+    start = max(stored_next, game_high_water_mark + 1, OBJECT_ID_MIN)
+    end = start + size
+    if end - 1 > OBJECT_ID_MAX:
+        raise RuntimeError(f"faixa de object_id do painel esgotada ({OBJECT_ID_MIN}-{OBJECT_ID_MAX})")
+    return start, end
+
+
+def _game_high_water_mark() -> int:
+    db = LineageDB()
+    if not db.enabled:
+        return 0
+    # Sem ler o banco do jogo não dá para garantir que o bloco está livre: select_or_raise levanta
+    rows = db.select_or_raise(
+        SQL_RANGE_HIGH_WATER_MARK, {"low": OBJECT_ID_MIN, "high": OBJECT_ID_MAX}, consistent=True
+    )
+    return int(rows[0]["hwm"] or 0) if rows else 0
+
+
+def reserve_block(size: int = BLOCK_SIZE) -> Tuple[int, int]:
+    """
+    Reserva `size` ids na tabela do painel (ObjectIdRange). A linha é lida
+    com SELECT ... FOR UPDATE e gravada com compare-and-set em `next_id`,
+    então dois processos nunca recebem blocos sobrepostos. No SQLite (sem
+    lock de linha) vale só o compare-and-set, com nova tentativa se outro
+    processo reservou antes.
+    """
+    from apps.lineage.server.models import ObjectIdRange
+
+    game_hwm = _game_high_water_mark()
+    ObjectIdRange.objects.get_or_create(name=RANGE_NAME, defaults={"next_id": OBJECT_ID_MIN})
+    row_lock = connection.features.has_select_for_update
+    for attempt in range(RESERVE_RETRIES):
+        with transaction.atomic() if row_lock else nullcontext():
+            queryset = ObjectIdRange.objects.filter(name=RANGE_NAME)
+            row = (queryset.select_for_update() if row_lock else queryset).get()
+            start, end = next_block(row.next_id, game_hwm, size)
+            updated = queryset.filter(next_id=row.next_id).update(next_id=end, updated_at=timezone.now())
+        if updated:
+            return start, end
+        time.sleep(0.001 * (attempt + 1))
+    raise RuntimeError("não foi possível reservar um bloco de object_id (concorrência)")
+
+
+class ObjectIdAllocator:
+    """
+    Distribui object_ids de blocos reservados (`reserve_block`): uma ida ao
+    banco a cada BLOCK_SIZE itens criados, sem varrer `items` e sem corrida
+    entre entregas simultâneas. Seguro entre threads; entre processos a
+    garantia vem da reserva do bloco (e um processo filho criado por fork
+    descarta o bloco herdado do pai).
+    """
+
+    def __init__(self, reserve: Optional[Callable[[int], Tuple[int, int]]] = None, block_size: int = BLOCK_SIZE):
+        self._reserve = reserve or reserve_block
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._next = self._end = 0
+        self._pid = os.getpid()
+
+    def next_id(self) -> int:
+        with self._lock:
+            if self._pid != os.getpid():
+                self._next = self._end = 0
+                self._pid = os.getpid()
+            if self._next >= self._end:
+                self._next, self._end = self._reserve(self.block_size)
+                logger.debug(f"Bloco de object_id reservado: {self._next}-{self._end - 1}")
+            object_id = self._next
+            self._next += 1
+            return object_id
+
+
+allocator = ObjectIdAllocator()
+
+
+def next_object_id() -> int:
+    return allocator.next_id()
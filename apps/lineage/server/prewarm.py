@@ -0,0 +1,105 @@
+import inspect
+import logging
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from django.core.cache import cache
+from django.utils.module_loading import autodiscover_modules
+
+from apps.lineage.server.utils.cache import CACHED_READS
+from utils.dynamic_import import get_query_class
+
+logger = logging.getLogger(__name__)
+
+# Consultas simultâneas ao banco do jogo durante o aquecimento
+PREWARM_WORKERS = int(os.getenv("LINEAGE_PREWARM_WORKERS", "4"))
+
+PrewarmTarget = namedtuple("PrewarmTarget", "name stage loader")
+PrewarmResult = namedtuple("PrewarmResult", "name stage seconds ok error")
+
+# Alvos registrados pelos apps (módulos `prewarm.py`, carregados pelo comando).
+# Estágios rodam em sequência: o 0 enche o cache das leituras e os snapshots
+# dos rankings; o 1 monta as chaves das páginas/API, que leem o estágio 0.
+_targets: Dict[str, PrewarmTarget] = {}
+
+
+def register_prewarm(name: str, stage: int = 1):
+    def decorator(loader: Callable[[], object]):
+        _targets[name] = PrewarmTarget(name, stage, loader)
+        return loader
+    return decorator
+
+
+def warm_key(key: str, timeout: int, loader: Callable[[], object]):
+    """Calcula e grava uma chave no formato usado pelas views (`cache.get` / `cache.set`)."""
+    cache.set(key, loader(), timeout)
+
+
+def cached_reads() -> Dict[str, Callable]:
+    """
+    Leituras `cache_lineage_result` do dialeto ativo que não recebem
+    argumentos: a chamada do aquecimento gera a mesma chave que a das views.
+    As que dependem de argumentos (login, char_id, limit) entram como alvos
+    explícitos, com os mesmos argumentos usados nas páginas.
+    """
+    module = get_query_class("LineageStats").__module__
+    reads = {}
+    for name, wrapper in CACHED_READS.items():
+        if not name.startswith(f"{module}."):
+            continue
+        if inspect.signature(wrapper.__wrapped__).parameters:
+            continue
+        reads[f"read:{name[len(module) + 1:]}"] = wrapper
+    return reads
+
+
+def collect_targets(only: Optional[List[str]] = None) -> List[PrewarmTarget]:
+    autodiscover_modules("prewarm")
+    targets = [PrewarmTarget(name, 0, read) for name, read in cached_reads().items()]
+    targets += sorted(_targets.values(), key=lambda target: (target.stage, target.name))
+    if only:
+        targets = [target for target in targets if any(part in target.name for part in only)]
+    return targets
+
+
+def _run(target: PrewarmTarget) -> PrewarmResult:
+    started = time.perf_counter()
+    try:
+        target.loader()
+        return PrewarmResult(target.name, target.stage, time.perf_counter() - started, True, "")
+    except Exception as e:
+        logger.warning(f"Erro ao aquecer {target.name}: {e}")
+        return PrewarmResult(target.name, target.stage, time.perf_counter() - started, False, str(e))
+
+
+def prewarm(targets: List[PrewarmTarget], workers: int = PREWARM_WORKERS) -> List[PrewarmResult]:
+    """Executa os alvos estágio por estágio, no máximo `workers` ao mesmo tempo."""
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="lineage-prewarm") as pool:
+        for stage in sorted({target.stage for target in targets}):
+            results += pool.map(_run, [target for target in targets if target.stage == stage])
+    return results
+
+
+# Alvos do próprio app: snapshots dos rankings (páginas /tops e API) e status
+
+@register_prewarm("rankings:snapshots", stage=0)
+def _ranking_snapshots():
+    from apps.lineage.server.tasks import atualizar_rankings
+    atualizar_rankings()
+
+
+@register_prewarm("status:siege_participants")
+def _siege_participants():
+    LineageStats = get_query_class("LineageStats")
+    for castle in LineageStats.siege() or []:
+        LineageStats.siege_participants(castle["id"])
+
+
+@register_prewarm("status:boss_jewel_locations")
+def _boss_jewel_locations():
+    from apps.lineage.server.views.status_views import BOSS_JEWEL_IDS
+    get_query_class("LineageStats").boss_jewel_locations(BOSS_JEWEL_IDS)
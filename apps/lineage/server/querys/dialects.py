@@ -0,0 +1,359 @@
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from apps.lineage.server.character_summary import subclass_columns, subclass_joins
+
+# Mapa de schema por emulador: o que muda entre os módulos query_<dialeto>.
+#
+#   char_id         chave de `characters` (e dono em `items.owner_id`)
+#   char_id_alias   alias extra de char_id no find_chars (compatibilidade dos templates)
+#   access_level    coluna de nível de acesso em `characters`
+#   subclass_owner  coluna de `character_subclasses` que aponta o personagem
+#   base_class      onde ficam classe/level/exp base: "class_index" (linha 0 de
+#                   character_subclasses), "isBase" (linha com isBase = '1') ou
+#                   "characters" (colunas classid/level/exp do próprio personagem)
+#   clan_pledge     coluna que identifica a pledge principal em `clan_subpledges`
+#                   ("sub_pledge_id" = 0, "type" = '0'); None = nome em clan_data.clan_name
+#   clan_leader     coluna do líder na pledge principal (ou em clan_data, sem pledge):
+#                   "leader_id" (id do personagem) ou "leader_name"
+#   ally_table      aliança em `ally_data` (senão ally_name fica em clan_data)
+#   item_id/count   colunas de tipo e quantidade em `items`
+#   hints           índices por tabela para USE INDEX (ex.: {"items": "idx_owner_id"})
+SCHEMAS: Dict[str, Dict[str, Any]] = {
+    "acis_v1": {
+        "char_id": "obj_Id", "char_id_alias": None, "access_level": "accesslevel",
+        "subclass_owner": "char_obj_id", "base_class": "class_index",
+        "clan_pledge": "sub_pledge_id", "clan_leader": "leader_id", "ally_table": False,
+        "item_id": "item_id", "item_count": "count", "hints": {},
+    },
+    "acis_v2": {
+        "char_id": "obj_Id", "char_id_alias": None, "access_level": "accesslevel",
+        "subclass_owner": "char_obj_id", "base_class": "class_index",
+        "clan_pledge": "sub_pledge_id", "clan_leader": "leader_name", "ally_table": False,
+        "item_id": "item_id", "item_count": "count", "hints": {},
+    },
+    "ruacis": {
+        "char_id": "obj_Id", "char_id_alias": None, "access_level": "accesslevel",
+        "subclass_owner": "char_obj_id", "base_class": "class_index",
+        "clan_pledge": "sub_pledge_id", "clan_leader": "leader_name", "ally_table": False,
+        "item_id": "item_id", "item_count": "count", "hints": {},
+    },
+    "classic": {
+        "char_id": "obj_Id", "char_id_alias": None, "access_level": "accesslevel",
+        "subclass_owner": "char_obj_id", "base_class": "isBase",
+        "clan_pledge": "type", "clan_leader": "leader_id", "ally_table": True,
+        "item_id": "item_type", "item_count": "amount", "hints": {},
+    },
+    "dreamv3": {
+        "char_id": "obj_Id", "char_id_alias": None, "access_level": "accesslevel",
+        "subclass_owner": "char_obj_id", "base_class": "isBase",
+        "clan_pledge": "type", "clan_leader": "leader_id", "ally_table": True,
+        "item_id": "item_type", "item_count": "amount", "hints": {},
+    },
+    "lucerav2": {
+        "char_id": "obj_Id", "char_id_alias": None, "access_level": "accesslevel",
+        "subclass_owner": "char_obj_id", "base_class": "isBase",
+        "clan_pledge": "type", "clan_leader": "leader_id", "ally_table": True,
+        "item_id": "item_type", "item_count": "amount", "hints": {},
+    },
+    "dreamv2": {
+        "char_id": "charId", "char_id_alias": "obj_Id", "access_level": "accessLevel",
+        "subclass_owner": "charId", "base_class": "characters",
+        "clan_pledge": None, "clan_leader": "leader_id", "ally_table": False,
+        "item_id": "item_id", "item_count": "count", "hints": {},
+    },
+    "l2jpremium": {
+        "char_id": "charId", "char_id_alias": "obj_id", "access_level": "accessLevel",
+        "subclass_owner": "charId", "base_class": "characters",
+        "clan_pledge": None, "clan_leader": "leader_id", "ally_table": False,
+        "item_id": "item_id", "item_count": "count", "hints": {},
+    },
+}
+
+ADENA_ITEM_ID = 57
+
+
+class QueryCompiler:
+    """
+    Gera o SQL dos métodos compartilhados pelos módulos de query a partir do
+    mapa de schema do emulador (SCHEMAS), no lugar de oito cópias do mesmo
+    SELECT com nomes de coluna diferentes. Cada módulo monta as constantes
+    `SQL_*` na definição da classe (ex.: `SQL_TOP_PVP = _sql.top_pvp()`).
+
+    Além de escolher colunas e joins, o compilador aplica as formas otimizadas
+    onde o schema permite: rankings ordenados só por colunas de `characters`
+    escolhem os N personagens antes dos joins (deferred join), contagens e
+    somas por personagem/clã usam uma tabela derivada agrupada em vez de
+    subqueries correlacionadas, e as consultas por lista de ids usam IN
+    expandido (ver `LineageDB._compile_statement`).
+    """
+
+    def __init__(self, dialect: str, schema: Optional[Dict[str, Any]] = None):
+        self.dialect = dialect
+        self.schema = dict(schema or SCHEMAS[dialect])
+
+    # ------------------------------------------------------------------
+    # Peças do schema
+    # ------------------------------------------------------------------
+
+    def _table(self, name: str, alias: str) -> str:
+        hint = self.schema["hints"].get(name)
+        return f"{name} {alias} USE INDEX ({hint})" if hint else f"{name} {alias}"
+
+    @property
+    def _id(self) -> str:
+        return self.schema["char_id"]
+
+    @property
+    def _active(self) -> str:
+        """Filtro de personagens comuns (sem GMs)."""
+        return f"C.{self.schema['access_level']} = '0'"
+
+    def _base_join(self) -> str:
+        owner = self.schema["subclass_owner"]
+        layout = self.schema["base_class"]
+        if layout == "characters":
+            return ""
+        condition = "CS.class_index = 0" if layout == "class_index" else "CS.isBase = '1'"
+        return f"LEFT JOIN character_subclasses CS ON CS.{owner} = C.{self._id} AND {condition}"
+
+    def _base(self, column: str) -> str:
+        """Coluna da classe base (`level`, `exp`, `class_id`) conforme o layout."""
+        if self.schema["base_class"] == "characters":
+            return f"C.{'classid' if column == 'class_id' else column}"
+        return f"CS.{column}"
+
+    def _pledge_join(self, clan_id: str) -> str:
+        pledge = self.schema["clan_pledge"]
+        if not pledge:
+            return ""
+        value = "0" if pledge == "sub_pledge_id" else "'0'"
+        return f"LEFT JOIN clan_subpledges D ON D.clan_id = {clan_id} AND D.{pledge} = {value}"
+
+    def _ally_join(self) -> str:
+        return "LEFT JOIN ally_data A ON A.ally_id = CD.ally_id" if self.schema["ally_table"] else ""
+
+    def _clan_joins(self, with_ally: bool = False) -> str:
+        """Clã (pledge principal + clan_data) e, se pedido, aliança do personagem `C`."""
+        return "\n            ".join(filter(None, (
+            self._pledge_join("C.clanid"),
+            "LEFT JOIN clan_data CD ON CD.clan_id = C.clanid",
+            self._ally_join() if with_ally else "",
+        )))
+
+    @property
+    def _clan_name(self) -> str:
+        return "D.name" if self.schema["clan_pledge"] else "CD.clan_name"
+
+    @property
+    def _ally_name(self) -> str:
+        return "A.ally_name" if self.schema["ally_table"] else "CD.ally_name"
+
+    def _leader_join(self) -> str:
+        source = "D" if self.schema["clan_pledge"] else "CD"
+        if self.schema["clan_leader"] == "leader_name":
+            return f"LEFT JOIN characters P ON P.char_name = {source}.leader_name"
+        return f"LEFT JOIN characters P ON P.{self._id} = {source}.leader_id"
+
+    # ------------------------------------------------------------------
+    # Rankings de personagens
+    # ------------------------------------------------------------------
+
+    def _character_ranking(self, order_by: List[str], with_base: bool = True) -> str:
+        columns = [
+            "C.char_name", "C.pvpkills", "C.pkkills", "C.online", "C.onlinetime",
+            f"{self._base('level')} AS level",
+        ]
+        if with_base:
+            columns.append(f"{self._base('class_id')} AS base")
+        columns += [f"{self._clan_name} AS clan_name", "C.clanid AS clan_id", "CD.ally_id AS ally_id"]
+        order = ", ".join(order_by)
+
+        if all(column.startswith("C.") for column in order_by):
+            # Deferred join: ordena/limita só `characters` e junta o resto nas N linhas escolhidas
+            source = f"""(
+                SELECT C.{self._id} FROM {self._table('characters', 'C')}
+                WHERE {self._active}
+                ORDER BY {order}
+                LIMIT :limit
+            ) AS T
+            JOIN characters C ON C.{self._id} = T.{self._id}"""
+            where, limit = "", ""
+        else:
+            source, where, limit = self._table("characters", "C"), f"WHERE {self._active}", "LIMIT :limit"
+
+        return f"""
+            SELECT {', '.join(columns)}
+            FROM {source}
+            {self._base_join()}
+            {self._clan_joins()}
+            {where}
+            ORDER BY {order}
+            {limit}
+        """
+
+    def players_online(self) -> str:
+        return f"SELECT COUNT(*) AS quant FROM characters C WHERE C.online > 0 AND {self._active}"
+
+    def top_pvp(self) -> str:
+        return self._character_ranking(["C.pvpkills DESC", "C.pkkills DESC", "C.onlinetime DESC", "C.char_name ASC"])
+
+    def top_pk(self) -> str:
+        return self._character_ranking(["C.pkkills DESC", "C.pvpkills DESC", "C.onlinetime DESC", "C.char_name ASC"])
+
+    def top_online(self) -> str:
+        return self._character_ranking(["C.onlinetime DESC", "C.pvpkills DESC", "C.pkkills DESC", "C.char_name ASC"])
+
+    def top_level(self) -> str:
+        return self._character_ranking(
+            [f"{self._base('level')} DESC", f"{self._base('exp')} DESC", "C.onlinetime DESC", "C.char_name ASC"],
+            with_base=False,
+        )
+
+    def top_clans(self) -> str:
+        # Membros por clã numa passada agrupada, em vez de um COUNT correlacionado por clã
+        return f"""
+            SELECT CD.clan_id, {self._clan_name} AS clan_name, CD.clan_level, CD.reputation_score,
+                   {self._ally_name} AS ally_name, CD.ally_id AS ally_id,
+                   P.char_name, COALESCE(M.membros, 0) AS membros
+            FROM {self._table('clan_data', 'CD')}
+            {self._pledge_join('CD.clan_id')}
+            {self._ally_join()}
+            {self._leader_join()}
+            LEFT JOIN (
+                SELECT clanid, COUNT(*) AS membros FROM characters WHERE clanid > 0 GROUP BY clanid
+            ) AS M ON M.clanid = CD.clan_id
+            ORDER BY CD.clan_level DESC, CD.reputation_score DESC, membros DESC
+            LIMIT :limit
+        """
+
+    # ------------------------------------------------------------------
+    # Adena (top em SQL e agregado incremental)
+    # ------------------------------------------------------------------
+
+    def _wealth_totals(self, owner_filter: str = "", with_bonus: bool = True) -> str:
+        item, count = self.schema["item_id"], self.schema["item_count"]
+        if with_bonus:
+            columns = (f"SUM(CASE WHEN I.{item} = {ADENA_ITEM_ID} THEN I.{count} ELSE 0 END) AS adena,\n"
+                       f"                       SUM(CASE WHEN I.{item} = :adn_billion_item THEN I.{count} ELSE 0 END) AS bonus")
+            where = f"I.{item} IN ({ADENA_ITEM_ID}, :adn_billion_item)"
+        else:
+            columns = f"SUM(I.{count}) AS adena"
+            where = f"I.{item} = {ADENA_ITEM_ID}"
+        if owner_filter:
+            where = f"{owner_filter} AND {where}"
+        return f"""
+                SELECT I.owner_id,
+                       {columns}
+                FROM {self._table('items', 'I')}
+                WHERE {where}
+                GROUP BY I.owner_id
+        """
+
+    def _adena_columns(self) -> str:
+        return (f"C.char_name, C.online, C.onlinetime, {self._base('level')} AS level, "
+                f"{self._clan_name} AS clan_name, C.clanid AS clan_id, CD.ally_id AS ally_id")
+
+    def top_adena(self, with_bonus: bool = False) -> str:
+        # Soma por dono numa passada agrupada sobre `items`, em vez de duas subqueries por personagem
+        bonus = " + COALESCE(W.bonus, 0) * :value_item" if with_bonus else ""
+        return f"""
+            SELECT {self._adena_columns()},
+                   (COALESCE(W.adena, 0){bonus}) AS adenas
+            FROM {self._table('characters', 'C')}
+            LEFT JOIN ({self._wealth_totals(with_bonus=with_bonus)}) AS W ON W.owner_id = C.{self._id}
+            {self._base_join()}
+            {self._clan_joins()}
+            WHERE {self._active}
+            ORDER BY adenas DESC, C.onlinetime DESC, C.char_name ASC
+            LIMIT :limit
+        """
+
+    def adena_owners_page(self) -> str:
+        return f"""
+            SELECT C.{self._id} AS owner_id
+            FROM characters C
+            WHERE {self._active} AND C.{self._id} > :after
+            ORDER BY C.{self._id}
+            LIMIT :limit
+        """
+
+    def adena_changed_owners(self) -> str:
+        return f"""
+            SELECT C.{self._id} AS owner_id
+            FROM characters C
+            WHERE {self._active}
+              AND (C.lastAccess >= :since OR C.online > 0 OR C.char_name IN :char_names)
+        """
+
+    def adena_owner_totals(self) -> str:
+        return self._wealth_totals("I.owner_id IN :owner_ids")
+
+    def adena_owner_details(self) -> str:
+        return f"""
+            SELECT C.{self._id} AS owner_id, {self._adena_columns()}
+            FROM characters C
+            {self._base_join()}
+            {self._clan_joins()}
+            WHERE C.{self._id} IN :owner_ids AND {self._active}
+        """
+
+    # ------------------------------------------------------------------
+    # Índice de busca local (apps/lineage/server/search_index.py)
+    # ------------------------------------------------------------------
+
+    def search_characters_page(self) -> str:
+        return f"""
+            SELECT C.{self._id} AS char_id, C.char_name, {self._base('level')} AS level,
+                   {self._base('class_id')} AS class_id, {self._clan_name} AS clan_name,
+                   C.online, C.lastAccess AS last_access
+            FROM characters C
+            {self._base_join()}
+            {self._clan_joins()}
+            WHERE {self._active} AND C.{self._id} > :after
+            ORDER BY C.{self._id}
+            LIMIT :limit
+        """
+
+    def search_clans(self) -> str:
+        return f"""
+            SELECT CD.clan_id, {self._clan_name} AS clan_name, P.char_name AS leader_name,
+                   CD.clan_level AS level, COALESCE(M.membros, 0) AS member_count,
+                   CD.reputation_score AS reputation, {self._ally_name} AS ally_name
+            FROM clan_data CD
+            {self._pledge_join('CD.clan_id')}
+            {self._ally_join()}
+            {self._leader_join()}
+            LEFT JOIN (
+                SELECT clanid, COUNT(*) AS membros FROM characters WHERE clanid > 0 GROUP BY clanid
+            ) AS M ON M.clanid = CD.clan_id
+        """
+
+    # ------------------------------------------------------------------
+    # Personagens da conta
+    # ------------------------------------------------------------------
+
+    def find_chars(self) -> str:
+        owner = self.schema["subclass_owner"]
+        alias = self.schema["char_id_alias"]
+        if self.schema["base_class"] == "isBase":
+            base = subclass_columns(include_base=True)
+            subclasses = subclass_joins(owner, char_id_column=self._id, base_flag="isBase")
+        else:
+            base = f"C.classid AS base_class, C.level AS base_level, {subclass_columns()}"
+            subclasses = subclass_joins(owner, char_id_column=self._id)
+        extra = f"C.{self._id} AS {alias}, " if alias else ""
+        return f"""
+            SELECT C.*, {extra}{base},
+                   {self._clan_name} AS clan_name, {self._ally_name} AS ally_name
+            FROM characters AS C
+            {subclasses}
+            {self._clan_joins(with_ally=True)}
+            WHERE C.account_name = :login
+            LIMIT 7
+        """
+
+
+@lru_cache(maxsize=None)
+def compiler_for(dialect: str) -> QueryCompiler:
+    return QueryCompiler(dialect)
@@ -1,5 +1,9 @@
 from apps.lineage.server.database import LineageDB
-from apps.lineage.server.utils.cache import cache_lineage_result
+from apps.lineage.server.delivery_log import log_delivery
+from apps.lineage.server.adena_aggregator import AdenaAggregator
+from apps.lineage.server.object_ids import next_object_id
+from apps.lineage.server.querys.dialects import compiler_for
+from apps.lineage.server.utils.cache import cache_lineage_result, invalidates_lineage_cache
 
 import time
 import bcrypt
@@ -23,12 +27,14 @@ def generate_password_hash(password: str) -> str:
     hashed = bcrypt.hashpw(password.encode(), salt)
     return hashed.decode()
 
+_sql = compiler_for("acis_v2")  # SQL gerado a partir do mapa de schema do dialeto
+
 
 class LineageStats:
 
     @staticmethod
-    def _run_query(sql, params=None, use_cache=True):
-        return LineageDB().select(sql, params=params, use_cache=use_cache)
+    def _run_query(sql, params=None, use_cache=True, cache_ttl=None):
+        return LineageDB().select(sql, params=params, use_cache=use_cache, cache_ttl=cache_ttl)
     
     @staticmethod
     @cache_lineage_result(timeout=300)
@@ -58,175 +64,77 @@ class LineageStats:
         # Chama a função _run_query para executar a consulta
         return LineageStats._run_query(sql, {"ids": tuple(ids)})
 
+    SQL_PLAYERS_ONLINE = _sql.players_online()
+
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, stale_ttl=300)
     def players_online():
-        sql = "SELECT COUNT(*) AS quant FROM characters WHERE online > 0 AND accesslevel = '0'"
-        return LineageStats._run_query(sql)
+        return LineageStats._run_query(LineageStats.SQL_PLAYERS_ONLINE)
     
+    SQL_TOP_PVP = _sql.top_pvp()
+
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, stale_ttl=300)
     def top_pvp(limit=10):
-        sql = """
-            SELECT 
-                C.char_name, 
-                C.pvpkills, 
-                C.pkkills, 
-                C.online, 
-                C.onlinetime,
-                CS.level,
-                CS.class_id AS base,
-                D.name AS clan_name,
-                C.clanid AS clan_id,
-                CD.ally_id AS ally_id
-            FROM characters C
-            LEFT JOIN character_subclasses CS ON CS.char_obj_id = C.obj_Id AND CS.class_index = 0
-            LEFT JOIN clan_subpledges D ON D.clan_id = C.clanid AND D.sub_pledge_id = 0
-            LEFT JOIN clan_data CD ON CD.clan_id = C.clanid
-            WHERE C.accesslevel = '0'
-            ORDER BY pvpkills DESC, pkkills DESC, onlinetime DESC, char_name ASC
-            LIMIT :limit
-        """
-        return LineageStats._run_query(sql, {"limit": limit})
+        return LineageStats._run_query(LineageStats.SQL_TOP_PVP, {"limit": limit})
+
+    SQL_TOP_PK = _sql.top_pk()
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, stale_ttl=300)
     def top_pk(limit=10):
-        sql = """
-            SELECT 
-                C.char_name, 
-                C.pvpkills, 
-                C.pkkills, 
-                C.online, 
-                C.onlinetime,
-                CS.level,
-                CS.class_id AS base,
-                D.name AS clan_name,
-                C.clanid AS clan_id,
-                CD.ally_id AS ally_id
-            FROM characters C
-            LEFT JOIN character_subclasses CS ON CS.char_obj_id = C.obj_Id AND CS.class_index = 0
-            LEFT JOIN clan_subpledges D ON D.clan_id = C.clanid AND D.sub_pledge_id = 0
-            LEFT JOIN clan_data CD ON CD.clan_id = C.clanid
-            WHERE C.accesslevel = '0'
-            ORDER BY pkkills DESC, pvpkills DESC, onlinetime DESC, char_name ASC
-            LIMIT :limit
-        """
-        return LineageStats._run_query(sql, {"limit": limit})
+        return LineageStats._run_query(LineageStats.SQL_TOP_PK, {"limit": limit})
+
+    SQL_TOP_ONLINE = _sql.top_online()
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, stale_ttl=300)
     def top_online(limit=10):
-        sql = """
-            SELECT 
-                C.char_name, 
-                C.pvpkills, 
-                C.pkkills, 
-                C.online, 
-                C.onlinetime,
-                CS.level,
-                CS.class_id AS base,
-                D.name AS clan_name,
-                C.clanid AS clan_id,
-                CD.ally_id AS ally_id
-            FROM characters C
-            LEFT JOIN character_subclasses CS ON CS.char_obj_id = C.obj_Id AND CS.class_index = 0
-            LEFT JOIN clan_subpledges D ON D.clan_id = C.clanid AND D.sub_pledge_id = 0
-            LEFT JOIN clan_data CD ON CD.clan_id = C.clanid
-            WHERE C.accesslevel = '0'
-            ORDER BY onlinetime DESC, pvpkills DESC, pkkills DESC, char_name ASC
-            LIMIT :limit
-        """
-        return LineageStats._run_query(sql, {"limit": limit})
+        return LineageStats._run_query(LineageStats.SQL_TOP_ONLINE, {"limit": limit})
+
+    SQL_TOP_LEVEL = _sql.top_level()
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, stale_ttl=300)
     def top_level(limit=10):
-        sql = """
-            SELECT 
-                C.char_name, 
-                C.pvpkills, 
-                C.pkkills, 
-                C.online, 
-                C.onlinetime, 
-                CS.level,
-                D.name AS clan_name,
-                C.clanid AS clan_id,
-                CD.ally_id AS ally_id
-            FROM characters C
-            LEFT JOIN character_subclasses CS ON CS.char_obj_id = C.obj_Id AND CS.class_index = 0
-            LEFT JOIN clan_subpledges D ON D.clan_id = C.clanid AND D.sub_pledge_id = 0
-            LEFT JOIN clan_data CD ON CD.clan_id = C.clanid
-            WHERE C.accesslevel = '0'
-            ORDER BY CS.level DESC, CS.exp DESC, C.onlinetime DESC, C.char_name ASC
-            LIMIT :limit
-        """
-        return LineageStats._run_query(sql, {"limit": limit})
+        return LineageStats._run_query(LineageStats.SQL_TOP_LEVEL, {"limit": limit})
+
+    # Top de adena: agregado incremental (apps/lineage/server/adena_aggregator.py) e SQL de fallback
+    SQL_ADENA_OWNERS_PAGE = _sql.adena_owners_page()
+    SQL_ADENA_CHANGED_OWNERS = _sql.adena_changed_owners()
+    SQL_ADENA_OWNER_TOTALS = _sql.adena_owner_totals()
+    SQL_ADENA_OWNER_DETAILS = _sql.adena_owner_details()
+    SQL_TOP_ADENA = _sql.top_adena()
+    SQL_TOP_ADENA_BONUS = _sql.top_adena(with_bonus=True)
+
+    # Sincronização do índice de busca local (apps/lineage/server/search_index.py)
+    SQL_SEARCH_CHARACTERS_PAGE = _sql.search_characters_page()
+    SQL_SEARCH_CLANS = _sql.search_clans()
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, stale_ttl=300)
     def top_adena(limit=10, adn_billion_item=0, value_item=1000000):
-        item_bonus_sql = ""
-        if adn_billion_item != 0:
-            item_bonus_sql = f"""
-                IFNULL((SELECT SUM(I2.count) * :value_item
-                        FROM items I2
-                        WHERE I2.owner_id = C.obj_Id AND I2.item_id = :adn_billion_item
-                        GROUP BY I2.owner_id), 0) +
-            """
-        sql = f"""
-            SELECT 
-                C.char_name, 
-                C.online, 
-                C.onlinetime, 
-                CS.level, 
-                D.name AS clan_name,
-                C.clanid AS clan_id,
-                CD.ally_id AS ally_id,
-                (
-                    {item_bonus_sql}
-                    IFNULL((SELECT SUM(I1.count)
-                            FROM items I1
-                            WHERE I1.owner_id = C.obj_Id AND I1.item_id = '57'
-                            GROUP BY I1.owner_id), 0)
-                ) AS adenas
-            FROM characters C
-            LEFT JOIN character_subclasses CS ON CS.char_obj_id = C.obj_Id AND CS.class_index = 0
-            LEFT JOIN clan_subpledges D ON D.clan_id = C.clanid AND D.sub_pledge_id = 0
-            LEFT JOIN clan_data CD ON CD.clan_id = C.clanid
-            WHERE C.accesslevel = '0'
-            ORDER BY adenas DESC, onlinetime DESC, char_name ASC
-            LIMIT :limit
-        """
+        # Servido pelo agregado no Redis quando montado com o mesmo item bônus
+        rows = AdenaAggregator.top(limit, adn_billion_item, value_item)
+        if rows is not None:
+            return rows
+
+        sql = LineageStats.SQL_TOP_ADENA_BONUS if adn_billion_item != 0 else LineageStats.SQL_TOP_ADENA
         return LineageStats._run_query(sql, {
             "limit": limit,
             "adn_billion_item": adn_billion_item,
             "value_item": value_item
         })
 
+    SQL_TOP_CLANS = _sql.top_clans()
+
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, stale_ttl=300)
     def top_clans(limit=10):
-        sql = """
-            SELECT 
-                C.clan_id, 
-                D.name AS clan_name, 
-                C.clan_level, 
-                C.reputation_score, 
-                C.ally_name,  -- Obtendo ally_name diretamente de clan_data
-                C.ally_id,
-                P.char_name, 
-                (SELECT COUNT(*) FROM characters WHERE clanid = C.clan_id) AS membros
-            FROM clan_data C
-            LEFT JOIN clan_subpledges D ON D.clan_id = C.clan_id AND D.sub_pledge_id = 0
-            LEFT JOIN characters P ON P.char_name = D.leader_name
-            ORDER BY C.clan_level DESC, C.reputation_score DESC, membros DESC
-            LIMIT :limit
-        """
-        return LineageStats._run_query(sql, {"limit": limit})
+        return LineageStats._run_query(LineageStats.SQL_TOP_CLANS, {"limit": limit})
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, stale_ttl=300)
     def olympiad_ranking():
         sql = """
             SELECT 
@@ -247,7 +155,7 @@ class LineageStats:
         return LineageStats._run_query(sql)
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, stale_ttl=300)
     def olympiad_all_heroes():
         sql = """
             SELECT 
@@ -269,7 +177,7 @@ class LineageStats:
         return LineageStats._run_query(sql)
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, stale_ttl=300)
     def olympiad_current_heroes():
         sql = """
             SELECT 
@@ -290,7 +198,7 @@ class LineageStats:
         return LineageStats._run_query(sql)
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, stale_ttl=300)
     def grandboss_status():
         sql = """
             SELECT boss_id, respawn_time AS respawn
@@ -300,7 +208,7 @@ class LineageStats:
         return LineageStats._run_query(sql)
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, stale_ttl=300)
     def siege():
         sql = """
             SELECT 
@@ -371,74 +279,36 @@ class LineageStats:
 
 class LineageServices:
 
+    SQL_FIND_CHARS = _sql.find_chars()
+
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, depends_on=("account:{login}", "char_owners"))
     def find_chars(login):
-        sql = """
-            SELECT
-                C.*, 
-                -- Base class e level diretamente da tabela characters
-                C.classid AS base_class,
-                C.level AS base_level,
-
-                -- Subclass 1
-                (SELECT S1.class_id FROM character_subclasses AS S1 
-                WHERE S1.char_obj_id = C.obj_Id AND S1.class_index > 0 
-                LIMIT 0,1) AS subclass1,
-                (SELECT S1.level FROM character_subclasses AS S1 
-                WHERE S1.char_obj_id = C.obj_Id AND S1.class_index > 0 
-                LIMIT 0,1) AS subclass1_level,
-
-                -- Subclass 2
-                (SELECT S2.class_id FROM character_subclasses AS S2 
-                WHERE S2.char_obj_id = C.obj_Id AND S2.class_index > 0 
-                LIMIT 1,1) AS subclass2,
-                (SELECT S2.level FROM character_subclasses AS S2 
-                WHERE S2.char_obj_id = C.obj_Id AND S2.class_index > 0 
-                LIMIT 1,1) AS subclass2_level,
-
-                -- Subclass 3
-                (SELECT S3.class_id FROM character_subclasses AS S3 
-                WHERE S3.char_obj_id = C.obj_Id AND S3.class_index > 0 
-                LIMIT 2,1) AS subclass3,
-                (SELECT S3.level FROM character_subclasses AS S3 
-                WHERE S3.char_obj_id = C.obj_Id AND S3.class_index > 0 
-                LIMIT 2,1) AS subclass3_level,
-
-                -- Clan e Ally
-                CS.name AS clan_name,
-                CLAN.ally_name
-            FROM characters AS C
-            LEFT JOIN clan_data AS CLAN ON CLAN.clan_id = C.clanid
-            LEFT JOIN clan_subpledges AS CS ON CS.clan_id = CLAN.clan_id AND CS.sub_pledge_id = 0
-            WHERE C.account_name = :login
-            LIMIT 7;
-        """
         try:
-            return LineageDB().select(sql, {"login": login})
+            return LineageDB().select(LineageServices.SQL_FIND_CHARS, {"login": login})
         except:
             return None
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, depends_on=("char:{cid}", "char_owners"))
     def check_char(acc, cid):
         sql = "SELECT * FROM characters WHERE obj_id = :cid AND account_name = :acc LIMIT 1"
         try:
-            return LineageDB().select(sql, {"acc": acc, "cid": cid})
+            return LineageDB().select(sql, {"acc": acc, "cid": cid}, consistent=True)
         except:
             return None
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, depends_on=("char_names",))
     def check_name_exists(name):
         sql = "SELECT * FROM characters WHERE char_name = :name LIMIT 1"
         try:
-            return LineageDB().select(sql, {"name": name})
+            return LineageDB().select(sql, {"name": name}, consistent=True)
         except:
             return None
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @invalidates_lineage_cache("account:{acc}", "char:{cid}", "char_names")
     def change_nickname(acc, cid, name):
         try:
             sql = """
@@ -453,7 +323,7 @@ class LineageServices:
             return None
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @invalidates_lineage_cache("account:{acc}", "char:{cid}")
     def change_sex(acc, cid, sex):
         try:
             sql = """
@@ -467,7 +337,7 @@ class LineageServices:
             return None
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @invalidates_lineage_cache("account:{acc}", "char:{cid}")
     def unstuck(acc, cid, x, y, z):
         try:
             sql = """
@@ -490,7 +360,7 @@ class LineageAccount:
         return 'access_level'
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=1800, depends_on=("account:{login}",))
     def get_account_by_login(login):
         sql = """
             SELECT *
@@ -505,7 +375,7 @@ class LineageAccount:
             return None
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=1800, depends_on=("email:{email}",))
     def find_accounts_by_email(email):
         sql = """
             SELECT *
@@ -518,7 +388,7 @@ class LineageAccount:
             return []
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=1800, depends_on=("account:{login}",))
     def get_account_by_login_and_email(login, email):
         sql = """
             SELECT *
@@ -533,7 +403,7 @@ class LineageAccount:
             return None
 
     @staticmethod
-    @cache_lineage_result(timeout=60, use_cache=False)
+    @invalidates_lineage_cache("account:{login}")
     def link_account_to_user(login, user_uuid):
         try:
             sql = """
@@ -552,7 +422,7 @@ class LineageAccount:
             return None
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @invalidates_lineage_cache()
     def ensure_columns():
         if LineageAccount._checked_columns:
             return
@@ -600,16 +470,16 @@ class LineageAccount:
     @cache_lineage_result(timeout=300, use_cache=False)
     def check_login_exists(login):
         sql = "SELECT * FROM accounts WHERE login = :login LIMIT 1"
-        return LineageDB().select(sql, {"login": login})
+        return LineageDB().select(sql, {"login": login}, consistent=True)
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=1800, depends_on=("email:{email}",))
     def check_email_exists(email):
         sql = "SELECT login, email FROM accounts WHERE email = :email"
         return LineageDB().select(sql, {"email": email})
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @invalidates_lineage_cache("account:{login}", "email:{email}")
     def register(login, password, access_level, email):
         try:
             LineageAccount.ensure_columns()
@@ -635,7 +505,7 @@ class LineageAccount:
             return None
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @invalidates_lineage_cache("account:{login}")
     def update_password(password, login):
         try:
             # Gera o hash no formato Base64 (SHA-256)
@@ -656,7 +526,7 @@ class LineageAccount:
             return None
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @invalidates_lineage_cache("account:{logins_list}")
     def update_password_group(password, logins_list):
         if not logins_list:
             return None
@@ -680,7 +550,7 @@ class LineageAccount:
             return None
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @invalidates_lineage_cache("account:{login}")
     def update_access_level(access, login):
         try:
             sql = """
@@ -702,7 +572,7 @@ class LineageAccount:
         try:
             # Busca o hash salvo no banco
             sql = "SELECT password FROM accounts WHERE login = :login LIMIT 1"
-            result = LineageDB().select(sql, {"login": login})
+            result = LineageDB().select(sql, {"login": login}, consistent=True)
 
             if not result:
                 return False
@@ -729,7 +599,7 @@ class TransferFromWalletToChar:
             LIMIT 1
         """
         try:
-            return LineageDB().select(query, {"account": account, "char_name": char_name})
+            return LineageDB().select(query, {"account": account, "char_name": char_name}, consistent=True)
         except:
             return None
 
@@ -741,47 +611,36 @@ class TransferFromWalletToChar:
             JOIN characters c ON i.owner_id = c.obj_Id
             WHERE c.char_name = :char_name AND i.item_id = :coin_id
         """
-        return LineageDB().select(query, {"char_name": char_name, "coin_id": coin_id})
+        return LineageDB().select(query, {"char_name": char_name, "coin_id": coin_id}, consistent=True)
 
     @staticmethod
-    @cache_lineage_result(timeout=300, use_cache=False)
-    def insert_coin(char_name: str, coin_id: int, amount: int, enchant: int = 0):
-        db = LineageDB()
-
-        # Buscar owner_id
-        char_query = "SELECT obj_Id FROM characters WHERE char_name = :char_name"
-        char_result = db.select(char_query, {"char_name": char_name})
-        if not char_result:
-            return None
-
-        owner_id = char_result[0]["obj_Id"]
-        object_id = owner_id
-
-        if object_id != 0:
-            # Atualiza item existente
+    def _deliver(tx, owner_id, coin_id: int, amount: int, enchant: int = 0):
+        """Grava um item para o personagem dentro da transação `tx`; retorna falso se falhar."""
+        # Pilha do item sem enchant no inventário: só soma a quantidade. Item com
+        # enchant ou não empilhável (toda linha com count 1, entregue 1 a 1) vira linha nova
+        existing_item = None
+        if not enchant:
+            existing_query = """
+                SELECT object_id, count FROM items
+                WHERE owner_id = :owner_id AND item_id = :coin_id AND loc = 'INVENTORY' AND enchant_level = 0
+                ORDER BY count DESC
+                LIMIT 1
+            """
+            existing_item = tx.select(existing_query, {"owner_id": owner_id, "coin_id": coin_id})
+        if existing_item and (existing_item[0]["count"] > 1 or amount > 1):
             update_query = """
                 UPDATE items SET count = count + :amount
                 WHERE object_id = :object_id AND owner_id = :owner_id
             """
-            db.update(update_query, {
+            tx.update(update_query, {
                 "amount": amount,
-                "object_id": object_id,
+                "object_id": existing_item[0]["object_id"],
                 "owner_id": owner_id
             })
             return True
 
-        # Gerar novo object_id (começando com 7)
-        last_object_query = """
-            SELECT object_id FROM items 
-            WHERE object_id LIKE '7%' 
-            ORDER BY object_id DESC LIMIT 1
-        """
-        last_object_result = db.select(last_object_query)
-        if not last_object_result:
-            new_object_id = 700000000
-        else:
-            last_object_id = int(last_object_result[0]["object_id"])
-            new_object_id = last_object_id + 1
+        # Novo object_id da faixa do painel (bloco reservado, sem varrer `items`)
+        new_object_id = next_object_id()
 
         # Pegar o último loc_data do player
         last_loc_query = """
@@ -789,7 +648,7 @@ class TransferFromWalletToChar:
             WHERE owner_id = :owner_id 
             ORDER BY loc_data DESC LIMIT 1
         """
-        last_loc_result = db.select(last_loc_query, {"owner_id": owner_id})
+        last_loc_result = tx.select(last_loc_query, {"owner_id": owner_id})
         if not last_loc_result:
             new_loc_data = 0
         else:
@@ -806,7 +665,7 @@ class TransferFromWalletToChar:
                 :enchant, 'INVENTORY', :loc_data
             )
         """
-        result = db.insert(insert_query, {
+        result = tx.insert(insert_query, {
             "owner_id": owner_id,
             "object_id": new_object_id,
             "coin_id": coin_id,
@@ -817,6 +676,41 @@ class TransferFromWalletToChar:
 
         return result is not None
 
+    @staticmethod
+    @cache_lineage_result(timeout=300, use_cache=False)
+    def insert_coin(char_name: str, coin_id: int, amount: int, enchant: int = 0):
+        return TransferFromWalletToChar.insert_coins(char_name, [(coin_id, amount, enchant)])
+
+    @staticmethod
+    def insert_coins(char_name: str, items, keys=()):
+        """
+        Entrega vários itens `(item_id, quantidade, enchant)` ao mesmo
+        personagem numa única transação (lotes da fila de entregas). As
+        `keys` (idempotency_key das entregas) vão para `pdl_delivery_log`
+        no mesmo commit.
+        """
+        db = LineageDB()
+
+        # Um commit por lote: se um item falhar, nenhum é entregue
+        try:
+            with db.transaction() as tx:
+                # Buscar owner_id
+                char_query = "SELECT obj_Id FROM characters WHERE char_name = :char_name"
+                char_result = tx.select(char_query, {"char_name": char_name})
+                if not char_result:
+                    return None
+
+                owner_id = char_result[0]["obj_Id"]
+
+                for coin_id, amount, enchant in items:
+                    if not TransferFromWalletToChar._deliver(tx, owner_id, coin_id, amount, enchant):
+                        raise RuntimeError(f"falha ao entregar o item {coin_id}")
+                log_delivery(tx, char_name, keys)
+                return True
+        except Exception as e:
+            print(f"Erro ao entregar item ao personagem: {e}")
+            return None
+
 
 class TransferFromCharToWallet:
 
@@ -828,7 +722,7 @@ class TransferFromCharToWallet:
             WHERE account_name = :account AND obj_Id = :char_id
         """
         params = {"account": account, "char_id": char_id}
-        return LineageDB().select(query, params)
+        return LineageDB().select(query, params, consistent=True)
 
     @staticmethod
     @cache_lineage_result(timeout=300, use_cache=False)
@@ -841,9 +735,7 @@ class TransferFromCharToWallet:
             ORDER BY loc, item_id
         """
         params = {"char_id": char_id}
-        results = LineageDB().select(query, params)
-
-        return results
+        return LineageDB().select(query, params, consistent=True)
 
     @staticmethod
     @cache_lineage_result(timeout=300, use_cache=False)
@@ -856,7 +748,7 @@ class TransferFromCharToWallet:
             WHERE owner_id = :char_id AND item_id = :coin_id AND loc = 'INVENTORY'
             LIMIT 1
         """
-        result_inve = db.select(query_inve, {"char_id": char_id, "coin_id": coin_id})
+        result_inve = db.select(query_inve, {"char_id": char_id, "coin_id": coin_id}, consistent=True)
         inINVE = result_inve[0]["amount"] if result_inve else 0
         enchant = result_inve[0]["enchant"] if result_inve else 0
 
@@ -866,7 +758,7 @@ class TransferFromCharToWallet:
             WHERE owner_id = :char_id AND item_id = :coin_id AND loc = 'WAREHOUSE'
             LIMIT 1
         """
-        result_ware = db.select(query_ware, {"char_id": char_id, "coin_id": coin_id})
+        result_ware = db.select(query_ware, {"char_id": char_id, "coin_id": coin_id}, consistent=True)
         inWARE = result_ware[0]["amount"] if result_ware else 0
 
         total = inINVE + inWARE
@@ -878,67 +770,41 @@ class TransferFromCharToWallet:
         try:
             db = LineageDB()
 
-            # Função auxiliar para deletar itens não stackables
-            def delete_non_stackable(items, amount_to_remove):
-                removed = 0
-                for item in items:
-                    if removed >= amount_to_remove:
-                        break
-                    db.update("DELETE FROM items WHERE object_id = :item_id", {"item_id": item["object_id"]})
-                    removed += 1
-                return removed
-
-            # INVENTORY
-            query_inve = """
-                SELECT * FROM items
-                WHERE owner_id = :char_id AND item_id = :item_id AND loc = 'INVENTORY'
-            """
-            items_inve = db.select(query_inve, {"char_id": char_id, "item_id": coin_id})
+            # Leitura com lock e remoção numa única transação (um commit por retirada)
+            with db.transaction() as tx:
+                query_items = """
+                    SELECT * FROM items
+                    WHERE owner_id = :char_id AND item_id = :item_id AND loc IN ('INVENTORY', 'WAREHOUSE')
+                    FOR UPDATE
+                """
+                items = tx.select(query_items, {"char_id": char_id, "item_id": coin_id})
 
-            # WAREHOUSE
-            query_ware = """
-                SELECT * FROM items
-                WHERE owner_id = :char_id AND item_id = :item_id AND loc = 'WAREHOUSE'
-            """
-            items_ware = db.select(query_ware, {"char_id": char_id, "item_id": coin_id})
+                # INVENTORY primeiro, depois WAREHOUSE
+                items_inve = [item for item in items if item["loc"] == 'INVENTORY']
+                items_ware = [item for item in items if item["loc"] == 'WAREHOUSE']
 
-            total_amount = sum(item["count"] for item in items_inve + items_ware)
-            if total_amount < count:
-                return False  # Não tem quantidade suficiente
+                total_amount = sum(item["count"] for item in items_inve + items_ware)
+                if total_amount < count:
+                    return False  # Não tem quantidade suficiente
 
-            # Identifica se é stackable ou não
-            is_stackable = len(items_inve + items_ware) == 1 and (items_inve + items_ware)[0]["count"] > 1
+                # Identifica se é stackable ou não
+                is_stackable = len(items_inve + items_ware) == 1 and (items_inve + items_ware)[0]["count"] > 1
 
-            if is_stackable:
-                # Remove do INVENTORY primeiro
-                if items_inve:
-                    item = items_inve[0]
+                if is_stackable:
+                    item = (items_inve + items_ware)[0]
                     if item["count"] <= count:
-                        db.update("DELETE FROM items WHERE object_id = :item_id", {"item_id": item["object_id"]})
-                        count -= item["count"]
+                        tx.delete("DELETE FROM items WHERE object_id = :item_id", {"item_id": item["object_id"]})
                     else:
-                        db.update(
+                        tx.update(
                             "UPDATE items SET count = count - :count WHERE object_id = :item_id",
                             {"count": count, "item_id": item["object_id"]}
                         )
-                        count = 0
 
-                # Se ainda faltar, remove do WAREHOUSE
-                if count > 0 and items_ware:
-                    item = items_ware[0]
-                    if item["count"] <= count:
-                        db.update("DELETE FROM items WHERE object_id = :item_id", {"item_id": item["object_id"]})
-                    else:
-                        db.update(
-                            "UPDATE items SET count = count - :count WHERE object_id = :item_id",
-                            {"count": count, "item_id": item["object_id"]}
-                        )
-
-            else:
-                # Não stackável – remover 1 a 1, primeiro INVENTORY depois WAREHOUSE
-                removed = delete_non_stackable(items_inve, count)
-                if removed < count:
-                    delete_non_stackable(items_ware, count - removed)
+                else:
+                    # Não stackável – um único DELETE ... IN, primeiro INVENTORY depois WAREHOUSE
+                    object_ids = [item["object_id"] for item in (items_inve + items_ware)[:count]]
+                    if object_ids:
+                        tx.delete("DELETE FROM items WHERE object_id IN :item_ids", {"item_ids": object_ids})
 
             return True
 
@@ -991,7 +857,7 @@ class LineageMarketplace:
             FROM characters 
             WHERE obj_Id = :char_id AND account_name = :account_name
         """
-        result = LineageDB().select(sql, {"char_id": char_id, "account_name": account_name})
+        result = LineageDB().select(sql, {"char_id": char_id, "account_name": account_name}, consistent=True)
         return result[0]['total'] > 0 if result and len(result) > 0 else False
     
     @staticmethod
@@ -1020,7 +886,7 @@ class LineageMarketplace:
             LEFT JOIN clan_subpledges cs ON cs.clan_id = cd.clan_id AND cs.sub_pledge_id = 0
             WHERE c.obj_Id = :char_id
         """
-        result = LineageDB().select(sql, {"char_id": char_id})
+        result = LineageDB().select(sql, {"char_id": char_id}, consistent=True)
         return result[0] if result and len(result) > 0 else None
     
     @staticmethod
@@ -1097,7 +963,7 @@ class LineageMarketplace:
             FROM characters 
             WHERE account_name = :account_name
         """
-        result = LineageDB().select(sql, {"account_name": account_name})
+        result = LineageDB().select(sql, {"account_name": account_name}, consistent=True)
         return result[0]['total'] if result and len(result) > 0 else 0
     
     @staticmethod
@@ -1113,7 +979,7 @@ class LineageMarketplace:
         
         # Verifica se a conta já existe
         check_sql = "SELECT login FROM accounts WHERE login = :account_name"
-        existing = db.select(check_sql, {"account_name": account_name})
+        existing = db.select(check_sql, {"account_name": account_name}, consistent=True)
         
         try:
             if existing and len(existing) > 0:
@@ -1146,7 +1012,7 @@ class LineageMarketplace:
             return False
     
     @staticmethod
-    @cache_lineage_result(timeout=300, use_cache=False)
+    @invalidates_lineage_cache("char:{char_id}", "account:{new_account}", "char_owners")
     def transfer_character_to_account(char_id, new_account):
         """
         Transfere um character para nova conta no banco L2.
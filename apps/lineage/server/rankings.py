@@ -0,0 +1,218 @@
+import os
+import json
+import time
+import uuid
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+from apps.lineage.server.database import LineageDB
+from apps.lineage.server.utils.cache import convert_rowmapping_to_dict, get_redis_client
+from utils.dynamic_import import get_query_class
+
+logger = logging.getLogger(__name__)
+
+LineageStats = get_query_class("LineageStats")  # carrega a classe certa com base no .env
+
+# nome do ranking -> (método do LineageStats, campo que identifica a linha)
+RANKINGS = {
+    "pvp": ("top_pvp", "char_name"),
+    "pk": ("top_pk", "char_name"),
+    "online": ("top_online", "char_name"),
+    "level": ("top_level", "char_name"),
+    "adena": ("top_adena", "char_name"),
+    "clans": ("top_clans", "clan_id"),
+}
+
+KEY_PREFIX = "lineage_rank"
+SNAPSHOT_SIZE = int(os.getenv("LINEAGE_RANKING_SNAPSHOT_SIZE", "500"))
+# Se o job parar, os snapshots expiram e as views voltam a consultar o banco
+SNAPSHOT_TTL = int(os.getenv("LINEAGE_RANKING_SNAPSHOT_TTL", "3600"))
+
+# Página do ranking numa única ida ao Redis: ZREVRANGE + HMGET dos detalhes.
+# Retorna false se não houver snapshot publicado.
+_PAGE_SCRIPT = """
+local params = redis.call('HGET', KEYS[3], 'params')
+if not params then return false end
+local ids = redis.call('ZREVRANGE', KEYS[1], ARGV[1], ARGV[2])
+if #ids == 0 then return {params} end
+local rows = redis.call('HMGET', KEYS[2], unpack(ids))
+table.insert(rows, 1, params)
+return rows
+"""
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _keys(name: str) -> Tuple[str, str, str]:
+    return f"{KEY_PREFIX}:{name}:z", f"{KEY_PREFIX}:{name}:h", f"{KEY_PREFIX}:{name}:meta"
+
+
+def build_snapshot(rows: List[Dict], member_field: str) -> Tuple[Dict[str, int], Dict[str, str]]:
+    """
+    Converte as linhas do ranking (já ordenadas pelo SQL do dialeto) em
+    score do sorted set + JSON dos detalhes. O score é a posição invertida,
+    então o ZREVRANGE devolve exatamente a ordem (com desempates) do SQL.
+    """
+    scores: Dict[str, int] = {}
+    details: Dict[str, str] = {}
+    total = len(rows)
+    for index, row in enumerate(rows):
+        member = str(row.get(member_field))
+        if member in scores:
+            continue
+        scores[member] = total - index
+        details[member] = json.dumps(row, default=_json_default)
+    return scores, details
+
+
+class RankingSnapshot:
+    """
+    Snapshots dos rankings em sorted sets do Redis, gerados por um job do
+    Celery (`atualizar_rankings`). As views leem páginas com ZREVRANGE em vez
+    de rodar o ORDER BY no banco do jogo, e a publicação de um snapshot novo
+    é atômica (RENAME dentro de MULTI/EXEC).
+
+    Chaves por ranking: `lineage_rank:<nome>:z` (posição), `:h` (detalhes em
+    JSON por personagem/clã) e `:meta` (data de geração, tamanho, parâmetros).
+    """
+
+    @staticmethod
+    def publish(name: str, rows: List[Dict], params: Optional[Dict[str, Any]] = None) -> int:
+        client = get_redis_client()
+        if client is None:
+            return 0
+        zkey, hkey, metakey = _keys(name)
+        scores, details = build_snapshot(rows, RANKINGS[name][1])
+
+        # Monta o snapshot novo em chaves temporárias...
+        token = uuid.uuid4().hex[:8]
+        tmp_z, tmp_h = f"{zkey}:tmp:{token}", f"{hkey}:tmp:{token}"
+        if scores:
+            pipe = client.pipeline(transaction=False)
+            pipe.zadd(tmp_z, scores)
+            pipe.hset(tmp_h, mapping=details)
+            pipe.expire(tmp_z, 300)
+            pipe.expire(tmp_h, 300)
+            pipe.execute()
+
+        # ...e troca com o atual de uma vez só
+        pipe = client.pipeline(transaction=True)
+        if scores:
+            pipe.rename(tmp_z, zkey)
+            pipe.rename(tmp_h, hkey)
+        else:
+            pipe.delete(zkey, hkey)
+        pipe.delete(metakey)
+        pipe.hset(metakey, mapping={
+            "generated_at": time.time(),
+            "size": len(scores),
+            "params": json.dumps(params or {}, sort_keys=True, default=_json_default),
+        })
+        for key in (zkey, hkey, metakey):
+            pipe.expire(key, SNAPSHOT_TTL)
+        pipe.execute()
+        return len(scores)
+
+    @staticmethod
+    def page(name: str, offset: int = 0, limit: int = 20,
+             params: Optional[Dict[str, Any]] = None) -> Optional[List[Dict]]:
+        """
+        Linhas `offset`..`offset+limit` do snapshot, ou None se não houver
+        snapshot publicado (ou se foi gerado com outros parâmetros).
+        """
+        client = get_redis_client()
+        if client is None:
+            return None
+        try:
+            result = client.register_script(_PAGE_SCRIPT)(keys=_keys(name), args=[offset, offset + limit - 1])
+        except Exception as e:
+            logger.warning(f"Erro ao ler snapshot do ranking {name}: {e}")
+            return None
+        if not result:
+            return None
+        stored_params = result[0].decode() if isinstance(result[0], bytes) else result[0]
+        if stored_params != json.dumps(params or {}, sort_keys=True, default=_json_default):
+            return None
+        return [json.loads(row) for row in result[1:] if row]
+
+    @staticmethod
+    def rank_of(name: str, member: Any) -> Optional[Tuple[int, Dict]]:
+        """Posição (1-based) e detalhes de um personagem/clã no snapshot atual."""
+        client = get_redis_client()
+        if client is None:
+            return None
+        zkey, hkey, _ = _keys(name)
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.zrevrank(zkey, str(member))
+            pipe.hget(hkey, str(member))
+            rank, row = pipe.execute()
+        except Exception as e:
+            logger.warning(f"Erro ao buscar posição no ranking {name}: {e}")
+            return None
+        if rank is None or row is None:
+            return None
+        return rank + 1, json.loads(row)
+
+    @staticmethod
+    def info(name: str) -> Dict[str, Any]:
+        client = get_redis_client()
+        if client is None:
+            return {}
+        meta = client.hgetall(_keys(name)[2])
+        return {k.decode(): v.decode() for k, v in meta.items()}
+
+    @staticmethod
+    def refresh(name: str, **params) -> int:
+        """Lê o ranking completo (até SNAPSHOT_SIZE) do banco do jogo uma vez e publica."""
+        method_name = RANKINGS[name][0]
+        sql = getattr(LineageStats, f"SQL_{method_name.upper()}", None)
+        if sql and not params:
+            # Direto no SQL do dialeto: sem passar pelo cache das views
+            rows = LineageStats._run_query(sql, {"limit": SNAPSHOT_SIZE}, use_cache=False)
+        else:
+            rows = getattr(LineageStats, method_name)(limit=SNAPSHOT_SIZE, **params)
+        rows = convert_rowmapping_to_dict(rows) or []
+        return RankingSnapshot.publish(name, rows, params)
+
+
+def adena_params() -> Dict[str, int]:
+    """
+    Item de bônus e seu valor no top de adena (ActiveAdenaExchangeItem ativo).
+    O snapshot é publicado com esses parâmetros: quem lê o ranking precisa
+    passar os mesmos, senão o snapshot não confere e a query roda de novo.
+    """
+    from apps.lineage.server.models import ActiveAdenaExchangeItem
+
+    active_item = ActiveAdenaExchangeItem.objects.filter(active=True).order_by('-created_at').first()
+    if active_item:
+        return {"adn_billion_item": active_item.item_type, "value_item": active_item.value_item}
+    return {"adn_billion_item": 0, "value_item": 1000000000}
+
+
+def ranking_params(name: str) -> Dict[str, Any]:
+    """Parâmetros extras do ranking (hoje só o de adena tem)."""
+    return adena_params() if name == "adena" else {}
+
+
+def get_ranking(name: str, limit: int = 10, offset: int = 0, **params) -> List[Dict]:
+    """
+    Ranking para as views: do snapshot no Redis quando existir; senão cai na
+    query do dialeto (e só se o banco do jogo estiver acessível).
+    """
+    rows = RankingSnapshot.page(name, offset=offset, limit=limit, params=params)
+    if rows is not None:
+        return rows
+    if not LineageDB().is_connected():
+        return []
+    method = getattr(LineageStats, RANKINGS[name][0])
+    rows = method(limit=offset + limit, **params) or []
+    return rows[offset:offset + limit]
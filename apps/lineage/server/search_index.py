@@ -0,0 +1,340 @@
+import os
+import re
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from django.conf import settings
+
+from apps.lineage.server.database import LineageDB
+from utils.dynamic_import import get_query_class
+from utils.resources import get_class_name
+
+logger = logging.getLogger(__name__)
+
+# Arquivo SQLite com o índice (trocado inteiro a cada sincronização). Gravado pelo
+# worker do Celery e lido pelos processos web: no Docker fica no volume search_index_data
+INDEX_PATH = os.getenv("LINEAGE_SEARCH_INDEX_PATH") or os.path.join(
+    settings.BASE_DIR, "search_index", "lineage_search.sqlite3"
+)
+# Personagens lidos do banco do jogo por consulta (keyset por id)
+PAGE_SIZE = int(os.getenv("LINEAGE_SEARCH_INDEX_PAGE_SIZE", "5000"))
+# Similaridade mínima (trigramas, como o pg_trgm) para a busca aproximada
+SIMILARITY_THRESHOLD = float(os.getenv("LINEAGE_SEARCH_SIMILARITY", "0.3"))
+# Candidatos por trigramas avaliados na busca aproximada
+FUZZY_CANDIDATES = 100
+# Nomes até este tamanho entram no índice de variantes (distância de edição 1)
+MAX_EDIT_NAME = 24
+
+# tabela -> (chave, coluna buscada)
+KINDS = {
+    "characters": ("char_id", "char_name"),
+    "clans": ("clan_id", "clan_name"),
+    "items": ("item_id", "item_name"),
+}
+# Nomes de uma palavra (personagem, clã) ganham o índice de variantes por deleção
+EDIT_TABLES = ("characters", "clans")
+
+# COLLATE NOCASE na coluna: o prefixo vira um range no índice, sem diferenciar maiúsculas.
+# As tabelas FTS5 (tokenizer trigram) são só o índice de substring/similaridade sobre o nome.
+SCHEMA = """
+    CREATE TABLE characters (
+        char_id INTEGER PRIMARY KEY, char_name TEXT NOT NULL COLLATE NOCASE, level INTEGER,
+        class_id INTEGER, clan_name TEXT, online INTEGER, last_access INTEGER
+    );
+    CREATE TABLE clans (
+        clan_id INTEGER PRIMARY KEY, clan_name TEXT NOT NULL COLLATE NOCASE, leader_name TEXT,
+        level INTEGER, member_count INTEGER, reputation INTEGER, ally_name TEXT
+    );
+    CREATE TABLE items (
+        item_id INTEGER PRIMARY KEY, item_name TEXT NOT NULL COLLATE NOCASE, item_type TEXT, description TEXT
+    );
+    CREATE INDEX idx_characters_name ON characters (char_name);
+    CREATE INDEX idx_clans_name ON clans (clan_name);
+    CREATE INDEX idx_items_name ON items (item_name);
+    CREATE VIRTUAL TABLE characters_fts USING fts5(
+        char_name, content='characters', content_rowid='char_id', tokenize='trigram'
+    );
+    CREATE VIRTUAL TABLE clans_fts USING fts5(
+        clan_name, content='clans', content_rowid='clan_id', tokenize='trigram'
+    );
+    CREATE VIRTUAL TABLE items_fts USING fts5(
+        item_name, content='items', content_rowid='item_id', tokenize='trigram'
+    );
+    CREATE TABLE characters_edits (variant TEXT NOT NULL, id INTEGER NOT NULL, PRIMARY KEY (variant, id)) WITHOUT ROWID;
+    CREATE TABLE clans_edits (variant TEXT NOT NULL, id INTEGER NOT NULL, PRIMARY KEY (variant, id)) WITHOUT ROWID;
+    CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+COLUMNS = {
+    "characters": ("char_id", "char_name", "level", "class_id", "clan_name", "online", "last_access"),
+    "clans": ("clan_id", "clan_name", "leader_name", "level", "member_count", "reputation", "ally_name"),
+    "items": ("item_id", "item_name", "item_type", "description"),
+}
+
+_local = threading.local()
+
+
+def trigrams(value: str) -> Set[str]:
+    """Trigramas no formato do pg_trgm: por palavra, minúsculas, com dois espaços antes e um depois."""
+    grams = set()
+    for word in re.findall(r"\w+", value.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(a: str, b: str) -> float:
+    ta, tb = trigrams(a), trigrams(b)
+    if not ta or not tb:
+        return 0.0
+    return len(ta & tb) / len(ta | tb)
+
+
+def deletion_variants(value: str) -> Set[str]:
+    """
+    O valor (minúsculo) e todas as versões com um caractere a menos. Dois
+    nomes estão a no máximo uma edição (troca, inclusão ou remoção de uma
+    letra) se os conjuntos de variantes se cruzam.
+    """
+    value = value.lower()
+    return {value} | {value[:i] + value[i + 1:] for i in range(len(value))}
+
+
+def _fts_phrase(value: str) -> str:
+    return '"' + value.replace('"', '""') + '"'
+
+
+def _prefix_bounds(value: str):
+    # Range no índice NOCASE: tudo que começa com `value` fica entre value e value + U+10FFFF
+    return value, value + "\U0010ffff"
+
+
+def build_index(path: str, characters: Iterable[Dict], clans: Iterable[Dict], items: Iterable[Dict]) -> Dict[str, int]:
+    """
+    Grava um índice novo num arquivo temporário e o publica com os.replace
+    (atômico): quem está lendo continua no arquivo antigo até reabrir.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    counts = {}
+    try:
+        conn = sqlite3.connect(tmp)
+        try:
+            conn.executescript(SCHEMA)
+            for table, rows in (("characters", characters), ("clans", clans), ("items", items)):
+                columns = COLUMNS[table]
+                counts[table] = conn.executemany(
+                    f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                    (tuple(row.get(column) for column in columns) for row in rows),
+                ).rowcount
+                conn.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+                if table in EDIT_TABLES:
+                    key, column = KINDS[table]
+                    names = conn.execute(f"SELECT {key}, {column} FROM {table} WHERE length({column}) <= ?",
+                                         (MAX_EDIT_NAME,))
+                    conn.executemany(
+                        f"INSERT OR IGNORE INTO {table}_edits VALUES (?, ?)",
+                        ((variant, row_id) for row_id, name in names.fetchall() for variant in deletion_variants(name)),
+                    )
+            conn.execute("INSERT INTO meta VALUES ('built_at', ?)", (str(time.time()),))
+            conn.commit()
+            conn.execute("ANALYZE")
+        finally:
+            conn.close()
+        os.replace(tmp, path)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return counts
+
+
+def _connection() -> Optional[sqlite3.Connection]:
+    """Conexão somente leitura por thread, reaberta quando o arquivo do índice é trocado."""
+    try:
+        stat = os.stat(INDEX_PATH)
+    except FileNotFoundError:
+        return None
+    ident = (INDEX_PATH, stat.st_ino, stat.st_mtime_ns)
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.ident != ident:
+        if conn is not None:
+            conn.close()
+        conn = sqlite3.connect(f"{Path(INDEX_PATH).resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        _local.conn, _local.ident = conn, ident
+    return conn
+
+
+def _select(query: str, params: Dict) -> List[Dict]:
+    return LineageDB().select_or_raise(query, params)
+
+
+def _last_access(value: Any) -> Optional[datetime]:
+    # lastAccess é epoch em milissegundos na maioria dos emuladores (em segundos em alguns)
+    if not value:
+        return None
+    value = int(value)
+    if value > 10 ** 11:
+        value //= 1000
+    return datetime.fromtimestamp(value, tz=timezone.utc)
+
+
+class SearchIndex:
+    """
+    Índice local (SQLite + FTS5) de personagens, clãs e itens para as
+    buscas da API, sincronizado por um job do Celery (`atualizar_indice_busca`).
+    As buscas não tocam o banco do jogo: `LIKE '%x%'` nas tabelas do servidor
+    seria uma varredura completa a cada requisição.
+
+    A busca combina, nesta ordem: prefixo (range no índice do nome),
+    substring (FTS5 com tokenizer trigram, 3+ caracteres) e, se ainda faltar
+    resultado, a busca aproximada: nomes a uma edição de distância (índice
+    de variantes por deleção, só personagens e clãs) e candidatos que contêm
+    metade da consulta, ordenados por similaridade de trigramas.
+    """
+
+    @staticmethod
+    def _game_rows():
+        LineageStats = get_query_class("LineageStats")
+        characters, after = [], 0
+        while True:
+            page = _select(LineageStats.SQL_SEARCH_CHARACTERS_PAGE, {"after": after, "limit": PAGE_SIZE})
+            characters.extend(dict(row) for row in page)
+            if len(page) < PAGE_SIZE:
+                break
+            after = page[-1]["char_id"]
+        clans = [dict(row) for row in _select(LineageStats.SQL_SEARCH_CLANS, {})]
+        return characters, clans
+
+    @staticmethod
+    def _previous_rows(table: str) -> List[Dict]:
+        """Linhas do índice atual (mantidas quando o banco do jogo está fora)."""
+        conn = _connection()
+        if conn is None:
+            return []
+        return [dict(row) for row in conn.execute(f"SELECT * FROM {table}")]
+
+    @staticmethod
+    def _item_rows() -> List[Dict]:
+        from apps.lineage.inventory.models import CustomItem
+        from apps.lineage.inventory.utils.items import get_itens_json
+
+        custom_ids = set(CustomItem.objects.values_list("item_id", flat=True))
+        rows = []
+        for item_id, names in get_itens_json().items():
+            # Entradas reservadas do cliente ("(Not In Use") não são itens de verdade
+            if not names or not names[0] or names[0].startswith("(Not In Use"):
+                continue
+            rows.append({
+                "item_id": int(item_id),
+                "item_name": names[0],
+                "item_type": "custom" if int(item_id) in custom_ids else "game",
+                "description": " ".join(name for name in names[1:] if name),
+            })
+        return rows
+
+    @staticmethod
+    def rebuild() -> Dict[str, int]:
+        if LineageDB().is_connected():
+            characters, clans = SearchIndex._game_rows()
+        else:
+            logger.info("Banco do jogo indisponível: índice de busca mantém personagens e clãs da última sincronização")
+            characters, clans = SearchIndex._previous_rows("characters"), SearchIndex._previous_rows("clans")
+        return build_index(INDEX_PATH, characters, clans, SearchIndex._item_rows())
+
+    @staticmethod
+    def _search(table: str, query: str, limit: int) -> List[sqlite3.Row]:
+        query = " ".join(query.split())
+        conn = _connection()
+        if conn is None or not query:
+            return []
+        key, column = KINDS[table]
+        found: Dict[int, sqlite3.Row] = {}
+
+        def add(rows):
+            for row in rows:
+                if len(found) >= limit:
+                    break
+                found.setdefault(row[key], row)
+
+        low, high = _prefix_bounds(query)
+        add(conn.execute(
+            f"SELECT * FROM {table} WHERE {column} >= ? AND {column} < ? ORDER BY {column} LIMIT ?",
+            (low, high, limit),
+        ))
+
+        if len(found) < limit and len(query) >= 3:
+            add(conn.execute(
+                f"SELECT T.* FROM {table}_fts F JOIN {table} T ON T.{key} = F.rowid "
+                f"WHERE {table}_fts MATCH ? LIMIT ?",
+                (f"{column} : {_fts_phrase(query)}", limit + len(found)),
+            ))
+
+        if len(found) < limit and len(query) >= 3:
+            def ranked(rows):
+                scored = [(similarity(query, row[column]), row) for row in rows if row[key] not in found]
+                return sorted(scored, key=lambda pair: (-pair[0], pair[1][column]))
+
+            if table in EDIT_TABLES and len(query) <= MAX_EDIT_NAME:
+                variants = sorted(deletion_variants(query))
+                add(row for _, row in ranked(conn.execute(
+                    f"SELECT T.* FROM {table} T WHERE T.{key} IN ("
+                    f"SELECT id FROM {table}_edits WHERE variant IN ({', '.join('?' * len(variants))})) LIMIT ?",
+                    (*variants, limit),
+                )))
+
+            # Um erro de digitação quebra só uma das metades: candidatos com a outra intacta
+            half = len(query) // 2
+            halves = [part for part in (query[:half], query[half:]) if len(part) >= 3]
+            if len(found) < limit and halves:
+                candidates = conn.execute(
+                    f"SELECT T.* FROM {table}_fts F JOIN {table} T ON T.{key} = F.rowid "
+                    f"WHERE {table}_fts MATCH ? LIMIT ?",
+                    (" OR ".join(_fts_phrase(part) for part in halves), FUZZY_CANDIDATES),
+                )
+                add(row for score, row in ranked(candidates) if score >= SIMILARITY_THRESHOLD)
+
+        return list(found.values())
+
+    @staticmethod
+    def search_characters(query: str, limit: int = 20) -> List[Dict]:
+        return [
+            {
+                "char_id": row["char_id"],
+                "char_name": row["char_name"],
+                "level": row["level"] or 0,
+                "class_name": get_class_name(row["class_id"]),
+                "clan_name": row["clan_name"],
+                "online": bool(row["online"]),
+                "last_access": _last_access(row["last_access"]),
+            }
+            for row in SearchIndex._search("characters", query, limit)
+        ]
+
+    @staticmethod
+    def search_items(query: str, limit: int = 20) -> List[Dict]:
+        return [dict(row) for row in SearchIndex._search("items", query, limit)]
+
+    @staticmethod
+    def get_clan_details(clan_name: str) -> Optional[Dict]:
+        conn = _connection()
+        if conn is None:
+            return None
+        row = conn.execute("SELECT * FROM clans WHERE clan_name = ? LIMIT 1", (clan_name.strip(),)).fetchone()
+        return dict(row) if row else None
+
+    @staticmethod
+    def info() -> Dict[str, Any]:
+        conn = _connection()
+        if conn is None:
+            return {}
+        info = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in KINDS}
+        info.update({row["key"]: row["value"] for row in conn.execute("SELECT key, value FROM meta")})
+        return info
@@ -1,4 +1,8 @@
+import os
+
 from celery import shared_task
+from celery.signals import worker_ready
+from str2bool import str2bool
 
 
 @shared_task
@@ -18,3 +22,96 @@ def verificar_cupons_expirados():
         if apoiador and apoiador.status == 'aprovado':
             apoiador.status = 'expirado'
             apoiador.save()
+
+
+@shared_task
+def processar_entregas():
+    """Entrega no banco do jogo as moedas/itens da fila (GameDelivery), em lotes por personagem."""
+    from apps.lineage.server.database import LineageDB
+    from apps.lineage.server.delivery import DeliveryQueue
+
+    if not LineageDB().is_connected():
+        return {}
+
+    try:
+        return DeliveryQueue.drain()
+    except Exception as e:
+        print(f"❌ Erro ao processar fila de entregas: {e}")
+        return {}
+
+
+@shared_task
+def aquecer_caches():
+    """Enche o cache das páginas e da API públicas (mesmo trabalho do comando `prewarm_caches`)."""
+    from django.core.cache import cache
+    from apps.lineage.server.database import LineageDB
+    from apps.lineage.server.prewarm import collect_targets, prewarm
+
+    if not LineageDB().is_connected():
+        return {}
+    # Vários workers sobem juntos num deploy: só um aquece
+    if not cache.add("lineage_prewarm:lock", 1, timeout=300):
+        return {}
+
+    try:
+        resultados = prewarm(collect_targets())
+    finally:
+        cache.delete("lineage_prewarm:lock")
+    falhas = [r.name for r in resultados if not r.ok]
+    if falhas:
+        print(f"❌ Erro ao aquecer {len(falhas)} chaves: {', '.join(falhas)}")
+    return {"aquecidas": len(resultados) - len(falhas), "falhas": len(falhas)}
+
+
+@worker_ready.connect
+def aquecer_caches_apos_deploy(sender=None, **kwargs):
+    # Worker novo (deploy, restart): aquece antes do tráfego chegar às páginas
+    if str2bool(os.environ.get('LINEAGE_PREWARM_ON_START', True)):
+        aquecer_caches.delay()
+
+
+@shared_task
+def atualizar_indice_busca():
+    """Sincroniza o índice local de busca (personagens, clãs e itens) usado pela API."""
+    from apps.lineage.server.search_index import SearchIndex
+
+    try:
+        return SearchIndex.rebuild()
+    except Exception as e:
+        print(f"❌ Erro ao atualizar índice de busca: {e}")
+        return {}
+
+
+@shared_task
+def atualizar_agregado_adena(completo=False):
+    """Atualiza o patrimônio por personagem (Redis) usado pelo top de adena."""
+    from apps.lineage.server.adena_aggregator import AdenaAggregator
+    from apps.lineage.server.database import LineageDB
+    from apps.lineage.server.rankings import adena_params
+
+    if not LineageDB().is_connected():
+        return {}
+
+    try:
+        return AdenaAggregator.refresh(full=completo, **adena_params())
+    except Exception as e:
+        print(f"❌ Erro ao atualizar agregado de adena: {e}")
+        return {}
+
+
+@shared_task
+def atualizar_rankings():
+    """Gera os snapshots dos rankings (Redis) a partir do banco do jogo."""
+    from apps.lineage.server.database import LineageDB
+    from apps.lineage.server.rankings import RANKINGS, RankingSnapshot, ranking_params
+
+    if not LineageDB().is_connected():
+        return {}
+
+    publicados = {}
+    for nome in RANKINGS:
+        try:
+            publicados[nome] = RankingSnapshot.refresh(nome, **ranking_params(nome))
+        except Exception as e:
+            print(f"❌ Erro ao atualizar ranking {nome}: {e}")
+    return publicados
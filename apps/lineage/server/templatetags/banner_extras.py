@@ -1,6 +1,7 @@
 from django import template
 from django.template.defaultfilters import stringfilter
 from ..models import IndexConfig
+from utils.config_cache import get_config
 
 register = template.Library()
 
@@ -11,7 +12,7 @@ def get_banner_image():
     Retorna a imagem do banner configurada no admin
     """
     try:
-        config = IndexConfig.objects.first()
+        config = get_config(IndexConfig)
         if config and config.imagem_banner:
             return config.imagem_banner
     except:
@@ -25,7 +26,7 @@ def get_banner_url():
     Retorna a URL da imagem do banner configurada no admin
     """
     try:
-        config = IndexConfig.objects.first()
+        config = get_config(IndexConfig)
         if config and config.imagem_banner:
             return config.imagem_banner.url
     except:
@@ -1,3 +1,994 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import types
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.core.cache import cache as django_cache
+from django.test import RequestFactory, SimpleTestCase
+from PIL import Image
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import mysql
+from sqlalchemy.exc import OperationalError
+
+from apps.lineage.server.adena_aggregator import AdenaAggregator, merge_top_rows, params_signature
+from apps.lineage.server.character_summary import subclass_columns, subclass_joins
+from apps.lineage.server import delivery as delivery_module
+from apps.lineage.server import prewarm
+from apps.lineage.server.database import LineageCircuitBreaker, LineageDB, LineageResultCache
+from apps.lineage.server.delivery import DeliveryQueue, group_by_character
+from apps.lineage.server.metrics import LineageQueryMetrics, resolve_caller_label
+from apps.lineage.server.models import GameDelivery
+from apps.lineage.server.object_ids import OBJECT_ID_MIN, ObjectIdAllocator, next_block
+from apps.lineage.server.querys.dialects import SCHEMAS, QueryCompiler, compiler_for
+from apps.lineage.server.rankings import RankingSnapshot, build_snapshot, get_ranking
+from apps.lineage.server.search_index import SearchIndex, build_index
+from apps.lineage.server.views.crest_views import crest_image_view
+from apps.lineage.server.utils import crest as crest_module
+from apps.lineage.server.utils import password_hash
+from apps.lineage.server.utils.crest import attach_crests_to_clans
+from apps.lineage.server.utils.password_hash import PasswordHash, available_backends
+from apps.lineage.server.utils.cache import (
+    acached_lineage_call, cache_lineage_result, invalidates_lineage_cache, make_lineage_cache_key,
+)
+
+
+class LineageResultCacheTestCase(SimpleTestCase):
+
+    def test_hit_and_miss_counters(self):
+        cache = LineageResultCache(max_entries=10, default_ttl=60)
+        key = ("SELECT 1", ())
+
+        self.assertIsNone(cache.get(key))
+        cache.set(key, [{"a": 1}])
+        self.assertEqual(cache.get(key), [{"a": 1}])
+
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+
+    def test_lru_eviction_by_entries(self):
+        cache = LineageResultCache(max_entries=2, default_ttl=60)
+        cache.set(("q1", ()), [{"v": 1}])
+        cache.set(("q2", ()), [{"v": 2}])
+        cache.get(("q1", ()))  # q1 passa a ser o mais recente
+        cache.set(("q3", ()), [{"v": 3}])
+
+        self.assertIsNone(cache.get(("q2", ())))
+        self.assertIsNotNone(cache.get(("q1", ())))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_eviction_by_bytes(self):
+        row = [{"name": "x" * 1000}]
+        size = LineageResultCache._estimate_size(row)
+        cache = LineageResultCache(max_entries=100, max_bytes=size * 2, default_ttl=60)
+        for i in range(5):
+            cache.set((f"q{i}", ()), [{"name": "x" * 1000}])
+
+        self.assertLessEqual(cache.stats()["bytes"], size * 2)
+        self.assertEqual(len(cache), 2)
+
+    def test_per_entry_ttl(self):
+        cache = LineageResultCache(max_entries=10, default_ttl=60)
+        with mock.patch("apps.lineage.server.database.time.monotonic", return_value=100.0):
+            cache.set(("short", ()), [{"v": 1}], ttl=5)
+            cache.set(("long", ()), [{"v": 2}])
+        with mock.patch("apps.lineage.server.database.time.monotonic", return_value=110.0):
+            self.assertIsNone(cache.get(("short", ())))
+            self.assertIsNotNone(cache.get(("long", ())))
+        self.assertEqual(cache.stats()["expirations"], 1)
+
+
+class LineageCircuitBreakerTestCase(SimpleTestCase):
+
+    def test_opens_after_threshold_and_half_opens_after_timeout(self):
+        breaker = LineageCircuitBreaker(failure_threshold=2, reset_timeout=20)
+        with mock.patch("apps.lineage.server.database.time.time", return_value=100.0):
+            breaker.record_failure()
+            self.assertTrue(breaker.allow_request())
+            breaker.record_failure()
+            self.assertEqual(breaker.state, LineageCircuitBreaker.OPEN)
+            self.assertFalse(breaker.allow_request())
+        with mock.patch("apps.lineage.server.database.time.time", return_value=121.0):
+            self.assertTrue(breaker.allow_request())
+            self.assertEqual(breaker.state, LineageCircuitBreaker.HALF_OPEN)
+            breaker.record_success()
+        self.assertEqual(breaker.state, LineageCircuitBreaker.CLOSED)
+
+    def test_half_open_admits_a_single_probe(self):
+        breaker = LineageCircuitBreaker(failure_threshold=1, reset_timeout=20)
+        with mock.patch("apps.lineage.server.database.time.time", return_value=100.0):
+            breaker.record_failure()
+        with mock.patch("apps.lineage.server.database.time.time", return_value=121.0):
+            self.assertTrue(breaker.allow_request())
+            self.assertFalse(breaker.allow_request())  # o teste ainda não reportou
+        with mock.patch("apps.lineage.server.database.time.time", return_value=142.0):
+            self.assertTrue(breaker.allow_request())  # teste sem resposta: libera outro
+            breaker.record_success()
+            self.assertTrue(breaker.allow_request())
+            self.assertTrue(breaker.allow_request())
+
+    def test_half_open_failure_reopens(self):
+        breaker = LineageCircuitBreaker(failure_threshold=1, reset_timeout=20)
+        with mock.patch("apps.lineage.server.database.time.time", return_value=100.0):
+            breaker.record_failure()
+        with mock.patch("apps.lineage.server.database.time.time", return_value=130.0):
+            breaker.allow_request()
+            self.assertTrue(breaker.record_failure())
+            self.assertFalse(breaker.allow_request())
+
+    def test_shared_state_newer_wins(self):
+        breaker = LineageCircuitBreaker()
+        breaker.apply_shared(LineageCircuitBreaker.OPEN, changed_at=time.time() + 5)
+        self.assertEqual(breaker.state, LineageCircuitBreaker.OPEN)
+        breaker.apply_shared(LineageCircuitBreaker.CLOSED, changed_at=1.0)
+        self.assertEqual(breaker.state, LineageCircuitBreaker.OPEN)
+
+
+class LineageStatementCacheTestCase(SimpleTestCase):
+
+    def test_statement_is_reused_and_lists_expand(self):
+        sql = "UPDATE accounts SET password = :password WHERE login IN :logins"
+        stmt1, _ = LineageDB._prepare(sql, {"password": "x", "logins": ["a", "b"]})
+        stmt2, params = LineageDB._prepare(sql, {"password": "y", "logins": ["c", "d", "e"]})
+        self.assertIs(stmt1, stmt2)
+
+        compiled = stmt2.bindparams(**params).compile(dialect=mysql.dialect(), compile_kwargs={"render_postcompile": True})
+        self.assertEqual(compiled.string.count("%s"), 4)
+        self.assertEqual(params["logins"], ["c", "d", "e"])
+
+    def test_cache_key_accepts_list_params(self):
+        key = LineageDB._cache_key("SELECT 1 WHERE x IN :ids", {"ids": [1, 2]})
+        self.assertEqual(key, ("SELECT 1 WHERE x IN :ids", (("ids", (1, 2)),)))
+        hash(key)
+
+
+class LineageDBSQLiteTestCase(SimpleTestCase):
+    """LineageDB sobre arquivos SQLite (primário e réplicas) em vez do MySQL do jogo."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db = object.__new__(LineageDB)
+        self.db._initialized = False
+        with mock.patch.dict(os.environ, {"LINEAGE_DB_ENABLED": "false"}), mock.patch("builtins.print"):
+            self.db.__init__()
+        self.db.enabled = True
+        self.db.metrics = LineageQueryMetrics()
+        self.db.engine = self._engine("primario", ["Ana", "Bia"])
+
+    def _engine(self, name, chars):
+        path = os.path.join(self.tmp.name, f"{name}.sqlite3")
+        with sqlite3.connect(path) as conn:
+            conn.execute("CREATE TABLE characters (obj_Id INTEGER PRIMARY KEY, char_name TEXT NOT NULL)")
+            conn.executemany("INSERT INTO characters (char_name) VALUES (?)", [(c,) for c in chars])
+        engine = create_engine(f"sqlite:///{path}")
+        self.addCleanup(engine.dispose)
+        return engine
+
+    def _names(self, **kwargs):
+        return [row["char_name"] for row in self.db.select("SELECT char_name FROM characters ORDER BY obj_Id", **kwargs)]
+
+    def _recorded(self):
+        queries = self.db.metrics.snapshot()["queries"].values()
+        return sum(stats["count"] for stats in queries), sum(stats["errors"] for stats in queries)
+
+    def test_transaction_rolls_back_on_error(self):
+        with self.assertRaises(ValueError):
+            with self.db.transaction() as tx:
+                tx.insert("INSERT INTO characters (char_name) VALUES (:name)", {"name": "Caio"})
+                tx.execute_many("UPDATE characters SET char_name = :new WHERE char_name = :old",
+                                [{"old": "Ana", "new": "Ana2"}, {"old": "Bia", "new": "Bia2"}])
+                self.assertEqual(len(tx.select("SELECT obj_Id FROM characters")), 3)
+                raise ValueError("falha no meio da entrega")
+
+        self.assertEqual(self._names(), ["Ana", "Bia"])
+
+        with self.db.transaction() as tx:
+            tx.execute_many("INSERT INTO characters (char_name) VALUES (:name)", [{"name": "Caio"}, {"name": "Davi"}])
+        self.assertEqual(self._names(), ["Ana", "Bia", "Caio", "Davi"])
+
+    def test_execute_many_is_recorded_in_metrics(self):
+        self.assertEqual(self.db.execute_many("INSERT INTO characters (char_name) VALUES (:name)",
+                                              [{"name": "Caio"}, {"name": "Davi"}]), 2)
+        self.assertEqual(self._recorded(), (1, 0))
+
+        with mock.patch("builtins.print"):
+            self.assertIsNone(self.db.execute_many("INSERT INTO characters (char_name) VALUES (:name)",
+                                                   [{"name": None}]))
+        self.assertEqual(self._recorded(), (2, 1))
+
+    def test_replica_marked_down_is_skipped_and_consistent_reads_primary(self):
+        offline = create_engine(f"sqlite:///{os.path.join(self.tmp.name, 'inexistente', 'replica.sqlite3')}")
+        replica = self._engine("replica", ["Ana"])
+        self.db.replicas = [offline, replica]
+
+        with mock.patch("builtins.print"):
+            self.assertEqual(self._names(), ["Ana"])
+        self.assertNotIn(offline, self.db._read_engines())
+        # Dentro do cooldown a réplica fora do ar nem é tentada, mesmo quando é a vez dela no round-robin
+        for _ in self.db.replicas:
+            self.assertEqual(self._names(), ["Ana"])
+        self.assertEqual(self._recorded(), (4, 1))
+
+        self.assertEqual(self.db._read_engines(consistent=True), [self.db.engine])
+        self.assertEqual(self._names(consistent=True), ["Ana", "Bia"])
+
+    def test_query_error_on_replica_does_not_fail_over(self):
+        # Réplica conecta, mas a query falha na execução (como um timeout de leitura)
+        replica = create_engine(f"sqlite:///{os.path.join(self.tmp.name, 'vazia.sqlite3')}")
+        self.addCleanup(replica.dispose)
+        self.db.replicas = [replica]
+
+        with mock.patch("builtins.print"):
+            self.assertEqual(self._names(), [])
+            # Quem precisa distinguir "sem linhas" de "sem resposta" usa select_or_raise
+            with self.assertRaises(RuntimeError):
+                self.db.select_or_raise("SELECT char_name FROM characters")
+        self.assertIn(replica, self.db._read_engines())
+        self.assertEqual(self._recorded(), (2, 2))
+        self.assertEqual([row["char_name"] for row in self.db.select_or_raise(
+            "SELECT char_name FROM characters ORDER BY obj_Id", consistent=True)], ["Ana", "Bia"])
+
+    def test_stream_yields_chunks_and_surfaces_errors(self):
+        self.db.execute_many("INSERT INTO characters (char_name) VALUES (:name)",
+                             [{"name": f"Char{i}"} for i in range(5)])
+        chunks = list(self.db.stream_chunks("SELECT char_name FROM characters ORDER BY obj_Id", chunk_size=3))
+        self.assertEqual([len(chunk) for chunk in chunks], [3, 3, 1])
+        self.assertEqual([row["char_name"] for row in self.db.stream("SELECT char_name FROM characters")][:2],
+                         ["Ana", "Bia"])
+
+        # abs() do menor inteiro estoura no SQLite: erro só ao chegar na quarta linha
+        sql = ("SELECT CASE WHEN obj_Id = 4 THEN abs(-9223372036854775807 - 1) ELSE obj_Id END AS v "
+               "FROM characters ORDER BY obj_Id")
+        received = []
+        with mock.patch("builtins.print"), self.assertRaises(OperationalError):
+            for chunk in self.db.stream_chunks(sql, chunk_size=2):
+                received.append(chunk)
+        self.assertEqual([len(chunk) for chunk in received], [2])
+        self.assertEqual(self._recorded()[1], 1)
+
+    def test_stream_skips_unreachable_replica(self):
+        offline = create_engine(f"sqlite:///{os.path.join(self.tmp.name, 'inexistente', 'replica.sqlite3')}")
+        self.db.replicas = [offline, self._engine("replica", ["Ana"])]
+
+        with mock.patch("builtins.print"):
+            rows = list(self.db.stream("SELECT char_name FROM characters"))
+        self.assertEqual([row["char_name"] for row in rows], ["Ana"])
+        self.assertNotIn(offline, self.db._read_engines())
+
+        # Conexão perdida antes da primeira linha: repete no próximo engine (aqui, o primário)
+        dropped = mock.MagicMock()
+        dropped.execution_options.return_value = dropped
+        dropped.execute.side_effect = OperationalError("SELECT", {}, Exception("lost"), connection_invalidated=True)
+        self.db.replicas = [mock.Mock(connect=mock.Mock(return_value=dropped))]
+        with mock.patch("builtins.print"):
+            rows = list(self.db.stream("SELECT char_name FROM characters ORDER BY obj_Id"))
+        self.assertEqual([row["char_name"] for row in rows], ["Ana", "Bia"])
+
+    def test_deliver_merges_only_unenchanted_stacks(self):
+        from apps.lineage.server.querys import query_acis_v2
+
+        with self.db.engine.begin() as conn:
+            conn.exec_driver_sql(
+                "CREATE TABLE items (owner_id INTEGER, object_id INTEGER, item_id INTEGER, count INTEGER, "
+                "enchant_level INTEGER, loc TEXT, loc_data INTEGER)"
+            )
+            conn.exec_driver_sql(
+                "INSERT INTO items VALUES (1, 10, 57, 500, 0, 'INVENTORY', 0), (1, 11, 6579, 1, 0, 'INVENTORY', 1)"
+            )
+
+        deliver = query_acis_v2.TransferFromWalletToChar._deliver
+        with mock.patch.object(query_acis_v2, "next_object_id", side_effect=[100, 101, 102]), \
+                self.db.transaction() as tx:
+            self.assertTrue(deliver(tx, 1, 57, 250))       # adena: soma na pilha
+            self.assertTrue(deliver(tx, 1, 6579, 1))       # arma: outra linha
+            self.assertTrue(deliver(tx, 1, 6579, 1, 16))   # arma +16: outra linha
+            self.assertTrue(deliver(tx, 1, 4037, 3))       # item novo
+
+        rows = self.db.select("SELECT object_id, item_id, count, enchant_level FROM items ORDER BY object_id")
+        self.assertEqual([tuple(row.values()) for row in rows], [
+            (10, 57, 750, 0), (11, 6579, 1, 0), (100, 6579, 1, 0), (101, 6579, 1, 16), (102, 4037, 3, 0),
+        ])
+
+    def test_delivery_keys_commit_with_the_items(self):
+        from apps.lineage.server import delivery_log
+        from apps.lineage.server.querys import query_classic
+
+        with self.db.engine.begin() as conn:
+            conn.exec_driver_sql(
+                "CREATE TABLE items_delayed (payment_id INTEGER, owner_id INTEGER, item_id INTEGER, count INTEGER, "
+                "enchant_level INTEGER, variationId1 INTEGER, variationId2 INTEGER, flags INTEGER, "
+                "payment_status INTEGER, description TEXT)"
+            )
+
+        transfer = query_classic.TransferFromWalletToChar
+        with mock.patch.object(delivery_log, "LineageDB", return_value=self.db), \
+                mock.patch.object(delivery_log, "_ready", False), \
+                mock.patch.object(query_classic, "LineageDB", return_value=self.db), \
+                mock.patch("builtins.print"):
+            self.assertTrue(delivery_log.ensure_table())
+            self.assertTrue(transfer.insert_coins("Ana", [(57, 100, 0), (4037, 2, 0)], keys=["k1", "k2"]))
+            # Item inexistente derruba o lote inteiro: a chave também não fica
+            with mock.patch.object(transfer, "_deliver", side_effect=[True, False]):
+                self.assertIsNone(transfer.insert_coins("Bia", [(57, 1, 0), (0, 1, 0)], keys=["k3"]))
+            self.assertEqual(delivery_log.delivered_keys(["k1", "k2", "k3"]), {"k1", "k2"})
+
+        self.assertEqual(len(self.db.select("SELECT item_id FROM items_delayed")), 2)
+
+
+class LineageQueryMetricsTestCase(SimpleTestCase):
+
+    def test_record_merge_and_slow_log(self):
+        metrics = LineageQueryMetrics(slow_ms=100, slow_log_size=2)
+        metrics.record("LineageStats.top_pvp", "SELECT 1", {}, 3.0, rows=10)
+        metrics.record("LineageStats.top_pvp", "SELECT 1", {}, 40.0, rows=10)
+        metrics.record("LineageAccount.update_password", "UPDATE x", {"password": "segredo", "login": "joao"},
+                       150.0, error=True)
+
+        report = LineageQueryMetrics.merge([metrics.snapshot(), metrics.snapshot()])
+        top_pvp = report["queries"]["LineageStats.top_pvp"]
+        self.assertEqual(top_pvp["count"], 4)
+        self.assertEqual(top_pvp["rows"], 40)
+        self.assertEqual(top_pvp["max_ms"], 40.0)
+        self.assertEqual(top_pvp["p95_ms"], 50.0)
+        self.assertEqual(report["queries"]["LineageAccount.update_password"]["errors"], 2)
+
+        slow = metrics.snapshot()["slow_queries"]
+        self.assertEqual(len(slow), 1)
+        self.assertEqual(slow[0]["params"], ["login", "password"])
+
+    def test_caller_label_skips_private_helpers(self):
+        module = types.ModuleType("apps.lineage.server.querys.query_fake")
+        exec(
+            "class LineageStats:\n"
+            "    @staticmethod\n"
+            "    def _run_query(resolve):\n"
+            "        return resolve()\n"
+            "    @staticmethod\n"
+            "    def top_pvp(resolve):\n"
+            "        return LineageStats._run_query(resolve)\n",
+            module.__dict__,
+        )
+        self.assertEqual(module.LineageStats.top_pvp(resolve_caller_label), "LineageStats.top_pvp")
+
+
+class CacheLineageResultTestCase(SimpleTestCase):
+
+    def setUp(self):
+        django_cache.clear()
+
+    def test_stale_value_is_served_while_refreshing(self):
+        calls = []
+
+        @cache_lineage_result(timeout=60, stale_ttl=60)
+        def top_fake():
+            calls.append(1)
+            return [{"n": len(calls)}]
+
+        self.assertEqual(top_fake(), [{"n": 1}])
+        key = make_lineage_cache_key(__name__, "top_fake")
+        django_cache.delete(f"{key}:fresh")  # simula o fim do soft TTL
+
+        with mock.patch("apps.lineage.server.utils.cache._refresh_executor.submit", side_effect=lambda fn: fn()):
+            self.assertEqual(top_fake(), [{"n": 1}])  # valor antigo, sem esperar
+        self.assertEqual(top_fake(), [{"n": 2}])
+        self.assertEqual(len(calls), 2)
+
+    def test_waits_for_worker_holding_the_lock(self):
+        calls = []
+
+        @cache_lineage_result(timeout=60)
+        def top_fake():
+            calls.append(1)
+            return [{"n": 1}]
+
+        key = make_lineage_cache_key(__name__, "top_fake")
+        django_cache.add(f"{key}:lock", "outro-worker", timeout=30)
+        timer = threading.Timer(0.1, lambda: django_cache.set(key, [{"n": 99}], timeout=60))
+        timer.start()
+        self.assertEqual(top_fake(), [{"n": 99}])
+        timer.join()
+        self.assertEqual(calls, [])
+
+    def test_none_results_are_cached_and_waiters_stop_when_the_lock_is_released(self):
+        calls = []
+
+        @cache_lineage_result(timeout=60)
+        def get_fake():
+            calls.append(1)
+            return None
+
+        self.assertIsNone(get_fake())
+        self.assertIsNone(get_fake())
+        self.assertEqual(calls, [1])
+
+        # Dono do lock terminou sem deixar valor: o waiter não espera o LOCK_WAIT inteiro
+        key = make_lineage_cache_key(__name__, "get_fake")
+        django_cache.delete(key)
+        django_cache.add(f"{key}:lock", "outro-worker", timeout=30)
+        timer = threading.Timer(0.1, lambda: django_cache.delete(f"{key}:lock"))
+        timer.start()
+        start = time.monotonic()
+        self.assertIsNone(get_fake())
+        timer.join()
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(calls, [1, 1])
+
+    def test_async_call_shares_the_sync_entry_and_single_flight(self):
+        calls = []
+
+        @cache_lineage_result(timeout=60, stale_ttl=60)
+        def top_fake(limit=10):
+            calls.append("sync")
+            return [{"n": limit}]
+
+        async def top_fake_async(limit=10):
+            calls.append("async")
+            return [{"n": limit}]
+
+        self.assertEqual(async_to_sync(acached_lineage_call)(top_fake, top_fake_async, limit=3), [{"n": 3}])
+        self.assertEqual(top_fake(limit=3), [{"n": 3}])
+        self.assertEqual(calls, ["async"])
+
+        # Outro worker recalculando: o consumer espera o valor dele em vez de ir ao banco
+        key = make_lineage_cache_key(__name__, "top_fake", (), {"limit": 5})
+        django_cache.add(f"{key}:lock", "outro-worker", timeout=30)
+        timer = threading.Timer(0.1, lambda: django_cache.set(key, [{"n": 99}], timeout=60))
+        timer.start()
+        self.assertEqual(async_to_sync(acached_lineage_call)(top_fake, top_fake_async, limit=5), [{"n": 99}])
+        timer.join()
+        self.assertEqual(calls, ["async"])
+
+    def test_writes_invalidate_dependent_reads_and_are_never_memoized(self):
+        accounts = {"joao": "Joao", "maria": "Maria"}
+        writes = []
+
+        @cache_lineage_result(timeout=3600, depends_on=("account:{login}",))
+        def find_chars(login):
+            return [{"char_name": accounts[login]}]
+
+        @invalidates_lineage_cache("account:{logins_list}")
+        def rename_all(logins_list, suffix="_novo"):
+            writes.append(list(logins_list))
+            for login in logins_list:
+                accounts[login] += suffix
+            return True
+
+        self.assertEqual(find_chars("joao"), [{"char_name": "Joao"}])
+        self.assertEqual(find_chars("maria"), [{"char_name": "Maria"}])
+
+        self.assertTrue(rename_all(["joao"]))
+        self.assertTrue(rename_all(["joao"]))
+        self.assertEqual(len(writes), 2)
+
+        self.assertEqual(find_chars("joao"), [{"char_name": "Joao_novo_novo"}])
+        # Conta não envolvida na escrita continua vindo do cache
+        accounts["maria"] = "Alterada fora do painel"
+        self.assertEqual(find_chars("maria"), [{"char_name": "Maria"}])
+
+    def test_bad_invalidation_tag_does_not_replace_the_write_result(self):
+        @invalidates_lineage_cache("account:{login}")
+        def change_email(acc, email):
+            return 1
+
+        with self.assertLogs("apps.lineage.server.utils.cache", level="ERROR"):
+            self.assertEqual(change_email("joao", "joao@exemplo.com"), 1)
+
+
+class RankingSnapshotTestCase(SimpleTestCase):
+
+    def test_scores_preserve_sql_order_and_encode_decimals(self):
+        rows = [
+            {"char_name": "B", "adenas": Decimal("300")},
+            {"char_name": "A", "adenas": Decimal("300")},
+            {"char_name": "C", "adenas": Decimal("10.5")},
+        ]
+        scores, details = build_snapshot(rows, "char_name")
+
+        self.assertEqual(sorted(scores, key=scores.get, reverse=True), ["B", "A", "C"])
+        self.assertEqual(json.loads(details["A"])["adenas"], 300)
+        self.assertEqual(json.loads(details["C"])["adenas"], 10.5)
+
+    def test_falls_back_to_query_without_redis(self):
+        with mock.patch.object(RankingSnapshot, "page", return_value=None), \
+                mock.patch("apps.lineage.server.rankings.LineageDB") as db, \
+                mock.patch("apps.lineage.server.rankings.LineageStats") as stats:
+            db.return_value.is_connected.return_value = True
+            stats.top_pvp.return_value = [{"char_name": str(i)} for i in range(15)]
+            self.assertEqual(get_ranking("pvp", limit=5, offset=10), [{"char_name": str(i)} for i in range(10, 15)])
+            stats.top_pvp.assert_called_once_with(limit=15)
+
+    def test_api_prewarm_reads_adena_with_snapshot_params(self):
+        from apps.api import prewarm as api_prewarm
+
+        params = {"adn_billion_item": 4037, "value_item": 1000000000}
+        with mock.patch("apps.lineage.server.rankings.adena_params", return_value=params), \
+                mock.patch.object(api_prewarm, "get_ranking", return_value=[]) as ranking, \
+                mock.patch.object(prewarm, "cache"):
+            prewarm._targets["api:api_top_rich_10"].loader()
+            prewarm._targets["api:api_top_pvp_10"].loader()
+        ranking.assert_any_call("adena", limit=10, **params)
+        ranking.assert_any_call("pvp", limit=10)
+
+
+class AdenaAggregatorTestCase(SimpleTestCase):
+
+    def test_merge_matches_sql_order_and_skips_missing_owners(self):
+        owner_ids = ["1", "2", "3", "4"]
+        totals = [b"500:0", b"100:2", b"500:0", b"900:0"]
+        details = [
+            {"owner_id": 1, "char_name": "Beta", "onlinetime": 10},
+            {"owner_id": 2, "char_name": "Gama", "onlinetime": 5},
+            {"owner_id": 3, "char_name": "Alfa", "onlinetime": 10},
+            # 4 foi apagado (ou virou GM): não volta na consulta de detalhes
+        ]
+        rows = merge_top_rows(owner_ids, totals, details, value_item=1000)
+
+        self.assertEqual([row["char_name"] for row in rows], ["Gama", "Alfa", "Beta"])
+        self.assertEqual(rows[0]["adenas"], 2100)
+        self.assertNotIn("owner_id", rows[0])
+
+    def test_top_requires_matching_bonus_params(self):
+        self.assertEqual(params_signature(0, 1000000), params_signature(0, 1000000000))
+        self.assertNotEqual(params_signature(4037, 1000000), params_signature(4037, 1000000000))
+
+        client = mock.Mock()
+        client.hget.return_value = params_signature(4037, 1000000).encode()
+        with mock.patch("apps.lineage.server.adena_aggregator.get_redis_client", return_value=client):
+            self.assertIsNone(AdenaAggregator.top(10, adn_billion_item=4037, value_item=1000000000))
+        client.zrange.assert_not_called()
+
+
+class CharacterSummaryTestCase(SimpleTestCase):
+
+    def _summary(self, subclasses_table, rows, **options):
+        conn = sqlite3.connect(":memory:")
+        conn.row_factory = sqlite3.Row
+        conn.execute("CREATE TABLE characters (obj_Id INTEGER PRIMARY KEY, account_name TEXT)")
+        conn.execute(subclasses_table)
+        conn.executemany("INSERT INTO characters VALUES (?, ?)", [(1, "joao"), (2, "joao"), (3, "maria")])
+        conn.executemany("INSERT INTO character_subclasses VALUES (?, ?, ?, ?)", rows)
+        sql = f"""
+            SELECT C.obj_Id, {subclass_columns(include_base="base_flag" in options)}
+            FROM characters AS C
+            {subclass_joins("char_obj_id", **options)}
+            WHERE C.account_name = :login
+            ORDER BY C.obj_Id
+        """
+        return [dict(row) for row in conn.execute(sql, {"login": "joao"})]
+
+    def test_slots_by_class_index(self):
+        result = self._summary(
+            "CREATE TABLE character_subclasses (char_obj_id INT, class_id INT, level INT, class_index INT)",
+            [(1, 10, 80, 0), (1, 40, 76, 1), (1, 50, 60, 2), (3, 70, 80, 1)],
+        )
+        self.assertEqual(result[0]["subclass1"], 40)
+        self.assertEqual(result[0]["subclass2_level"], 60)
+        self.assertIsNone(result[0]["subclass3"])
+        # Personagem sem subclasses continua na listagem
+        self.assertEqual(result[1], dict(result[1], obj_Id=2, subclass1=None))
+
+    def test_slots_by_is_base_flag(self):
+        result = self._summary(
+            "CREATE TABLE character_subclasses (char_obj_id INT, class_id INT, level INT, isBase TEXT)",
+            [(1, 90, 85, "0"), (1, 10, 80, "1"), (1, 40, 76, "0"), (1, 60, 70, "0")],
+            base_flag="isBase",
+        )
+        self.assertEqual((result[0]["base_class"], result[0]["base_level"]), (10, 80))
+        self.assertEqual(
+            [result[0][f"subclass{slot}"] for slot in (1, 2, 3)], [40, 60, 90]
+        )
+        self.assertEqual(result[0]["subclass3_level"], 85)
+
+
+class DialectConformanceTestCase(SimpleTestCase):
+    """O SQL gerado para cada dialeto devolve o mesmo resultado sobre os mesmos dados."""
+
+    def _database(self, dialect):
+        schema = SCHEMAS[dialect]
+        char_id, access = schema["char_id"], schema["access_level"]
+        item, count = schema["item_id"], schema["item_count"]
+        engine = create_engine("sqlite://")
+        conn = engine.connect()
+        raw = conn.connection.dbapi_connection
+        raw.executescript(f"""
+            CREATE TABLE characters ({char_id} INTEGER PRIMARY KEY, account_name TEXT, char_name TEXT,
+                {access} INTEGER, online INTEGER, onlinetime INTEGER, pvpkills INTEGER, pkkills INTEGER,
+                clanid INTEGER, lastAccess INTEGER, classid INTEGER, level INTEGER, exp INTEGER);
+            CREATE TABLE character_subclasses ({schema["subclass_owner"]} INTEGER, class_id INTEGER,
+                level INTEGER, exp INTEGER, class_index INTEGER, isBase TEXT);
+            CREATE TABLE clan_data (clan_id INTEGER PRIMARY KEY, clan_name TEXT, clan_level INTEGER,
+                reputation_score INTEGER, ally_id INTEGER, ally_name TEXT, leader_id INTEGER, leader_name TEXT);
+            CREATE TABLE clan_subpledges (clan_id INTEGER, sub_pledge_id INTEGER, type INTEGER, name TEXT,
+                leader_id INTEGER, leader_name TEXT);
+            CREATE TABLE ally_data (ally_id INTEGER PRIMARY KEY, ally_name TEXT);
+            CREATE TABLE items (owner_id INTEGER, {item} INTEGER, {count} INTEGER);
+        """)
+        raw.executemany("INSERT INTO characters VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", [
+            (1, "joao", "Ana", 0, 1, 500, 10, 2, 1, 100, 10, 80, 8000),
+            (2, "joao", "Bia", 0, 0, 300, 10, 2, 1, 100, 20, 76, 7600),
+            (3, "maria", "Caio", 0, 0, 900, 3, 7, 2, 100, 30, 80, 8100),
+            (4, "gm", "Admin", 1, 1, 9999, 99, 99, 0, 100, 40, 85, 9999),
+        ])
+        raw.executemany("INSERT INTO character_subclasses VALUES (?, ?, ?, ?, ?, ?)", [
+            (1, 10, 80, 8000, 0, "1"), (1, 41, 70, 7000, 1, "0"), (1, 52, 60, 6000, 2, "0"),
+            (2, 20, 76, 7600, 0, "1"), (3, 30, 80, 8100, 0, "1"), (3, 45, 78, 7800, 1, "0"),
+            (4, 40, 85, 9999, 0, "1"),
+        ])
+        raw.executemany("INSERT INTO clan_data VALUES (?, ?, ?, ?, ?, ?, ?, ?)", [
+            (1, "Alfa", 5, 1000, 10, "Aliados", 1, "Ana"),
+            (2, "Beta", 5, 500, 0, None, 3, "Caio"),
+        ])
+        # Sub-pledge (academia) não pode duplicar as linhas do clã
+        raw.executemany("INSERT INTO clan_subpledges VALUES (?, ?, ?, ?, ?, ?)", [
+            (1, 0, 0, "Alfa", 1, "Ana"), (1, -1, -1, "Academia", 2, "Bia"), (2, 0, 0, "Beta", 3, "Caio"),
+        ])
+        raw.execute("INSERT INTO ally_data VALUES (10, 'Aliados')")
+        raw.executemany("INSERT INTO items VALUES (?, ?, ?)", [
+            (1, 57, 500), (1, 4037, 2), (2, 57, 900), (3, 57, 100), (3, 57, 100), (4, 57, 10 ** 9),
+        ])
+        self.addCleanup(conn.close)
+        return conn
+
+    def _results(self, dialect):
+        sql = compiler_for(dialect)
+        conn = self._database(dialect)
+
+        def run(statement, **params):
+            return [dict(row._mapping) for row in conn.execute(*LineageDB._prepare(statement, params))]
+
+        def pick(rows, *columns):
+            return [tuple(row[column] for column in columns) for row in rows]
+
+        bonus = {"adn_billion_item": 4037, "value_item": 1000}
+        return {
+            "players_online": run(sql.players_online()),
+            "top_pvp": pick(run(sql.top_pvp(), limit=10), "char_name", "level", "base", "clan_name", "ally_id"),
+            "top_level": pick(run(sql.top_level(), limit=2), "char_name", "level"),
+            "top_clans": pick(run(sql.top_clans(), limit=10), "clan_name", "ally_name", "char_name", "membros"),
+            "top_adena": pick(run(sql.top_adena(), limit=10), "char_name", "adenas"),
+            "top_adena_bonus": pick(run(sql.top_adena(with_bonus=True), limit=10, **bonus), "char_name", "adenas"),
+            "owner_totals": sorted(pick(run(sql.adena_owner_totals(), owner_ids=[1, 3], **bonus),
+                                        "owner_id", "adena", "bonus")),
+            "find_chars": pick(run(sql.find_chars(), login="joao"), "char_name", "base_class", "base_level",
+                               "subclass1", "subclass2_level", "subclass3", "clan_name", "ally_name"),
+            "search_characters": pick(run(sql.search_characters_page(), after=1, limit=10),
+                                      "char_id", "char_name", "level", "class_id", "clan_name"),
+            "search_clans": sorted(pick(run(sql.search_clans()), "clan_name", "leader_name", "member_count", "ally_name")),
+        }
+
+    def test_all_dialects_return_the_same_rows(self):
+        expected = self._results("acis_v1")
+        self.assertEqual(expected["top_pvp"][0], ("Ana", 80, 10, "Alfa", 10))
+        self.assertEqual(expected["top_clans"], [("Alfa", "Aliados", "Ana", 2), ("Beta", None, "Caio", 1)])
+        self.assertEqual(expected["top_adena_bonus"][0], ("Ana", 2500))
+        self.assertEqual(expected["find_chars"][0], ("Ana", 10, 80, 41, 60, None, "Alfa", "Aliados"))
+        self.assertEqual(expected["search_characters"], [(2, "Bia", 76, 20, "Alfa"), (3, "Caio", 80, 30, "Beta")])
+        for dialect in SCHEMAS:
+            with self.subTest(dialect=dialect):
+                self.assertEqual(self._results(dialect), expected)
+
+    def test_index_hints_from_schema_map(self):
+        compiler = QueryCompiler("classic", dict(SCHEMAS["classic"], hints={"items": "idx_owner_id"}))
+        self.assertIn("FROM items I USE INDEX (idx_owner_id)", compiler.top_adena())
+        self.assertNotIn("USE INDEX", compiler_for("classic").top_adena())
+
+
+class SearchIndexTestCase(SimpleTestCase):
+
+    def setUp(self):
+        path = os.path.join(tempfile.mkdtemp(), "search.sqlite3")
+        build_index(
+            path,
+            characters=[
+                {"char_id": 1, "char_name": "Legolas", "level": 80, "class_id": 9, "online": 1, "last_access": 0},
+                {"char_id": 2, "char_name": "Legend", "level": 40, "class_id": 0, "online": 0,
+                 "last_access": 1700000000000},
+                {"char_id": 3, "char_name": "Gandalf", "level": 85, "class_id": 12, "clan_name": "Istari"},
+            ],
+            clans=[{"clan_id": 7, "clan_name": "Istari", "leader_name": "Gandalf", "level": 8, "member_count": 3,
+                    "reputation": 5000}],
+            items=[{"item_id": 57, "item_name": "Adena", "item_type": "game", "description": ""},
+                   {"item_id": 6656, "item_name": "Earring of Antharas", "item_type": "game", "description": ""}],
+        )
+        patcher = mock.patch("apps.lineage.server.search_index.INDEX_PATH", path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(os.remove, path)
+
+    def names(self, query):
+        return [row["char_name"] for row in SearchIndex.search_characters(query)]
+
+    def test_prefix_substring_and_typo(self):
+        self.assertEqual(self.names("le"), ["Legend", "Legolas"])
+        self.assertEqual(self.names("ndal"), ["Gandalf"])
+        # Uma letra trocada ainda encontra o personagem
+        self.assertEqual(self.names("Gandulf"), ["Gandalf"])
+        self.assertEqual(self.names("xyz"), [])
+        self.assertEqual([row["item_id"] for row in SearchIndex.search_items("antharas")], [6656])
+
+    def test_character_fields_and_clan_details(self):
+        legend = SearchIndex.search_characters("Legend")[0]
+        self.assertEqual(legend["class_name"], "Human Fighter")
+        self.assertEqual(legend["last_access"].year, 2023)
+        self.assertFalse(legend["online"])
+        self.assertEqual(SearchIndex.get_clan_details("istari")["leader_name"], "Gandalf")
+        self.assertIsNone(SearchIndex.get_clan_details("Valar"))
+
+
+class ObjectIdAllocatorTestCase(SimpleTestCase):
+
+    def test_concurrent_allocators_never_collide(self):
+        # Reserva compartilhada, como a linha de ObjectIdRange vista por vários processos
+        state = {"next": OBJECT_ID_MIN, "blocks": 0}
+        lock = threading.Lock()
+
+        def reserve(size):
+            with lock:
+                start, end = next_block(state["next"], 0, size)
+                time.sleep(0)
+                state["next"], state["blocks"] = end, state["blocks"] + 1
+                return start, end
+
+        allocators = [ObjectIdAllocator(reserve, block_size=7) for _ in range(4)]
+        results = []
+
+        def deliver(allocator):
+            ids = [allocator.next_id() for _ in range(300)]
+            with lock:
+                results.extend(ids)
+
+        threads = [threading.Thread(target=deliver, args=(allocator,)) for allocator in allocators for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), 4 * 8 * 300)
+        self.assertEqual(len(set(results)), len(results))
+        self.assertGreaterEqual(min(results), OBJECT_ID_MIN)
+        # Uma reserva por bloco consumido, não uma consulta por item
+        self.assertLessEqual(state["blocks"], len(results) // 7 + len(allocators))
+
+    def test_block_skips_ids_already_in_game_db_and_forked_blocks(self):
+        self.assertEqual(next_block(OBJECT_ID_MIN + 50, OBJECT_ID_MIN + 120, 10), (OBJECT_ID_MIN + 121, OBJECT_ID_MIN + 131))
+        with self.assertRaises(RuntimeError):
+            next_block(800000000, 0, 10)
+
+        reserve = mock.Mock(side_effect=[(1, 3), (10, 12)])
+        allocator = ObjectIdAllocator(reserve, block_size=2)
+        self.assertEqual(allocator.next_id(), 1)
+        # Processo filho (fork) não reaproveita o bloco do pai
+        with mock.patch("apps.lineage.server.object_ids.os.getpid", return_value=-1):
+            self.assertEqual(allocator.next_id(), 10)
+
+
+class DeliveryQueueTestCase(SimpleTestCase):
+
+    def _delivery(self, pk, char_name, item_id=57, amount=100, attempts=0):
+        delivery = GameDelivery(id=pk, idempotency_key=f"k{pk}", account_name="joao", char_name=char_name,
+                                item_id=item_id, amount=amount, attempts=attempts,
+                                status=GameDelivery.STATUS_PROCESSING)
+        delivery.save = mock.Mock()
+        return delivery
+
+    def test_one_game_transaction_per_character(self):
+        claimed = [self._delivery(1, "Ana"), self._delivery(2, "Bia"),
+                   self._delivery(3, "Ana", item_id=4037, amount=2), self._delivery(4, "Caio")]
+        self.assertEqual([d.id for d in group_by_character(claimed)[("joao", "Ana")]], [1, 3])
+
+        queries = types.SimpleNamespace(
+            items_delayed=False,
+            find_char=lambda account, name: [{"online": 1 if name == "Caio" else 0}],
+            insert_coins=mock.Mock(return_value=True),
+        )
+        with mock.patch.object(DeliveryQueue, "_claim", return_value=claimed), \
+                mock.patch.object(DeliveryQueue, "_expire_stale", return_value=0), \
+                mock.patch.object(DeliveryQueue, "_delivered") as delivered, \
+                mock.patch.object(DeliveryQueue, "_postpone") as postpone, \
+                mock.patch.object(delivery_module.delivery_log, "ensure_table", return_value=True), \
+                mock.patch.object(delivery_module, "get_query_class", return_value=queries), \
+                mock.patch.object(delivery_module.AdenaAggregator, "mark_dirty"):
+            stats = DeliveryQueue.drain()
+
+        self.assertEqual(stats["entregues"], 3)
+        self.assertEqual(stats["adiadas"], 1)
+        queries.insert_coins.assert_any_call("Ana", [(57, 100, 0), (4037, 2, 0)], keys=["k1", "k3"])
+        self.assertEqual(queries.insert_coins.call_count, 2)
+        self.assertEqual(delivered.call_count, 2)
+        # Personagem online num servidor sem items_delayed: volta para a fila
+        self.assertEqual([d.id for d in postpone.call_args[0][0]], [4])
+
+    def test_failure_backs_off_then_refunds(self):
+        retry = self._delivery(1, "Ana", attempts=0)
+        last = self._delivery(2, "Ana", attempts=delivery_module.MAX_ATTEMPTS - 1)
+        with mock.patch.object(delivery_module, "_refund") as refund, \
+                mock.patch.object(delivery_module.delivery_log, "delivered_keys", return_value=set()), \
+                mock.patch.object(delivery_module.transaction, "atomic"):
+            failed = DeliveryQueue._failed([retry, last], "banco fora")
+
+        self.assertEqual(failed, 1)
+        self.assertEqual(retry.status, GameDelivery.STATUS_PENDING)
+        self.assertEqual(retry.attempts, 1)
+        self.assertEqual(last.status, GameDelivery.STATUS_FAILED)
+        refund.assert_called_once_with(last)
+
+    def test_batch_committed_despite_the_error_is_neither_resent_nor_refunded(self):
+        # O commit da tentativa anterior chegou ao jogo, mas a resposta não chegou ao worker
+        committed = self._delivery(1, "Ana", attempts=1)
+        pending = self._delivery(2, "Ana", attempts=1)
+        queries = types.SimpleNamespace(items_delayed=True, find_char=lambda account, name: [{"online": 1}],
+                                        insert_coins=mock.Mock(return_value=True))
+        with mock.patch.object(DeliveryQueue, "_claim", return_value=[committed, pending]), \
+                mock.patch.object(DeliveryQueue, "_expire_stale", return_value=0), \
+                mock.patch.object(DeliveryQueue, "_delivered") as delivered, \
+                mock.patch.object(delivery_module.delivery_log, "ensure_table", return_value=True), \
+                mock.patch.object(delivery_module.delivery_log, "delivered_keys", return_value={"k1"}), \
+                mock.patch.object(delivery_module, "get_query_class", return_value=queries), \
+                mock.patch.object(delivery_module.AdenaAggregator, "mark_dirty"):
+            stats = DeliveryQueue.drain()
+
+        self.assertEqual(stats["entregues"], 2)
+        queries.insert_coins.assert_called_once_with("Ana", [(57, 100, 0)], keys=["k2"])
+        self.assertEqual([[d.id for d in call.args[0]] for call in delivered.call_args_list], [[1], [2]])
+
+        # Última tentativa: gravada no jogo vira entregue; sem conseguir conferir, encerra sem estorno
+        found = self._delivery(3, "Bia", attempts=delivery_module.MAX_ATTEMPTS - 1)
+        with mock.patch.object(delivery_module, "_refund") as refund, \
+                mock.patch.object(DeliveryQueue, "_delivered") as delivered, \
+                mock.patch.object(delivery_module.delivery_log, "delivered_keys", return_value={"k3"}), \
+                mock.patch.object(delivery_module.AdenaAggregator, "mark_dirty"), \
+                mock.patch.object(delivery_module.transaction, "atomic"):
+            self.assertEqual(DeliveryQueue._failed([found], "conexão perdida no commit"), 0)
+        delivered.assert_called_once_with([found])
+
+        unknown = self._delivery(4, "Bia", attempts=delivery_module.MAX_ATTEMPTS - 1)
+        with mock.patch.object(delivery_module, "_refund") as refund_unknown, \
+                mock.patch.object(delivery_module.delivery_log, "delivered_keys",
+                                  side_effect=RuntimeError("falha ao consultar o banco do jogo")), \
+                mock.patch.object(delivery_module.transaction, "atomic"):
+            self.assertEqual(DeliveryQueue._failed([unknown], "conexão perdida no commit"), 1)
+        self.assertEqual(unknown.status, GameDelivery.STATUS_FAILED)
+        refund.assert_not_called()
+        refund_unknown.assert_not_called()
+
+
+class WhirlpoolHasherTestCase(SimpleTestCase):
+    # Vetores do ISO/IEC 10118-3 (Whirlpool final)
+    VECTORS = {
+        b"": "19FA61D75522A4669B44E39C1D2E1726C530232130D407F89AFEE0964997F7A7"
+             "3E83BE698B288FEBCF88E3E03C4F0757EA8964E59B63D93708B138CC42A66EB3",
+        b"a": "8ACA2602792AEC6F11A67206531FB7D7F0DFF59413145E6973C45001D0087B42"
+              "D11BC645413AEFF63A42391A39145A591A92200D560195E53B478584FDAE231A",
+        b"message digest": "378C84A4126E2DC6E56DCC7458377AAC838D00032230F53CE1F5700C0FFB4D3B"
+                           "8421557659EF55C106B4B52AC5A4AAA692ED920052838F3362E86DBD37A8903E",
+        b"1234567890" * 8: "466EF18BABB0154D25B9D38A6414F5C08784372BCCB204D6549C4AFADB601429"
+                           "4D5BD8DF2A6C44E538CD047B2681A51A2C60481E88C5A20B2C2A80CF3A9A083B",
+    }
+
+    def test_known_answers_for_every_backend(self):
+        backends = available_backends("whirlpool")
+        self.assertIn("python", backends)
+        for name, digest in backends.items():
+            for message, expected in self.VECTORS.items():
+                with self.subTest(backend=name, message=message):
+                    self.assertEqual(digest(message).hex().upper(), expected)
+        # Mensagens de vários blocos (sem o key schedule pré-calculado)
+        for size in range(0, 200, 7):
+            message = bytes(range(size))
+            self.assertEqual(backends["python"](message), backends["python-reference"](message))
+
+    def test_broken_backend_is_skipped(self):
+        registry = {"whirlpool": [("quebrado", lambda: lambda data: b"\0" * 64),
+                                  ("python", password_hash._whirlpool_python)]}
+        with mock.patch.object(password_hash, "_BACKENDS", registry):
+            password_hash.get_hasher.cache_clear()
+            self.addCleanup(password_hash.get_hasher.cache_clear)
+            self.assertEqual(password_hash.get_hasher("whirlpool")[0], "python")
+            self.assertTrue(PasswordHash("whirlpool").compare("a", base64.b64encode(
+                bytes.fromhex(self.VECTORS[b"a"])).decode()))
+        self.assertTrue(PasswordHash("sha1").compare("yang", "FntsSk5BX9/GUCSgGh1Gs4NEqxs="))
+
+class PrewarmTestCase(SimpleTestCase):
+
+    def test_stages_run_in_order_with_bounded_concurrency(self):
+        lock = threading.Lock()
+        state = {"running": 0, "peak": 0, "order": []}
+
+        def target(name):
+            def load():
+                with lock:
+                    state["running"] += 1
+                    state["peak"] = max(state["peak"], state["running"])
+                time.sleep(0.01)
+                with lock:
+                    state["running"] -= 1
+                    state["order"].append(name)
+                if name == "quebrado":
+                    raise RuntimeError("banco fora")
+            return load
+
+        targets = [prewarm.PrewarmTarget(f"base{i}", 0, target(f"base{i}")) for i in range(6)]
+        targets += [prewarm.PrewarmTarget("pagina", 1, target("pagina")),
+                    prewarm.PrewarmTarget("quebrado", 1, target("quebrado"))]
+        results = prewarm.prewarm(targets, workers=2)
+
+        self.assertLessEqual(state["peak"], 2)
+        self.assertEqual(set(state["order"][:6]), {f"base{i}" for i in range(6)})
+        self.assertEqual([r.name for r in results if not r.ok], ["quebrado"])
+
+    def test_only_reads_without_arguments_are_enumerated(self):
+        module = prewarm.get_query_class("LineageStats").__module__
+
+        def without_args():
+            return []
+
+        def with_args(login):
+            return []
+
+        reads = {}
+        with mock.patch.dict("apps.lineage.server.utils.cache.CACHED_READS"):
+            for func in (without_args, with_args):
+                func.__module__ = module
+                reads[f"{module}.LineageStats.{func.__name__}"] = cache_lineage_result()(func)
+        with mock.patch.object(prewarm, "CACHED_READS", reads):
+            self.assertEqual(list(prewarm.cached_reads()), ["read:LineageStats.without_args"])
+
+class CrestAssetTestCase(SimpleTestCase):
+
+    def setUp(self):
+        crest_dir = tempfile.mkdtemp()
+        patches = [mock.patch.object(crest_module, "CREST_DIR", crest_dir),
+                   mock.patch.object(crest_module, "_stored", set()),
+                   mock.patch.object(crest_module.LineageDB, "is_connected", return_value=True)]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def _blob(self, color):
+        byte_io = io.BytesIO()
+        Image.new("RGBA", (16, 12), color).save(byte_io, "BMP")
+        return byte_io.getvalue()
+
+    def test_crests_are_rendered_once_and_served_by_url(self):
+        red = self._blob((255, 0, 0, 255))
+        data = [{"clan_id": 1, "ally_id": 0}, {"clan_id": 2, "ally_id": 0}, {"clan_id": 3, "ally_id": 0}]
+        # Clãs 1 e 2 com o mesmo crest, 3 sem crest
+        crests = [{"clan_id": 1, "crest": red}, {"clan_id": 2, "crest": red}]
+        with mock.patch.object(crest_module.LineageStats, "get_crests", side_effect=[crests, [], crests, []]), \
+                mock.patch.object(crest_module, "render_crest", wraps=crest_module.render_crest) as render:
+            attach_crests_to_clans(data)
+            attach_crests_to_clans([dict(item) for item in data])
+
+        self.assertEqual(data[0]["clan_crest_url"], data[1]["clan_crest_url"])
+        self.assertNotEqual(data[0]["clan_crest_url"], data[2]["clan_crest_url"])
+        self.assertNotIn("clan_crest_image_base64", data[0])
+        # Um crest e dois vazios (clã e aliança), cada um decodificado uma vez
+        self.assertEqual(render.call_count, 3)
+
+        asset_id = data[0]["clan_crest_url"].rsplit("/", 1)[1][:-4]
+        response = crest_image_view(RequestFactory().get(data[0]["clan_crest_url"]), asset_id)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertEqual(Image.open(io.BytesIO(response.content)).getpixel((0, 0)), (255, 0, 0, 255))
+
+        # Sem o cache (flush do Redis), o PNG ainda sai do disco
+        django_cache.delete(f"{crest_module.CACHE_PREFIX}{asset_id}")
+        self.assertEqual(crest_module.load_crest(asset_id), response.content)
+        request = RequestFactory().get("/", HTTP_IF_NONE_MATCH=f'"{asset_id}"')
+        self.assertEqual(crest_image_view(request, asset_id).status_code, 304)
+
+        # Já gravado por este processo, mas fora do cache: volta para o cache (do disco, sem renderizar)
+        django_cache.delete(f"{crest_module.CACHE_PREFIX}{asset_id}")
+        with mock.patch.object(crest_module, "render_crest") as render:
+            self.assertEqual(crest_module.store_crest(red, "clan"), asset_id)
+        render.assert_not_called()
+        self.assertEqual(django_cache.get(f"{crest_module.CACHE_PREFIX}{asset_id}"), response.content)
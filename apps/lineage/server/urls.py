@@ -1,9 +1,11 @@
-from django.urls import path, include
+from django.urls import path, re_path, include
 from .views.server_views import painel_apoiador, formulario_apoiador, painel_staff, solicitar_comissao, editar_imagem_apoiador, aprovar_apoiador, rejeitar_apoiador, detalhes_apoiador
 from .views.accounts_views import *
 from .views.tops_views import *
 from .views.status_views import *
 from .views.services_views import *
+from .views.delivery_views import delivery_status_view, recent_deliveries_view
+from .views.crest_views import crest_image_view
 
 app_name = 'server'
 
@@ -21,6 +23,7 @@ urlpatterns = [
     path('status/olympiad-current-heroes/', olympiad_current_heroes_view, name='olympiad_current_heroes'),
     path('status/boss-jewel-locations/', boss_jewel_locations_view, name='boss_jewel_locations'),
     path('status/grandboss/', grandboss_status_view, name='grandboss'),
+    re_path(r'^crests/(?P<asset_id>[0-9a-f]{32})\.png$', crest_image_view, name='crest_image'),
 
     path('account/update-password/', update_password, name='update_password'),
     path('account/dashboard/', account_dashboard, name='account_dashboard'),
@@ -34,6 +37,9 @@ urlpatterns = [
     path('account/link-by-email/', request_link_by_email, name='request_link_by_email'),
     path('account/link-by-email/<str:token>/', link_by_email_token, name='link_by_email_token'),
 
+    path('deliveries/', recent_deliveries_view, name='recent_deliveries'),
+    path('deliveries/<uuid:delivery_uuid>/', delivery_status_view, name='delivery_status'),
+
     path('supporter/panel/', painel_apoiador, name='painel_apoiador'),
     path('supporter/request/', formulario_apoiador, name='formulario_apoiador'),
     path('supporter/panel/staff/', painel_staff, name='painel_staff'),
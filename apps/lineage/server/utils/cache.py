@@ -1,8 +1,23 @@
+from asgiref.sync import sync_to_async
 from django.core.cache import cache
+import asyncio
 import hashlib
+import inspect
 import json
+import logging
+import os
+import string
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from sqlalchemy.engine import RowMapping
 
+from apps.lineage.server.metrics import query_metrics
+
+logger = logging.getLogger(__name__)
+
+_formatter = string.Formatter()
+
 
 def convert_rowmapping_to_dict(obj):
     if isinstance(obj, list):
@@ -12,56 +27,380 @@ def convert_rowmapping_to_dict(obj):
     return obj
 
 
-def cache_lineage_result(timeout=300, use_cache=True):
+def get_redis_client():
+    """Conexão Redis do cache do Django, ou None (ex.: LocMemCache em DEBUG)."""
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection("default")
+    except Exception:
+        return None
+
+
+def make_lineage_cache_key(module, name, args=(), kwargs=None):
+    key_base = f"{module}.{name}:{json.dumps(args)}:{json.dumps(kwargs or {})}"
+    return f"lineage_cache:{hashlib.md5(key_base.encode()).hexdigest()}"
+
+
+# Tags de dependência: cada tag tem uma versão no cache; a chave de uma leitura
+# inclui as versões das tags das quais ela depende, e uma escrita troca a versão
+# das tags que invalida (as entradas antigas simplesmente deixam de ser lidas)
+TAG_PREFIX = "lineage_tag:"
+
+
+def _resolve_tags(templates, signature, args, kwargs):
+    """
+    Formata as tags (ex.: "account:{login}") com os argumentos da chamada.
+    Argumentos em lista geram uma tag por item ("account:{logins_list}").
+    """
+    if not templates:
+        return []
+    bound = signature.bind_partial(*args, **kwargs)
+    bound.apply_defaults()
+    arguments = bound.arguments
+    tags = []
+    for template in templates:
+        fields = [name for _, name, _, _ in _formatter.parse(template) if name]
+        list_field = next((name for name in fields if isinstance(arguments.get(name), (list, tuple))), None)
+        if list_field:
+            for item in arguments[list_field]:
+                tags.append(template.format(**dict(arguments, **{list_field: item})))
+        else:
+            tags.append(template.format(**arguments))
+    return tags
+
+
+def _tag_versions(tags):
+    keys = [f"{TAG_PREFIX}{tag}" for tag in tags]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Tag ainda sem versão (ou removida do Redis): cria uma nova, nunca reaproveita
+            token = uuid.uuid4().hex[:12]
+            versions[key] = token if cache.add(key, token, timeout=None) else (cache.get(key) or token)
+    return ":".join(str(versions[key]) for key in keys)
+
+
+def invalidate_lineage_tags(*tags):
+    """Invalida todas as leituras em cache que dependem de alguma das tags."""
+    if not tags:
+        return
+    try:
+        cache.set_many({f"{TAG_PREFIX}{tag}": uuid.uuid4().hex[:12] for tag in tags}, timeout=None)
+        query_metrics.incr("cache.tag_invalidations", len(tags))
+    except Exception as e:
+        logger.warning(f"Erro ao invalidar tags do cache {tags}: {e}")
+
+
+def invalidates_lineage_cache(*tags):
+    """
+    Decorator para métodos que escrevem no banco do jogo: o resultado nunca é
+    memoizado e, após a execução, as tags informadas são invalidadas.
+
+        @invalidates_lineage_cache("account:{acc}", "char:{cid}")
+        def change_sex(acc, cid, sex): ...
+    """
     def decorator(func):
+        signature = inspect.signature(func)
+
+        def wrapper(*args, **kwargs):
+            try:
+                return convert_rowmapping_to_dict(func(*args, **kwargs))
+            except Exception as e:
+                logger.error(f"Erro ao executar query {func.__name__}: {e}")
+                return None
+            finally:
+                # Invalida mesmo em caso de erro: a escrita pode ter sido aplicada parcialmente.
+                # Falha ao montar as tags não pode substituir o retorno da escrita
+                try:
+                    invalidate_lineage_tags(*_resolve_tags(tags, signature, args, kwargs))
+                except Exception as e:
+                    logger.error(f"Erro ao invalidar tags do cache de {func.__name__}: {e}")
+
+        return wrapper
+    return decorator
+
+
+# Leituras decoradas com `cache_lineage_result`, por "módulo.Classe.método"
+# (usado pelo `prewarm_caches` para aquecer as que não recebem argumentos)
+CACHED_READS = {}
+
+
+# Single-flight: só um worker recalcula uma chave expirada; os demais aguardam
+LOCK_TTL = int(os.getenv("LINEAGE_CACHE_LOCK_TTL", "30"))
+LOCK_WAIT = float(os.getenv("LINEAGE_CACHE_LOCK_WAIT", "5"))
+LOCK_POLL_INTERVAL = 0.05
+
+# Pool pequeno para as revalidações em background (stale-while-revalidate)
+_refresh_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("LINEAGE_CACHE_REFRESH_WORKERS", "4")),
+    thread_name_prefix="lineage-cache-refresh",
+)
+
+
+def _acquire_lock(key):
+    """Lock distribuído via `cache.add` (SET NX no Redis). Retorna o token ou None."""
+    token = uuid.uuid4().hex
+    try:
+        if cache.add(f"{key}:lock", token, timeout=LOCK_TTL):
+            return token
+    except Exception as e:
+        logger.warning(f"Erro ao adquirir lock do cache: {e}")
+    return None
+
+
+def _release_lock(key, token):
+    try:
+        if cache.get(f"{key}:lock") == token:
+            cache.delete(f"{key}:lock")
+    except Exception as e:
+        logger.warning(f"Erro ao liberar lock do cache: {e}")
+
+
+# Guardado no lugar de um resultado None, que o cache não distingue de "não existe"
+_NONE = "__lineage_cache_none__"
+
+
+def _unwrap(value):
+    return None if value == _NONE else value
+
+
+def _store(key, value, timeout, stale_ttl):
+    if value is None:
+        value = _NONE
+    try:
+        if stale_ttl:
+            # Valor vive até o hard TTL; o marcador `:fresh` marca o soft TTL
+            cache.set(key, value, timeout=timeout + stale_ttl)
+            cache.set(f"{key}:fresh", 1, timeout=timeout)
+        else:
+            cache.set(key, value, timeout=timeout)
+    except Exception as e:
+        logger.warning(f"Erro ao salvar no cache: {e}")
+
+
+def _finish(func, start_time, result):
+    execution_time = time.time() - start_time
+
+    # Log se a query demorou muito
+    if execution_time > 2:
+        logger.warning(f"Query {func.__name__} demorou {execution_time:.2f}s")
+
+    # Converte o resultado antes de salvar e retornar
+    return convert_rowmapping_to_dict(result)
+
+
+def _compute(func, args, kwargs):
+    start_time = time.time()
+    return _finish(func, start_time, func(*args, **kwargs))
+
+
+def _error_result(func):
+    # Retorna resultado vazio em caso de erro
+    return [] if 'top_' in func.__name__ or 'players_online' in func.__name__ else None
+
+
+def _lookup(func, signature, depends_on, stale_ttl, args, kwargs):
+    """Chave da leitura (com as versões das tags) e o que há no cache: (key, cached, fresh)."""
+    # Gera uma chave única com base na função + argumentos
+    key = make_lineage_cache_key(func.__module__, func.__name__, args, kwargs)
+
+    try:
+        if depends_on:
+            key = f"{key}:{_tag_versions(_resolve_tags(depends_on, signature, args, kwargs))}"
+        if stale_ttl:
+            found = cache.get_many([key, f"{key}:fresh"])
+            return key, found.get(key), f"{key}:fresh" in found
+        return key, cache.get(key), True
+    except Exception as e:
+        logger.warning(f"Erro ao acessar cache: {e}")
+        return key, None, True
+
+
+# Retorno de `_poll_lock_holder` enquanto o outro worker ainda calcula
+_WAITING = object()
+
+
+def _poll_lock_holder(key):
+    """
+    Uma checagem da espera pelo worker que detém o lock: o valor guardado,
+    None para desistir (lock liberado sem valor, ex.: a query falhou) ou
+    `_WAITING` enquanto o lock continuar de pé.
+    """
+    try:
+        found = cache.get_many([key, f"{key}:lock"])
+    except Exception:
+        return None
+    if found.get(key) is not None:
+        return found[key]
+    return _WAITING if f"{key}:lock" in found else None
+
+
+def _refresh_in_background(func, args, kwargs, key, token, timeout, stale_ttl):
+    def refresh():
+        try:
+            _store(key, _compute(func, args, kwargs), timeout, stale_ttl)
+            query_metrics.incr("cache.refreshes")
+        except Exception as e:
+            query_metrics.incr("cache.refresh_errors")
+            logger.error(f"Erro ao revalidar query {func.__name__}: {e}")
+        finally:
+            _release_lock(key, token)
+
+    try:
+        _refresh_executor.submit(refresh)
+    except RuntimeError:
+        _release_lock(key, token)
+
+
+def cache_lineage_result(timeout=300, use_cache=True, stale_ttl=0, depends_on=()):
+    """
+    Cacheia o resultado da query no cache do Django (Redis em produção).
+
+    - single-flight: numa expiração, só um worker executa a query (lock com
+      `cache.add`); os demais esperam até LINEAGE_CACHE_LOCK_WAIT segundos pelo
+      valor recalculado antes de desistir e consultar o banco por conta própria
+    - `stale_ttl`: após `timeout` (soft TTL) o valor continua sendo servido por
+      mais `stale_ttl` segundos (hard TTL) enquanto uma única revalidação roda em
+      background
+    - `depends_on`: tags das quais a leitura depende (ex.: "account:{login}");
+      escritas com `invalidates_lineage_cache` nessas tags descartam o valor
+
+    Hits, valores vencidos servidos, esperas e revalidações são contados em
+    `query_metrics` (comando `lineage_db_stats`).
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
         def wrapper(*args, **kwargs):
-            import time
-            import logging
-            logger = logging.getLogger(__name__)
-            
             # Se o cache não deve ser usado, execute a função normalmente
             if not use_cache:
                 result = func(*args, **kwargs)
                 result_converted = convert_rowmapping_to_dict(result)
                 return result_converted
-            
-            # Gera uma chave única com base na função + argumentos
-            key_base = f"{func.__module__}.{func.__name__}:{json.dumps(args)}:{json.dumps(kwargs)}"
-            key = f"lineage_cache:{hashlib.md5(key_base.encode()).hexdigest()}"
 
-            # Tenta pegar do cache com timeout
-            try:
-                cached = cache.get(key)
-                if cached is not None:
-                    return cached
-            except Exception as e:
-                logger.warning(f"Erro ao acessar cache: {e}")
+            key, cached, fresh = _lookup(func, signature, depends_on, stale_ttl, args, kwargs)
 
-            # Se não tiver, executa e armazena no cache com timeout de execução
-            start_time = time.time()
-            try:
-                result = func(*args, **kwargs)
-                execution_time = time.time() - start_time
-                
-                # Log se a query demorou muito
-                if execution_time > 2:
-                    logger.warning(f"Query {func.__name__} demorou {execution_time:.2f}s")
+            if cached is not None:
+                if fresh:
+                    query_metrics.incr("cache.hits")
+                    return _unwrap(cached)
+                # Vencido (soft TTL): serve o valor antigo e revalida uma única vez
+                query_metrics.incr("cache.stale_served")
+                token = _acquire_lock(key)
+                if token:
+                    _refresh_in_background(func, args, kwargs, key, token, timeout, stale_ttl)
+                return _unwrap(cached)
 
-                # Converte o resultado antes de salvar e retornar
-                result_converted = convert_rowmapping_to_dict(result)
-                
-                # Tenta salvar no cache, mas não falha se der erro
-                try:
-                    cache.set(key, result_converted, timeout=timeout)
-                except Exception as e:
-                    logger.warning(f"Erro ao salvar no cache: {e}")
-                
+            query_metrics.incr("cache.misses")
+            token = _acquire_lock(key)
+            if token is None:
+                # Outro worker já está calculando: espera pelo resultado dele
+                query_metrics.incr("cache.lock_waits")
+                deadline = time.monotonic() + LOCK_WAIT
+                cached = _WAITING
+                while cached is _WAITING and time.monotonic() < deadline:
+                    time.sleep(LOCK_POLL_INTERVAL)
+                    cached = _poll_lock_holder(key)
+                if cached is _WAITING:
+                    query_metrics.incr("cache.lock_timeouts")
+                elif cached is not None:
+                    return _unwrap(cached)
+
+            # Se não tiver, executa e armazena no cache
+            try:
+                result_converted = _compute(func, args, kwargs)
+                _store(key, result_converted, timeout, stale_ttl)
                 return result_converted
-                
+
             except Exception as e:
                 logger.error(f"Erro ao executar query {func.__name__}: {e}")
-                # Retorna resultado vazio em caso de erro
-                return [] if 'top_' in func.__name__ or 'players_online' in func.__name__ else None
-                
+                return _error_result(func)
+
+            finally:
+                if token:
+                    _release_lock(key, token)
+
+        wrapper.__wrapped__ = func
+        wrapper.cache_options = (use_cache, timeout, stale_ttl, depends_on, signature)
+        if use_cache:
+            CACHED_READS[f"{func.__module__}.{func.__qualname__}"] = wrapper
         return wrapper
     return decorator
+
+
+# Revalidações assíncronas em andamento (o event loop só guarda referência fraca às tasks)
+_refresh_tasks = set()
+
+
+def _arefresh_in_background(func, afunc, args, kwargs, key, token, timeout, stale_ttl):
+    async def refresh():
+        try:
+            start_time = time.time()
+            result = _finish(func, start_time, await afunc(*args, **kwargs))
+            await sync_to_async(_store)(key, result, timeout, stale_ttl)
+            query_metrics.incr("cache.refreshes")
+        except Exception as e:
+            query_metrics.incr("cache.refresh_errors")
+            logger.error(f"Erro ao revalidar query {func.__name__}: {e}")
+        finally:
+            await sync_to_async(_release_lock)(key, token)
+
+    task = asyncio.ensure_future(refresh())
+    _refresh_tasks.add(task)
+    task.add_done_callback(_refresh_tasks.discard)
+
+
+async def acached_lineage_call(cached_func, afunc, *args, **kwargs):
+    """
+    Versão assíncrona de uma leitura decorada com `cache_lineage_result`, para
+    consumers do Channels e views ASGI: mesma chave, soft/hard TTL, single-flight
+    e métricas da versão síncrona, mas a query roda em `afunc` (corrotina que
+    recebe os mesmos argumentos, ex.: sobre o `AsyncLineageDB`) e a espera pelo
+    lock não prende thread. O valor calculado por um lado serve ao outro.
+
+        await acached_lineage_call(LineageStats.top_pvp, top_pvp_async, limit=10)
+    """
+    func = cached_func.__wrapped__
+    use_cache, timeout, stale_ttl, depends_on, signature = cached_func.cache_options
+    if not use_cache:
+        return convert_rowmapping_to_dict(await afunc(*args, **kwargs))
+
+    key, cached, fresh = await sync_to_async(_lookup)(func, signature, depends_on, stale_ttl, args, kwargs)
+
+    if cached is not None:
+        if fresh:
+            query_metrics.incr("cache.hits")
+            return _unwrap(cached)
+        query_metrics.incr("cache.stale_served")
+        token = await sync_to_async(_acquire_lock)(key)
+        if token:
+            _arefresh_in_background(func, afunc, args, kwargs, key, token, timeout, stale_ttl)
+        return _unwrap(cached)
+
+    query_metrics.incr("cache.misses")
+    token = await sync_to_async(_acquire_lock)(key)
+    if token is None:
+        query_metrics.incr("cache.lock_waits")
+        deadline = time.monotonic() + LOCK_WAIT
+        cached = _WAITING
+        while cached is _WAITING and time.monotonic() < deadline:
+            await asyncio.sleep(LOCK_POLL_INTERVAL)
+            cached = await sync_to_async(_poll_lock_holder)(key)
+        if cached is _WAITING:
+            query_metrics.incr("cache.lock_timeouts")
+        elif cached is not None:
+            return _unwrap(cached)
+
+    try:
+        start_time = time.time()
+        result_converted = _finish(func, start_time, await afunc(*args, **kwargs))
+        await sync_to_async(_store)(key, result_converted, timeout, stale_ttl)
+        return result_converted
+
+    except Exception as e:
+        logger.error(f"Erro ao executar query {func.__name__}: {e}")
+        return _error_result(func)
+
+    finally:
+        if token:
+            await sync_to_async(_release_lock)(key, token)
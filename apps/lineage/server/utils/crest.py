@@ -1,62 +1,104 @@
-import base64, io, os
+import hashlib, io, logging, os
 
 from PIL import Image
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import reverse
 from apps.lineage.server.database import LineageDB
 
 from utils.dynamic_import import get_query_class  # importa o helper
 LineageStats = get_query_class("LineageStats")  # carrega a classe certa com base no .env
 
+logger = logging.getLogger(__name__)
 
-class CrestHandler:
-    def __init__(self):
-        # Certifique-se de que a pasta 'crests' exista para salvar as imagens
-        os.makedirs('crests', exist_ok=True)
+# Tamanho de exibição por tipo de crest (aliança ou clã)
+CREST_SIZES = {'clan': (16, 12), 'ally': (8, 12)}
 
-    def make_image(self, image_blob, crest_id, crest_type, show_image):
-        try:
-            # Abre a imagem do blob e converte para RGBA
-            image = Image.open(io.BytesIO(image_blob)).convert("RGBA")
+# PNGs ficam no cache (compartilhado entre os servidores web) e em disco (sobrevive a um flush;
+# no Docker é o volume `crests_data`, o mesmo em todos os containers)
+CREST_DIR = os.getenv('LINEAGE_CREST_DIR', os.path.join(settings.BASE_DIR, 'crests'))
+CACHE_PREFIX = 'lineage_crest:'
 
-            # Redimensiona conforme o tipo de crest (aliança ou clã)
-            if crest_type == 'ally':
-                image = image.resize((8, 12), Image.LANCZOS)
-            else:
-                image = image.resize((16, 12), Image.LANCZOS)
-
-            # Se show_image for False, salva a imagem em disco
-            if not show_image:
-                save_path = f"crests/{crest_id}.png"
-                image.save(save_path)
-
-            # Retorna a imagem em formato de bytes para exibição
-            byte_io = io.BytesIO()
-            image.save(byte_io, 'PNG')
-            byte_io.seek(0)
-            return byte_io
+# Ids já gravados por este processo: crest repetido só confere se o PNG ainda está no cache
+_stored = set()
 
-        except Exception as e:
-            raise Exception(f"Erro ao processar a imagem do crest: {e}")
 
-    def make_empty_image(self, crest_type):
-        try:
-            # Define o tamanho da imagem vazia conforme o tipo de crest
-            size = (8, 12) if crest_type == 'ally' else (16, 12)
-            image = Image.new("RGBA", size, (0, 0, 0, 0))  # Transparente
+def crest_asset_id(crest_blob, crest_type):
+    """Id do PNG pelo conteúdo: o mesmo crest tem sempre a mesma URL, um crest novo muda a URL."""
+    return hashlib.sha256(crest_type.encode() + b':' + (crest_blob or b'')).hexdigest()[:32]
 
-            # Salva a imagem vazia em bytes
-            byte_io = io.BytesIO()
-            image.save(byte_io, 'PNG')
-            byte_io.seek(0)
-            return byte_io
-        except Exception as e:
-            raise Exception(f"Erro ao criar imagem vazia: {e}")
 
+def render_crest(crest_blob, crest_type):
+    """Decodifica o crest do banco do jogo e gera o PNG no tamanho de exibição (transparente se vazio)."""
+    size = CREST_SIZES.get(crest_type, CREST_SIZES['clan'])
+    try:
+        if crest_blob:
+            image = Image.open(io.BytesIO(crest_blob)).convert("RGBA").resize(size, Image.LANCZOS)
+        else:
+            image = Image.new("RGBA", size, (0, 0, 0, 0))
+    except Exception as e:
+        logger.warning(f"Crest inválido ({crest_type}), usando imagem vazia: {e}")
+        image = Image.new("RGBA", size, (0, 0, 0, 0))
+
+    byte_io = io.BytesIO()
+    image.save(byte_io, 'PNG')
+    return byte_io.getvalue()
+
+
+def _crest_path(asset_id):
+    return os.path.join(CREST_DIR, f"{asset_id}.png")
+
+
+def store_crest(crest_blob, crest_type):
+    """Gera o PNG do crest uma única vez (por conteúdo) e retorna o id dele."""
+    asset_id = crest_asset_id(crest_blob, crest_type)
+    key = f"{CACHE_PREFIX}{asset_id}"
+    path = _crest_path(asset_id)
+    try:
+        # Um flush/eviction do Redis apaga o PNG mesmo que este processo já o tenha gravado
+        if asset_id in _stored and cache.has_key(key):
+            return asset_id
+        if cache.get(key) is None:
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    png = f.read()
+            else:
+                png = render_crest(crest_blob, crest_type)
+                os.makedirs(CREST_DIR, exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(png)
+                os.replace(tmp_path, path)
+            cache.set(key, png, timeout=None)
+        _stored.add(asset_id)
+    except Exception as e:
+        logger.warning(f"Erro ao gravar crest {asset_id}: {e}")
+    return asset_id
+
+
+def load_crest(asset_id):
+    """PNG de um crest já gravado, ou None."""
+    png = cache.get(f"{CACHE_PREFIX}{asset_id}")
+    if png is not None:
+        return png
+    try:
+        with open(_crest_path(asset_id), 'rb') as f:
+            png = f.read()
+    except (OSError, ValueError):
+        return None
+    cache.set(f"{CACHE_PREFIX}{asset_id}", png, timeout=None)
+    return png
+
+
+def crest_url(crest_blob, crest_type):
+    return reverse('server:crest_image', args=[store_crest(crest_blob, crest_type)])
 
 
 def attach_crests_to_clans(data, clan_key='clan_id', ally_key='ally_id'):
     """
-    Adiciona as imagens de crest base64 para cada clã ou personagem (que tenha clan_id).
-    Espera uma lista de dicionários.
+    Adiciona a URL do crest (`clan_crest_url` e `ally_crest_url`) para cada
+    clã ou personagem (que tenha clan_id). Espera uma lista de dicionários.
+    A imagem é servida por `crest_image_view`, com cache imutável no navegador.
     """
     if not data:
         return data
@@ -65,40 +107,17 @@ def attach_crests_to_clans(data, clan_key='clan_id', ally_key='ally_id'):
     if not db.is_connected():
         return data
 
-    crest_handler = CrestHandler()
-
     # Coleta os IDs únicos
     clan_ids = list({item.get(clan_key) for item in data if item.get(clan_key)})
     ally_ids = list({item.get(ally_key) for item in data if item.get(ally_key)})
 
-    # Busca os crests
-    crests = LineageStats.get_crests(clan_ids) or {}
-    ally_crests = LineageStats.get_crests(ally_ids, type='ally') or {}
+    # Busca os crests, indexados pelo id do clã/aliança
+    crests = {crest.get('clan_id'): crest.get('crest') for crest in LineageStats.get_crests(clan_ids) or []}
+    ally_crests = {crest.get('ally_id'): crest.get('crest')
+                   for crest in LineageStats.get_crests(ally_ids, type='ally') or []}
 
     for item in data:
-        crest_id = item.get(clan_key)
-
-        # Clã Crest
-        crest_blob = next((crest.get('crest') for crest in crests if crest.get('clan_id') == crest_id), None)
-        if crest_blob:
-            image_bytes = crest_handler.make_image(crest_blob, crest_id, 'clan', show_image=True)
-            image_bytes.seek(0)
-            item['clan_crest_image_base64'] = base64.b64encode(image_bytes.read()).decode('utf-8')
-        else:
-            empty_image_bytes = crest_handler.make_empty_image('clan')
-            empty_image_bytes.seek(0)
-            item['clan_crest_image_base64'] = base64.b64encode(empty_image_bytes.read()).decode('utf-8')
-
-        # Ally Crest
-        ally_id = item.get(ally_key)
-        ally_crest_blob = next((crest.get('crest') for crest in ally_crests if crest.get('ally_id') == ally_id), None)
-        if ally_crest_blob:
-            ally_image_bytes = crest_handler.make_image(ally_crest_blob, crest_id, 'ally', show_image=True)
-            ally_image_bytes.seek(0)
-            item['ally_crest_image_base64'] = base64.b64encode(ally_image_bytes.read()).decode('utf-8')
-        else:
-            empty_ally_image_bytes = crest_handler.make_empty_image('ally')
-            empty_ally_image_bytes.seek(0)
-            item['ally_crest_image_base64'] = base64.b64encode(empty_ally_image_bytes.read()).decode('utf-8')
+        item['clan_crest_url'] = crest_url(crests.get(item.get(clan_key)), 'clan')
+        item['ally_crest_url'] = crest_url(ally_crests.get(item.get(ally_key)), 'ally')
 
     return data
@@ -1,26 +1,117 @@
 import hashlib
 import base64
 import logging
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Digest = Callable[[bytes], bytes]
+
+# Implementações por algoritmo, em ordem de preferência. Cada loader devolve a
+# função de digest ou levanta exceção se a implementação não existe neste ambiente.
+_BACKENDS: Dict[str, List[Tuple[str, Callable[[], Digest]]]] = {}
+
+# Resposta conhecida conferida antes de usar uma implementação (vetor ISO/NESSIE)
+KNOWN_ANSWERS = {
+    "whirlpool": (
+        b"abc",
+        "4E2448A4C6F486BB16B6562C73B4020BF3043E3A731BCE721AE1B303D97E6D4C"
+        "7181EEBDB6C57E277D0E34957114CBD6C797FC9D95D8B582D225292076D4EEF5",
+    ),
+}
+
+
+def register_backend(algorithm: str, name: str):
+    """Registra um loader de implementação para `algorithm` (os primeiros têm preferência)."""
+    def decorator(loader: Callable[[], Digest]):
+        _BACKENDS.setdefault(algorithm, []).append((name, loader))
+        return loader
+    return decorator
+
+
+@register_backend("whirlpool", "hashlib")
+def _whirlpool_hashlib() -> Digest:
+    # OpenSSL 3 só expõe whirlpool com o provider "legacy" carregado
+    hashlib.new("whirlpool")
+    return lambda data: hashlib.new("whirlpool", data).digest()
+
+
+@register_backend("whirlpool", "whirlpool")
+def _whirlpool_extension() -> Digest:
+    # Extensão em C do PyPI (pip install whirlpool)
+    import whirlpool
+    return lambda data: whirlpool.new(data).digest()
+
+
+@register_backend("whirlpool", "python")
+def _whirlpool_python() -> Digest:
+    from utils.whirlpool import whirlpool_digest
+    return whirlpool_digest
+
+
+@register_backend("whirlpool", "python-reference")
+def _whirlpool_reference() -> Digest:
+    from utils.Whirlpool2003 import Whirlpool2003
+
+    def digest(data: bytes) -> bytes:
+        whirlpool = Whirlpool2003()
+        whirlpool.update(data)
+        return whirlpool.digest()
+    return digest
+
+
+def load_backend(algorithm: str, name: str) -> Optional[Digest]:
+    """Carrega a implementação `name`; None se indisponível ou se errar a resposta conhecida."""
+    for backend_name, loader in _BACKENDS.get(algorithm, []):
+        if backend_name != name:
+            continue
+        try:
+            digest = loader()
+        except Exception as e:
+            logger.debug(f"{algorithm}/{name} indisponível: {e}")
+            return None
+        sample = KNOWN_ANSWERS.get(algorithm)
+        if sample and digest(sample[0]).hex().upper() != sample[1]:
+            logger.warning(f"{algorithm}/{name} falhou no teste de resposta conhecida; ignorado")
+            return None
+        return digest
+    return None
+
+
+def available_backends(algorithm: str) -> Dict[str, Digest]:
+    backends = {}
+    for name, _ in _BACKENDS.get(algorithm, []):
+        digest = load_backend(algorithm, name)
+        if digest:
+            backends[name] = digest
+    return backends
+
+
+@lru_cache(maxsize=None)
+def get_hasher(algorithm: str) -> Tuple[str, Digest]:
+    """Melhor implementação disponível para `algorithm` (nativa antes da Python pura)."""
+    algorithm = algorithm.lower()
+    for name, _ in _BACKENDS.get(algorithm, []):
+        digest = load_backend(algorithm, name)
+        if digest:
+            logger.info(f"Hash {algorithm}: usando a implementação '{name}'")
+            return name, digest
+    if algorithm in _BACKENDS:
+        raise ValueError(f"nenhuma implementação de {algorithm} disponível")
+    hashlib.new(algorithm)  # algoritmo desconhecido: ValueError aqui, não no login
+    return "hashlib", lambda data: hashlib.new(algorithm, data).digest()
+
 
 class PasswordHash:
     def __init__(self, name):
         self.name = name.lower()
-        self.logger = logging.getLogger(__name__)
+        self.logger = logger
 
     def encrypt(self, password: str) -> str:
         try:
-            if self.name == 'whirlpool':
-                from utils.Whirlpool2003 import Whirlpool2003
-                whirlpool = Whirlpool2003()
-                whirlpool.update(password.encode())
-                hash_b64 = base64.b64encode(whirlpool.digest()).decode()
-            else:
-                hasher = hashlib.new(self.name)
-                hasher.update(password.encode())
-                digest = hasher.digest()
-                hash_b64 = base64.b64encode(digest).decode()
-
-            return hash_b64
+            _, digest = get_hasher(self.name)
+            return base64.b64encode(digest(password.encode())).decode()
         except Exception as e:
             self.logger.error(f"{self.name}: encryption error!", exc_info=e)
             raise
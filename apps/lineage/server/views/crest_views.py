@@ -0,0 +1,19 @@
+from django.http import HttpResponse, Http404
+from django.views.decorators.http import require_GET
+
+from apps.lineage.server.utils.crest import load_crest
+
+
+@require_GET
+def crest_image_view(request, asset_id):
+    # A URL muda junto com o conteúdo do crest, então o navegador pode guardar para sempre
+    if request.headers.get('If-None-Match') == f'"{asset_id}"':
+        response = HttpResponse(status=304)
+    else:
+        png = load_crest(asset_id)
+        if png is None:
+            raise Http404("Crest não encontrado.")
+        response = HttpResponse(png, content_type='image/png')
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    response['ETag'] = f'"{asset_id}"'
+    return response
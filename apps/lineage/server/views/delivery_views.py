@@ -0,0 +1,34 @@
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import require_GET
+
+from apps.lineage.server.models import GameDelivery
+
+
+def _delivery_json(delivery):
+    return {
+        'uuid': str(delivery.uuid),
+        'char_name': delivery.char_name,
+        'item_id': delivery.item_id,
+        'amount': delivery.amount,
+        'status': delivery.status,
+        'status_display': delivery.get_status_display(),
+        'attempts': delivery.attempts,
+        'created_at': delivery.created_at.isoformat(),
+        'delivered_at': delivery.delivered_at.isoformat() if delivery.delivered_at else None,
+    }
+
+
+@login_required
+@require_GET
+def delivery_status_view(request, delivery_uuid):
+    delivery = get_object_or_404(GameDelivery, uuid=delivery_uuid, user=request.user)
+    return JsonResponse(_delivery_json(delivery))
+
+
+@login_required
+@require_GET
+def recent_deliveries_view(request):
+    deliveries = GameDelivery.objects.filter(user=request.user).order_by('-created_at')[:10]
+    return JsonResponse({'deliveries': [_delivery_json(d) for d in deliveries]})
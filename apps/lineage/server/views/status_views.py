@@ -13,6 +13,8 @@ from utils.resources import get_class_name
 from utils.dynamic_import import get_query_class  # importa o helper
 LineageStats = get_query_class("LineageStats")  # carrega a classe certa com base no .env
 
+BOSS_JEWEL_IDS = [6656, 6657, 6658, 6659, 6660, 6661, 8191]
+
 
 @conditional_otp_required
 def siege_ranking_view(request):
@@ -179,8 +181,7 @@ def boss_jewel_locations_view(request):
     db = LineageDB()
     if db.is_connected():
 
-        boss_jewel_ids = [6656, 6657, 6658, 6659, 6660, 6661, 8191]
-        jewel_locations = LineageStats.boss_jewel_locations(boss_jewel_ids)
+        jewel_locations = LineageStats.boss_jewel_locations(BOSS_JEWEL_IDS)
 
         # Caminho para o itens.json
         itens_path = os.path.join(settings.BASE_DIR, 'utils/data/itens.json')
@@ -3,7 +3,7 @@ from django.views.generic import TemplateView
 from django.utils.translation import gettext_lazy as _
 from apps.lineage.server.utils.crest import attach_crests_to_clans
 from apps.lineage.server.database import LineageDB
-from apps.lineage.server.models import ActiveAdenaExchangeItem
+from apps.lineage.server.rankings import adena_params, get_ranking
 from datetime import datetime
 
 from utils.dynamic_import import get_query_class  # importa o helper
@@ -42,8 +42,7 @@ class TopsPvpView(TopsBaseView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        db = LineageDB()
-        result = LineageStats.top_pvp(limit=20) if db.is_connected() else []
+        result = get_ranking("pvp", limit=20)
         
         # Processar os dados para incluir nome da classe
         from utils.resources import get_class_name
@@ -66,8 +65,7 @@ class TopsPkView(TopsBaseView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        db = LineageDB()
-        result = LineageStats.top_pk(limit=20) if db.is_connected() else []
+        result = get_ranking("pk", limit=20)
         
         # Processar os dados para incluir nome da classe
         from utils.resources import get_class_name
@@ -90,16 +88,6 @@ class TopsAdenaView(TopsBaseView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        db = LineageDB()
-
-        adn_billion_item = 0
-        value_item = 1000000000
-
-        # Buscar o item ativo
-        active_item = ActiveAdenaExchangeItem.objects.filter(active=True).order_by('-created_at').first()
-        if active_item:
-            adn_billion_item = active_item.item_type
-            value_item = active_item.value_item
 
         def humanize_time(seconds):
             from datetime import timedelta
@@ -120,8 +108,8 @@ class TopsAdenaView(TopsBaseView):
                 parts.append(f"{minutes}m")
             return ' '.join(parts) if parts else "0m"
 
-        if db.is_connected():
-            result = LineageStats.top_adena(limit=20, adn_billion_item=adn_billion_item, value_item=value_item)
+        result = get_ranking("adena", limit=20, **adena_params())
+        if result:
             
             # Padronizar campo adena
             for player in result:
@@ -160,8 +148,7 @@ class TopsClansView(TopsBaseView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        db = LineageDB()
-        clanes = LineageStats.top_clans(limit=20) if db.is_connected() else []
+        clanes = get_ranking("clans", limit=20)
         clanes = attach_crests_to_clans(clanes)
         context['clans'] = clanes
         return context
@@ -175,7 +162,6 @@ class TopsLevelView(TopsBaseView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        db = LineageDB()
         
         def humanize_time(seconds):
             from datetime import timedelta
@@ -196,7 +182,7 @@ class TopsLevelView(TopsBaseView):
                 parts.append(f"{minutes}m")
             return ' '.join(parts) if parts else "0m"
 
-        result = LineageStats.top_level(limit=20) if db.is_connected() else []
+        result = get_ranking("level", limit=20)
         
         # Processar os dados para incluir nome da classe e tempo online humanizado
         from utils.resources import get_class_name
@@ -223,7 +209,6 @@ class TopsOnlineView(TopsBaseView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        db = LineageDB()
         
         def humanize_time(seconds):
             from datetime import timedelta
@@ -244,7 +229,7 @@ class TopsOnlineView(TopsBaseView):
                 parts.append(f"{minutes}m")
             return ' '.join(parts) if parts else "0m"
 
-        result = LineageStats.top_online(limit=20) if db.is_connected() else []
+        result = get_ranking("online", limit=20)
         
         # Processar os dados para incluir nome da classe e tempo online humanizado
         from utils.resources import get_class_name
@@ -2,6 +2,7 @@ from django.db import models
 from django.utils.translation import gettext_lazy as _
 from apps.main.home.models import User
 from core.models import BaseModel
+from utils.config_cache import register_config
 from decimal import Decimal
 
 
@@ -91,6 +92,9 @@ class CoinConfig(BaseModel):
         return f"{self.nome} - ID: {self.coin_id} - x{self.multiplicador}"
 
 
+register_config(CoinConfig, loader=lambda: CoinConfig.objects.filter(ativa=True).first())
+
+
 class CoinPurchaseBonus(BaseModel):
     valor_minimo = models.DecimalField(
         _("Valor Mínimo (R$)"), 
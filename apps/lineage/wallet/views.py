@@ -7,15 +7,17 @@ from .utils import transferir_para_jogador
 from decimal import Decimal
 from django.contrib.auth import authenticate
 from apps.main.home.models import User
-from django.db import transaction, models
+from django.db import IntegrityError, transaction, models
 from .signals import aplicar_transacao, aplicar_transacao_bonus
 from apps.lineage.server.database import LineageDB
+from apps.lineage.server.delivery import enqueue_delivery, new_idempotency_key
 from django.contrib.admin.views.decorators import staff_member_required
 from django.views.decorators.http import require_http_methods
 
 from apps.main.home.models import PerfilGamer
 
 from utils.dynamic_import import get_query_class
+from utils.config_cache import get_config
 TransferFromWalletToChar = get_query_class("TransferFromWalletToChar")
 LineageServices = get_query_class("LineageServices")
 
@@ -80,7 +82,7 @@ def transfer_to_server(request):
         messages.error(request, 'O banco do jogo está indisponível no momento. Tente novamente mais tarde.')
         return redirect('wallet:dashboard')
     
-    config = CoinConfig.objects.filter(ativa=True).first()
+    config = get_config(CoinConfig)
     if not config:
         messages.error(request, 'Nenhuma moeda configurada está ativa no momento.')
         return redirect('wallet:dashboard')
@@ -164,15 +166,20 @@ def transfer_to_server(request):
                         destino=nome_personagem
                     )
 
-                sucesso = TransferFromWalletToChar.insert_coin(
+                # Entrega vai para a fila, na mesma transação do débito; o worker grava no jogo
+                enqueue_delivery(
+                    user=request.user,
                     char_name=nome_personagem,
-                    coin_id=COIN_ID,
-                    amount=int(valor * multiplicador)
+                    item_id=COIN_ID,
+                    amount=int(valor * multiplicador),
+                    origem='wallet_bonus' if origem_saldo == 'bonus' else 'wallet',
+                    estorno={'valor': str(valor)},
+                    idempotency_key=request.POST.get('idempotency_key') or None,
                 )
 
-                if not sucesso:
-                    raise Exception(_("Erro ao adicionar a moeda ao personagem."))
-
+        except IntegrityError:
+            messages.warning(request, _("Esta transferência já foi registrada."))
+            return redirect('wallet:dashboard')
         except Exception as e:
             messages.error(request, f"Ocorreu um erro durante a transferência: {str(e)}")
             return redirect('wallet:dashboard')
@@ -181,9 +188,9 @@ def transfer_to_server(request):
         perfil.adicionar_xp(40)
 
         if origem_saldo == 'bonus':
-            messages.success(request, _(f"R${valor:.2f} do bônus transferidos com sucesso para o personagem {nome_personagem}."))
+            messages.success(request, _(f"R${valor:.2f} do bônus transferidos para o personagem {nome_personagem}. A entrega no jogo é feita em instantes."))
         else:
-            messages.success(request, _(f"R${valor:.2f} transferidos com sucesso para o personagem {nome_personagem}."))
+            messages.success(request, _(f"R${valor:.2f} transferidos para o personagem {nome_personagem}. A entrega no jogo é feita em instantes."))
         return redirect('wallet:dashboard')
 
     return render(request, 'wallet/transfer_to_server.html', {
@@ -191,6 +198,7 @@ def transfer_to_server(request):
         'personagens': personagens,
         'show_bonus_option': getattr(config, 'exibir_opcao_bonus_transferencia', False),
         'bonus_enabled': getattr(config, 'habilitar_transferencia_com_bonus', False),
+        'idempotency_key': new_idempotency_key(),
     })
 
 
@@ -6,3 +6,6 @@ class AdministratorConfig(AppConfig):
     name = 'apps.main.administrator'
     icon = 'fa fa-shield-alt'
     verbose_name = 'Administração'
+
+    def ready(self):
+        import apps.main.administrator.signals
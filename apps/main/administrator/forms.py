@@ -1,9 +1,11 @@
 from django import forms
 from django.core.exceptions import ValidationError
 from .models import Theme, ThemeVariable
+from .theme_manifest import theme_manifest
 from django.utils.text import slugify
 import re
 from django.template.loader import engines
+from django.db import transaction
 
 
 def limpar_cache_templates():
@@ -47,6 +49,9 @@ class ThemeForm(forms.ModelForm):
             try:
                 temp_theme.processar_upload()
                 limpar_cache_templates()
+                # Arquivos do tema substituídos em disco: remonta o manifesto depois
+                # que a transação do admin gravar o Theme (na hora, se não houver transação)
+                transaction.on_commit(theme_manifest.bump_version)
 
                 # Aplica os metadados ANTES da validação
                 self._meta_from_theme = {
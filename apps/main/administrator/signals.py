@@ -0,0 +1,16 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import BackgroundSetting, Theme, ThemeVariable
+from .theme_manifest import theme_manifest
+
+
+@receiver(post_save, sender=Theme)
+@receiver(post_delete, sender=Theme)
+@receiver(post_save, sender=ThemeVariable)
+@receiver(post_delete, sender=ThemeVariable)
+@receiver(post_save, sender=BackgroundSetting)
+@receiver(post_delete, sender=BackgroundSetting)
+def invalidate_theme_manifest(sender, **kwargs):
+    """Tema, variável ou background alterado: todos os processos remontam o manifesto"""
+    theme_manifest.invalidate()
@@ -1,3 +1,81 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import translation
+
+from core.context_processors import active_theme, background_setting, theme_variables
+from apps.main.home.utils import resolve_templated_path
+from .models import BackgroundSetting, Theme, ThemeVariable
+from .theme_manifest import theme_manifest
+
+
+class ThemeManifestTestCase(TestCase):
+
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_dir, ignore_errors=True)
+        settings_override = override_settings(BASE_DIR=self.base_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        theme_path = os.path.join(self.base_dir, 'themes', 'installed', 'aurora')
+        os.makedirs(os.path.join(theme_path, 'pages'))
+        for name in ('base.html', 'style.css', os.path.join('pages', 'index.html')):
+            with open(os.path.join(theme_path, name), 'w') as f:
+                f.write('')
+
+        Theme.objects.create(nome='Aurora', slug='aurora', ativo=True, upload='themes/aurora.zip')
+        ThemeVariable.objects.create(nome='aurora_titulo', valor_pt='Bem-vindo', valor_en='Welcome')
+        BackgroundSetting.objects.create(name='Inverno', image='backgrounds/inverno.png', is_active=True)
+
+        self.request = RequestFactory().get('/')
+        self.addCleanup(theme_manifest.bump_version)
+
+    def _context(self):
+        context = {}
+        for processor in (active_theme, background_setting, theme_variables):
+            context.update(processor(self.request))
+        return context
+
+    def test_context_processors_do_not_query(self):
+        theme_manifest.get()
+        with translation.override('en'), self.assertNumQueries(0):
+            for _ in range(10):
+                context = self._context()
+            template = resolve_templated_path(self.request, 'pages', 'pages/index.html')
+            fallback = resolve_templated_path(self.request, 'pages', 'pages/faq.html')
+
+        self.assertEqual(context['base_template'], 'installed/aurora/base.html')
+        self.assertEqual(set(context['theme_files']), {'base.html', 'style.css'})
+        self.assertEqual(context['aurora_titulo'], 'Welcome')
+        self.assertTrue(context['background_url'].endswith('backgrounds/inverno.png'))
+        self.assertEqual(template, 'installed/aurora/pages/index.html')
+        self.assertEqual(fallback, 'pages/pages/faq.html')
+
+    def test_changes_rebuild_the_manifest(self):
+        theme_manifest.get()
+
+        ThemeVariable.objects.get(nome='aurora_titulo').delete()
+        self.assertNotIn('aurora_titulo', self._context())
+
+        theme = Theme.objects.get(slug='aurora')
+        theme.ativo = False
+        theme.save()
+        context = self._context()
+        self.assertIsNone(context['active_theme'])
+        self.assertEqual(context['base_template'], 'layouts/base-default.html')
+
+        BackgroundSetting.objects.get().delete()
+        self.assertTrue(self._context()['background_url'].endswith('assets/img/l2/bgs/bg.png'))
+
+    def test_version_is_bumped_again_after_commit(self):
+        theme = Theme.objects.get(slug='aurora')
+        with mock.patch.object(theme_manifest, 'bump_version') as bump, \
+                self.captureOnCommitCallbacks(execute=True):
+            theme.descricao = 'Nova descrição'
+            theme.save()
+            self.assertEqual(bump.call_count, 1)
+        self.assertEqual(bump.call_count, 2)
@@ -0,0 +1,162 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from types import MappingProxyType
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.templatetags.static import static
+from django.utils.text import slugify
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'theme_manifest:version'
+
+# Intervalo (segundos) entre as consultas da versão no cache; 0 consulta a cada requisição
+CHECK_INTERVAL = float(os.getenv('THEME_MANIFEST_CHECK_INTERVAL', '1'))
+
+DEFAULT_BASE_TEMPLATE = "layouts/base-default.html"
+DEFAULT_BACKGROUND = 'assets/img/l2/bgs/bg.png'
+
+
+def theme_dir(slug):
+    return os.path.join(settings.BASE_DIR, 'themes', 'installed', slug)
+
+
+class ThemeManifest:
+    """
+    Tudo o que as páginas precisam do tema ativo, montado de uma vez: slug,
+    templates e arquivos instalados, variáveis por idioma e background.
+    Imutável depois de montado; o mesmo objeto atende todas as requisições
+    até o tema, suas variáveis ou o background mudarem.
+    """
+
+    __slots__ = ('version', 'slug', 'templates', 'assets', 'theme_files', 'variables', 'background_url', 'context')
+
+    def __init__(self, version, slug=None, assets=(), variables=None, background_url=None):
+        self.version = version
+        self.slug = slug
+        # Arquivos do tema (caminhos relativos à pasta dele, com '/')
+        self.assets = tuple(sorted(assets))
+        self.templates = frozenset(asset for asset in self.assets if asset.endswith(('.html', '.htm')))
+        self.theme_files = MappingProxyType({
+            asset: os.path.join('installed', slug, asset) for asset in self.assets if '/' not in asset
+        })
+        self.variables = MappingProxyType({
+            lang: MappingProxyType(values) for lang, values in (variables or {}).items()
+        })
+        self.background_url = background_url or static(DEFAULT_BACKGROUND)
+        self.context = MappingProxyType({
+            'active_theme': slug,
+            'base_template': f"installed/{slug}/base.html" if slug else DEFAULT_BASE_TEMPLATE,
+            'theme_slug': slug,
+            'path_theme': f'/themes/installed/{slug}' if slug else None,
+            'theme_files': self.theme_files,
+        })
+
+    def has_template(self, template_name):
+        return self.slug is not None and template_name.replace('\\', '/') in self.templates
+
+    def template_path(self, template_name):
+        """Caminho do template no tema ativo, ou None se o tema não o sobrescreve."""
+        if self.has_template(template_name):
+            return f"installed/{self.slug}/{template_name}"
+        return None
+
+    def variables_for(self, lang_code):
+        # Idioma sem valores próprios usa os valores em português (como get_valor_convertido)
+        return self.variables.get(lang_code) or self.variables.get('pt', {})
+
+
+def build_manifest(version=None):
+    """Monta o manifesto do tema ativo (três consultas e uma varredura da pasta do tema)."""
+    from .models import BackgroundSetting, Theme, ThemeVariable
+
+    theme = Theme.objects.filter(ativo=True).first()
+    slug, assets = None, []
+    if theme:
+        slug = slugify(theme.slug)
+        root = theme_dir(slug)
+        for dirpath, _dirnames, filenames in os.walk(root):
+            relative = os.path.relpath(dirpath, root)
+            for filename in filenames:
+                path = filename if relative == '.' else os.path.join(relative, filename)
+                assets.append(path.replace(os.sep, '/'))
+
+    rows = list(ThemeVariable.objects.all())
+    variables = {
+        lang: {var.nome: var.get_valor_convertido(lang) for var in rows}
+        for lang, _name in settings.LANGUAGES
+    }
+
+    bg = BackgroundSetting.get_active()
+    background_url = bg.image.url if bg and bg.image else None
+
+    return ThemeManifest(version, slug, assets, variables, background_url)
+
+
+class ThemeManifestStore:
+    """
+    Manifesto do tema por processo. É trocado por inteiro quando a versão no
+    cache muda (`invalidate`, chamado pelos signals de Theme, ThemeVariable e
+    BackgroundSetting), consultada no máximo a cada CHECK_INTERVAL.
+    """
+
+    def __init__(self, check_interval=CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._manifest = None
+        self._checked_at = 0.0
+
+    def get(self):
+        manifest = self._manifest
+        now = time.monotonic()
+        if manifest is not None and now - self._checked_at < self.check_interval:
+            return manifest
+
+        version = self._current_version()
+        if manifest is None or manifest.version != version:
+            with self._lock:
+                manifest = self._manifest
+                if manifest is None or manifest.version != version:
+                    manifest = build_manifest(version)
+                    self._manifest = manifest
+                    logger.debug(f"Manifesto do tema recarregado (tema {manifest.slug}, versão {version})")
+        self._checked_at = now
+        return manifest
+
+    def _current_version(self):
+        try:
+            version = cache.get(VERSION_KEY)
+            if version is None:
+                cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+                version = cache.get(VERSION_KEY)
+            return version
+        except Exception as e:
+            logger.warning(f"Erro ao ler versão do manifesto do tema no cache: {e}")
+            # Sem cache, mantém o manifesto atual até a próxima consulta
+            return self._manifest.version if self._manifest is not None else None
+
+    def bump_version(self):
+        """Marca os manifestos de todos os processos como desatualizados."""
+        with self._lock:
+            self._manifest = None
+        try:
+            cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+        except Exception as e:
+            logger.warning(f"Erro ao atualizar versão do manifesto do tema no cache: {e}")
+
+    def invalidate(self):
+        """
+        Tema alterado: troca a versão agora e de novo após o commit, já que
+        outro processo pode ter remontado o manifesto com as linhas antigas.
+        """
+        self.bump_version()
+        transaction.on_commit(self.bump_version)
+
+
+# Instância global do manifesto do tema
+theme_manifest = ThemeManifestStore()
@@ -9,9 +9,7 @@ from apps.main.notification.models import Notification
 from apps.main.news.models import News
 from apps.main.solicitation.models import Solicitation, SolicitationParticipant
 from django.http import HttpResponse, Http404
-from django.conf import settings
-import os
-from core.context_processors import active_theme
+from .theme_manifest import theme_manifest
 from django_otp.plugins.otp_totp.models import TOTPDevice
 
 from .models import ChatGroup
@@ -109,22 +107,19 @@ def error_chat(request):
 
 
 def serve_theme_file(request, file_name):
-    # Obtém o contexto do tema ativo
-    context_data = active_theme(request)
-    path_theme = context_data.get('path_theme')
+    # Obtém o manifesto do tema ativo
+    manifest = theme_manifest.get()
 
-    if not path_theme:
+    if not manifest.slug:
         raise Http404(_("Tema não encontrado."))
 
-    # Caminho relativo com separador compatível com Django
-    template_relative_path = os.path.join(path_theme, file_name + '.html').replace('\\', '/').replace("/themes/", "")
-
-    # Verifica se o arquivo existe no sistema de arquivos
-    if not os.path.isfile(os.path.join(settings.BASE_DIR, path_theme.replace("/themes/", "themes/"), file_name + '.html')):
+    # Verifica se o arquivo está instalado no tema
+    template_path = manifest.template_path(file_name + '.html')
+    if not template_path:
         raise Http404(_("Arquivo não encontrado no tema."))
 
     # Renderiza o template
-    return render(request, template_relative_path)
+    return render(request, template_path)
 
 
 @conditional_otp_required
@@ -0,0 +1,22 @@
+"""Chaves de cache da página inicial (`views.index`), nos mesmos formatos e tempos da view."""
+from apps.lineage.server.prewarm import register_prewarm, warm_key
+from apps.lineage.server.rankings import get_ranking
+from apps.lineage.server.utils.crest import attach_crests_to_clans
+from utils.dynamic_import import get_query_class
+
+LineageStats = get_query_class("LineageStats")
+
+INDEX_CACHE_TIMEOUT = 60
+
+
+@register_prewarm("index:index_top_clans")
+def _index_top_clans():
+    def load():
+        clanes = get_ranking("clans", limit=10) or []
+        return attach_crests_to_clans(clanes) if clanes else clanes
+    warm_key("index_top_clans", INDEX_CACHE_TIMEOUT, load)
+
+
+@register_prewarm("index:index_players_online")
+def _index_players_online():
+    warm_key("index_players_online", INDEX_CACHE_TIMEOUT, lambda: LineageStats.players_online() or [])
@@ -1,8 +1,6 @@
 from django.core.exceptions import ValidationError
 import re
-import os
-from django.conf import settings
-from core.context_processors import active_theme
+from apps.main.administrator.theme_manifest import theme_manifest
 
 
 def remove_cpf_mask(cpf):
@@ -48,12 +46,4 @@ def resolve_templated_path(request, base_path, template_name):
     Resolve o caminho do template com base no tema ativo.
     Se existir no tema, retorna esse caminho. Senão, retorna o fallback.
     """
-    context_processor_data = active_theme(request)
-    theme_slug = context_processor_data.get('theme_slug', '')
-
-    if theme_slug:
-        theme_template_path = os.path.join(settings.BASE_DIR, 'themes', 'installed', theme_slug, template_name)
-        if os.path.isfile(theme_template_path):
-            return f"installed/{theme_slug}/{template_name}"
-
-    return f"{base_path}/{template_name}"
+    return theme_manifest.get().template_path(template_name) or f"{base_path}/{template_name}"
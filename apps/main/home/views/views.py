@@ -22,6 +22,7 @@ from django.utils import translation
 from django_otp.plugins.otp_totp.models import TOTPDevice
 
 from apps.lineage.server.utils.crest import attach_crests_to_clans
+from apps.lineage.server.rankings import get_ranking
 from apps.main.home.decorator import conditional_otp_required
 from apps.lineage.server.models import IndexConfig, Apoiador
 from apps.lineage.wallet.models import Wallet
@@ -32,6 +33,7 @@ from utils.render_theme_page import render_theme_page
 from apps.main.news.models import News
 from utils.services import verificar_conquistas
 from utils.dynamic_import import get_query_class
+from utils.config_cache import get_config
 from apps.main.home.tasks import send_email_task
 from utils.fake_players import apply_fake_players
 from utils.server_status import check_server_status
@@ -59,7 +61,7 @@ def index(request):
         try:
             # Timeout curto para evitar travamento
             start_time = time.time()
-            clanes = LineageStats.top_clans(limit=10) or []
+            clanes = get_ranking("clans", limit=10) or []
             
             # Se demorou mais que 2 segundos, usa cache vazio
             if time.time() - start_time > 2:
@@ -97,7 +99,7 @@ def index(request):
             cache.set(online_cache_key, online, 30)  # Cache erro por 30s
 
     # Pega a configuração do índice (ex: nome do servidor)
-    config = IndexConfig.objects.first()
+    config = get_config(IndexConfig)
 
     # Contagem de jogadores online
     online_count = online[0]['quant'] if online and isinstance(online, list) and 'quant' in online[0] else 0
@@ -107,7 +109,8 @@ def index(request):
     # Pega a tradução configurada
     translation = None
     if config:
-        translation = config.translations.filter(language=current_lang).first()
+        # Traduções já vêm carregadas com a configuração
+        translation = next((t for t in config.translations.all() if t.language == current_lang), None)
 
     # Caso não exista o registro de configuração ou tradução, usa valores padrões
     nome_servidor = "Lineage 2 PDL"
@@ -1,10 +1,10 @@
-import time
 import requests
 from django.core.cache import cache
 from django.utils import timezone
 from django.conf import settings
-from .models import License, LicenseVerification
+from .models import License
 from .utils import license_validator, license_crypto
+from .snapshot import license_snapshot
 
 
 class LicenseManager:
@@ -37,68 +37,24 @@ class LicenseManager:
     
     def check_license_status(self, request=None):
         """
-        Verifica se a licença atual é válida
+        Verifica se a licença atual é válida, pelo snapshot validado
+        (memória do processo + cache). Não escreve no banco: a verificação é
+        contada em memória e gravada periodicamente (`flush_license_verifications`).
         """
-        start_time = time.time()
-        current_license = self.get_current_license()
-        
-        if not current_license:
-            self._record_verification(None, request, False, "Nenhuma licença encontrada", start_time)
-            return False
-        
-        try:
-            # Verifica se a licença está ativa
-            if current_license.status != 'active':
-                self._record_verification(current_license, request, False, f"Licença com status: {current_license.status}", start_time)
-                # Limpa o cache para garantir que mudanças no admin sejam refletidas
-                cache.delete(self.cache_key)
-                return False
-            
-            # Verifica se não expirou (apenas para licenças PRO)
-            if current_license.license_type == 'pro' and current_license.expires_at:
-                if current_license.expires_at < timezone.now():
-                    current_license.status = 'expired'
-                    current_license.save()
-                    # Limpa o cache após mudança de status
-                    cache.delete(self.cache_key)
-                    self._record_verification(current_license, request, False, "Licença expirada", start_time)
-                    return False
-            
-            # Verifica se deve fazer verificação remota (desabilitada em desenvolvimento)
-            if self._should_verify_remotely(current_license) and not settings.DEBUG:
-                remote_valid = self._verify_remotely(current_license, request)
-                if not remote_valid:
-                    self._record_verification(current_license, request, False, "Falha na verificação remota", start_time)
-                    return False
-            
-            # Atualiza última verificação
-            current_license.last_verification = timezone.now()
-            current_license.verification_count += 1
-            current_license.save()
-            
-            # Limpa o cache para garantir dados atualizados
-            cache.delete(self.cache_key)
-            
-            self._record_verification(current_license, request, True, "", start_time)
-            return True
-            
-        except Exception as e:
-            self._record_verification(current_license, request, False, f"Erro na verificação: {str(e)}", start_time)
-            return False
+        snapshot = license_snapshot.get()
+        license_snapshot.record(snapshot)
+        return snapshot['valid']
     
     def can_use_feature(self, feature_name, request=None):
         """
         Verifica se a licença permite usar uma funcionalidade específica
         """
-        license = self.get_current_license()
-        
-        if not license:
-            return False
-        
-        if not self.check_license_status(request):
+        snapshot = license_snapshot.get()
+        license_snapshot.record(snapshot)
+        if not snapshot['valid']:
             return False
         
-        return license.can_use_feature(feature_name)
+        return snapshot['features'].get(feature_name, False)
     
     def activate_license(self, license_key, domain, contact_email, company_name="", contact_phone=""):
         """
@@ -238,59 +194,13 @@ class LicenseManager:
             print(f"[LicenseManager] Erro na verificação remota: {e}")
             return False
     
-    def _record_verification(self, license, request, success, error_message, start_time):
-        """
-        Registra uma verificação de licença
-        """
-        try:
-            # Se não há licença, não registra a verificação
-            if not license:
-                print(f"[LicenseManager] Verificação não registrada: Nenhuma licença disponível")
-                return
-            
-            response_time = (time.time() - start_time) * 1000  # em milissegundos
-            
-            verification = LicenseVerification(
-                license=license,
-                success=success,
-                error_message=error_message,
-                response_time=response_time
-            )
-            
-            if request:
-                verification.ip_address = self._get_client_ip(request)
-                verification.user_agent = request.META.get('HTTP_USER_AGENT', '')
-            else:
-                # Se não há request, usa valores padrão
-                verification.ip_address = '127.0.0.1'
-                verification.user_agent = 'System/CLI'
-            
-            verification.save()
-            
-        except Exception as e:
-            print(f"[LicenseManager] Erro ao registrar verificação: {e}")
-            # Não falha a verificação por causa do erro de registro
-    
-    def _get_client_ip(self, request):
-        """
-        Obtém o IP do cliente
-        """
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
-    
     def get_license_info(self):
         """
         Retorna informações da licença atual
         """
-        license = self.get_current_license()
-        
-        if not license:
-            return None
-        
+        return license_snapshot.get()['info']
+    
+    def _license_info(self, license):
         return {
             'type': license.get_license_type_display(),
             'status': license.get_status_display(),
@@ -47,11 +47,11 @@ class LicenseMiddleware:
         
         # Se não for exceção, verifica a licença
         if not is_exempt:
-            # Verifica se há licença ativa
-            current_license = license_manager.get_current_license()
-            if current_license:
+            # Verifica se há licença ativa (snapshot em memória/cache, sem consultar o banco)
+            license_info = license_manager.get_license_info()
+            if license_info:
                 request.license_status['has_license'] = True
-                request.license_status['license_info'] = license_manager.get_license_info()
+                request.license_status['license_info'] = license_info
                 
                 # Verifica se a licença está válida
                 is_valid = license_manager.check_license_status(request)
@@ -143,6 +143,10 @@ class License(BaseModel):
         
         super().save(*args, **kwargs)
         
+        # Estado validado usado nas requisições: remonta com os dados novos
+        from .snapshot import license_snapshot
+        license_snapshot.invalidate()
+        
         # Limpa o cache se o status foi alterado
         if status_changed:
             from django.core.cache import cache
@@ -0,0 +1,177 @@
+import threading
+import time
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+from django.conf import settings
+
+
+class LicenseSnapshot:
+    """
+    Estado validado da licença para o caminho das requisições.
+
+    O snapshot fica em dois níveis: na memória do processo (por alguns
+    segundos) e no cache/Redis (por SNAPSHOT_REFRESH_INTERVAL), e só é
+    remontado a partir do banco quando os dois vencem. As verificações são
+    contadas na memória, repassadas ao cache junto com a renovação do
+    snapshot local, e gravadas no banco periodicamente pela task
+    `flush_license_verifications`. Uma requisição normal não escreve no banco.
+    """
+
+    SNAPSHOT_KEY = 'license_snapshot'
+    COUNTER_PREFIX = 'license_snapshot:verificacoes:'
+
+    NO_LICENSE = "Nenhuma licença encontrada"
+    EXPIRED = "Licença expirada"
+    REMOTE_FAILED = "Falha na verificação remota"
+    # Resultado de uma verificação: '' (sucesso) ou o motivo da falha
+    RESULTS = ('', NO_LICENSE, EXPIRED, REMOTE_FAILED)
+
+    def __init__(self):
+        config = settings.LICENSE_CONFIG
+        self.refresh_interval = config.get('SNAPSHOT_REFRESH_INTERVAL', 60)
+        self.local_ttl = config.get('SNAPSHOT_LOCAL_TTL', 5)
+        self._lock = threading.Lock()
+        self._local = None
+        self._local_at = 0.0
+        self._pending = {}
+
+    def get(self):
+        """Snapshot atual (dict com `valid`, `reason`, `license_id`, `features`, `info`...)."""
+        now = time.time()
+        snapshot = self._local
+        if snapshot is None or now - self._local_at > self.local_ttl or self._expired(snapshot):
+            snapshot = self._refresh_local()
+        return snapshot
+
+    def _expired(self, snapshot):
+        # Licença PRO que venceu depois da montagem do snapshot
+        return snapshot['valid'] and snapshot['expires_at'] is not None and snapshot['expires_at'] < time.time()
+
+    def _refresh_local(self):
+        self.push_counters()
+        snapshot = None
+        try:
+            snapshot = cache.get(self.SNAPSHOT_KEY)
+        except Exception as e:
+            print(f"[LicenseSnapshot] Erro ao ler snapshot do cache: {e}")
+        if snapshot is None or time.time() - snapshot['checked_at'] > self.refresh_interval or self._expired(snapshot):
+            snapshot = self.build()
+            try:
+                cache.set(self.SNAPSHOT_KEY, snapshot, self.refresh_interval * 2)
+            except Exception as e:
+                print(f"[LicenseSnapshot] Erro ao salvar snapshot no cache: {e}")
+        with self._lock:
+            self._local, self._local_at = snapshot, time.time()
+        return snapshot
+
+    def build(self):
+        """Valida a licença ativa a partir do banco (uma leitura; só escreve se ela tiver expirado)."""
+        from .manager import license_manager
+        from .models import License
+
+        license = License.objects.filter(status='active').first()
+        snapshot = {
+            'license_id': license.pk if license else None,
+            'valid': False,
+            'reason': '',
+            'features': dict(license.features_enabled or {}) if license else {},
+            'expires_at': None,
+            'info': license_manager._license_info(license) if license else None,
+            'checked_at': time.time(),
+        }
+        if not license:
+            snapshot['reason'] = self.NO_LICENSE
+            return snapshot
+
+        if license.license_type == 'pro' and license.expires_at:
+            snapshot['expires_at'] = license.expires_at.timestamp()
+            if license.expires_at < timezone.now():
+                license.status = 'expired'
+                license.save()
+                snapshot['reason'] = self.EXPIRED
+                return snapshot
+
+        # Verificação remota (desabilitada em desenvolvimento), no máximo uma vez por intervalo
+        if license_manager._should_verify_remotely(license) and not settings.DEBUG:
+            if not license_manager._verify_remotely(license, None):
+                snapshot['reason'] = self.REMOTE_FAILED
+                return snapshot
+
+        snapshot['valid'] = True
+        return snapshot
+
+    def invalidate(self):
+        """Descarta o snapshot (licença alterada); os outros processos renovam em até SNAPSHOT_LOCAL_TTL."""
+        with self._lock:
+            self._local = None
+        try:
+            cache.delete(self.SNAPSHOT_KEY)
+        except Exception as e:
+            print(f"[LicenseSnapshot] Erro ao invalidar snapshot: {e}")
+
+    def record(self, snapshot):
+        """Conta uma verificação na memória do processo."""
+        result = '' if snapshot['valid'] else snapshot['reason']
+        with self._lock:
+            self._pending[result] = self._pending.get(result, 0) + 1
+
+    def _counter_key(self, result):
+        return f"{self.COUNTER_PREFIX}{self.RESULTS.index(result)}"
+
+    def push_counters(self):
+        """Soma os contadores do processo no cache (INCR, atômico entre processos)."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for result, count in pending.items():
+            key = self._counter_key(result)
+            try:
+                cache.add(key, 0, None)
+                cache.incr(key, count)
+            except Exception as e:
+                print(f"[LicenseSnapshot] Erro ao repassar contadores: {e}")
+
+    def flush(self):
+        """
+        Grava no banco as verificações acumuladas: soma em `verification_count`,
+        atualiza `last_verification` e registra um LicenseVerification por
+        resultado (sucesso ou motivo da falha) com o total do período.
+        """
+        from .models import License, LicenseVerification
+
+        self.push_counters()
+        counts = {}
+        for result in self.RESULTS:
+            key = self._counter_key(result)
+            count = cache.get(key) or 0
+            if count:
+                # DECR em vez de apagar: não perde o que outros processos somaram nesse meio-tempo
+                cache.decr(key, count)
+                counts[result] = count
+        if not counts:
+            return 0
+
+        license = License.objects.filter(status='active').first() or License.objects.first()
+        if not license:
+            return 0
+
+        if counts.get(''):
+            License.objects.filter(pk=license.pk).update(
+                verification_count=F('verification_count') + counts[''],
+                last_verification=timezone.now(),
+            )
+        LicenseVerification.objects.bulk_create([
+            LicenseVerification(
+                license=license,
+                success=not result,
+                error_message=result,
+                ip_address='127.0.0.1',
+                user_agent=f'LicenseSnapshot ({count} verificações)',
+            )
+            for result, count in counts.items()
+        ])
+        return sum(counts.values())
+
+
+# Instância global do snapshot de licença
+license_snapshot = LicenseSnapshot()
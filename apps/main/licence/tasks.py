@@ -0,0 +1,13 @@
+from celery import shared_task
+
+
+@shared_task
+def flush_license_verifications():
+    """Grava no banco as verificações de licença acumuladas pelo snapshot."""
+    from apps.main.licence.snapshot import license_snapshot
+
+    try:
+        return license_snapshot.flush()
+    except Exception as e:
+        print(f"❌ Erro ao gravar verificações de licença: {e}")
+        return 0
@@ -1,3 +1,48 @@
-from django.test import TestCase
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from .manager import license_manager
+from .snapshot import LicenseSnapshot, license_snapshot
+
+
+class LicenseSnapshotTestCase(SimpleTestCase):
+
+    def setUp(self):
+        license_snapshot.invalidate()
+        license_snapshot._pending.clear()
+        for result in LicenseSnapshot.RESULTS:
+            cache.delete(license_snapshot._counter_key(result))
+        self.addCleanup(license_snapshot.invalidate)
+
+    def _snapshot(self, **overrides):
+        snapshot = {'license_id': 1, 'valid': True, 'reason': '', 'features': {'api_access': True},
+                    'expires_at': None, 'info': {'domain': 'pdl.local'}, 'checked_at': time.time()}
+        snapshot.update(overrides)
+        return snapshot
+
+    def test_requests_do_not_touch_the_database(self):
+        # SimpleTestCase falha em qualquer consulta ao banco: só o build (mockado) poderia fazer uma
+        with mock.patch.object(LicenseSnapshot, 'build', return_value=self._snapshot()) as build:
+            for _ in range(50):
+                self.assertTrue(license_manager.check_license_status())
+                self.assertTrue(license_manager.can_use_feature('api_access'))
+                self.assertFalse(license_manager.can_use_feature('source_code'))
+            self.assertEqual(license_manager.get_license_info(), {'domain': 'pdl.local'})
+        self.assertEqual(build.call_count, 1)
+
+        license_snapshot.push_counters()
+        self.assertEqual(cache.get(license_snapshot._counter_key('')), 150)
+
+    def test_expired_snapshot_is_rebuilt(self):
+        # Snapshot no cache ainda válido, mas a licença venceu depois de montado
+        cache.set(LicenseSnapshot.SNAPSHOT_KEY, self._snapshot(expires_at=time.time() - 1))
+        rebuilt = self._snapshot(valid=False, reason=LicenseSnapshot.EXPIRED)
+        with mock.patch.object(LicenseSnapshot, 'build', return_value=rebuilt) as build:
+            self.assertFalse(license_manager.check_license_status())
+        self.assertEqual(build.call_count, 1)
+
+        license_snapshot.push_counters()
+        self.assertEqual(cache.get(license_snapshot._counter_key(LicenseSnapshot.EXPIRED)), 1)
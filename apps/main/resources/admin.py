@@ -3,6 +3,7 @@ from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
 from core.admin import BaseModelAdmin
 from .models import SystemResource
+from .snapshot import resource_snapshot
 
 
 @admin.register(SystemResource)
@@ -45,6 +46,8 @@ class SystemResourceAdmin(BaseModelAdmin):
     def activate_resources(self, request, queryset):
         """Ação para ativar recursos selecionados"""
         updated = queryset.update(is_active=True)
+        # update() não dispara signals
+        resource_snapshot.invalidate()
         self.message_user(
             request,
             _('{} recursos foram ativados com sucesso.').format(updated),
@@ -55,6 +58,8 @@ class SystemResourceAdmin(BaseModelAdmin):
     def deactivate_resources(self, request, queryset):
         """Ação para desativar recursos selecionados"""
         updated = queryset.update(is_active=False)
+        # update() não dispara signals
+        resource_snapshot.invalidate()
         self.message_user(
             request,
             _('{} recursos foram desativados com sucesso.').format(updated),
@@ -41,14 +41,11 @@ class SystemResource(BaseModel):
     @classmethod
     def is_resource_active(cls, resource_name):
         """
-        Verifica se um recurso específico está ativo
+        Verifica se um recurso específico está ativo (pelo snapshot dos recursos)
         """
-        try:
-            resource = cls.objects.get(name=resource_name)
-            return resource.is_active
-        except cls.DoesNotExist:
-            # Se o recurso não existir, considera como ativo por padrão
-            return True
+        from .snapshot import resource_snapshot
+        # Se o recurso não existir, considera como ativo por padrão
+        return resource_snapshot.get().is_active(resource_name)
 
     @classmethod
     def get_active_resources_by_category(cls, category):
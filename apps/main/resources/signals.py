@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import SystemResource
+from .snapshot import resource_snapshot
+
+
+@receiver(post_save, sender=SystemResource)
+@receiver(post_delete, sender=SystemResource)
+def invalidate_resource_snapshot(sender, **kwargs):
+    """Recurso alterado: todos os processos recarregam o snapshot"""
+    resource_snapshot.invalidate()
@@ -0,0 +1,206 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from types import MappingProxyType
+
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# Mapeamento de prefixos de URL para recursos (o prefixo mais longo vence)
+PATH_MAPPING = {
+    # Shop
+    '/app/shop/': 'shop_module',
+    '/app/shop/cart/': 'shop_cart',
+    '/app/shop/cart/add-item/': 'shop_cart',
+    '/app/shop/cart/add-package/': 'shop_cart',
+    '/app/shop/cart/checkout/': 'shop_checkout',
+    '/app/shop/purchases/': 'shop_purchases',
+    '/app/shop/manager/dashboard/': 'shop_dashboard',
+
+    # Wallet
+    '/app/wallet/': 'wallet_module',
+    '/app/wallet/dashboard/': 'wallet_dashboard',
+    '/app/wallet/transfer/': 'wallet_transfer',
+    '/app/wallet/history/': 'wallet_history',
+
+    # Social
+    '/social/': 'social_module',
+    '/social/feed/': 'social_feed',
+    '/social/profile/': 'social_profile',
+    '/social/search/': 'social_search',
+
+    # Games
+    '/app/game/': 'games_module',
+    '/app/game/battle-pass/': 'battle_pass',
+    '/app/game/box-opening/': 'box_opening',
+    '/app/game/roulette/': 'roulette',
+
+    # Auction
+    '/app/auction/': 'auction_module',
+    '/app/auction/list/': 'auction_list',
+    '/app/auction/create/': 'auction_create',
+
+    # Inventory
+    '/app/inventory/': 'inventory_module',
+    '/app/inventory/dashboard/': 'inventory_dashboard',
+
+    # Payment
+    '/app/payment/': 'payment_module',
+    '/app/payment/process/': 'payment_process',
+    '/app/payment/history/': 'payment_history',
+}
+
+# Hierarquia pré-definida (recurso -> módulo pai)
+HIERARCHY = {
+    'battle_pass': 'games_module',
+    'box_opening': 'games_module',
+    'roulette': 'games_module',
+    'shop_dashboard': 'shop_module',
+    'shop_items': 'shop_module',
+    'shop_packages': 'shop_module',
+    'shop_cart': 'shop_module',
+    'shop_checkout': 'shop_module',
+    'shop_purchases': 'shop_module',
+    'wallet_dashboard': 'wallet_module',
+    'wallet_transfer': 'wallet_module',
+    'wallet_history': 'wallet_module',
+    'social_feed': 'social_module',
+    'social_profile': 'social_module',
+    'social_search': 'social_module',
+    'auction_list': 'auction_module',
+    'auction_create': 'auction_module',
+    'inventory_dashboard': 'inventory_module',
+    'payment_process': 'payment_module',
+    'payment_history': 'payment_module',
+}
+
+VERSION_KEY = 'resources:snapshot_version'
+
+# Intervalo (segundos) entre as consultas da versão no cache; 0 consulta a cada requisição
+CHECK_INTERVAL = float(os.getenv('RESOURCES_SNAPSHOT_CHECK_INTERVAL', '1'))
+
+# Chave do nó da trie que guarda se o prefixo terminado ali está liberado
+_ALLOWED = ''
+
+
+def _segments(path):
+    """Segmentos completos do caminho: '/app/shop/cart' -> ['app', 'shop'] (o último não termina em '/')."""
+    return path.split('/')[1:-1]
+
+
+class ResourceSnapshot:
+    """
+    Estado compilado dos recursos: `flags` (nome -> ativo) e a trie de
+    prefixos de URL, em que cada nó de prefixo mapeado já traz o resultado
+    considerando o módulo pai. Imutável depois de montado.
+    """
+
+    __slots__ = ('version', 'flags', 'trie')
+
+    def __init__(self, version, flags):
+        self.version = version
+        self.flags = MappingProxyType(dict(flags))
+        self.trie = self._compile()
+
+    def is_active(self, resource_name):
+        # Recurso não cadastrado é considerado ativo
+        return self.flags.get(resource_name, True)
+
+    def is_effectively_active(self, resource_name):
+        parent = HIERARCHY.get(resource_name)
+        if parent and not self.is_active(parent):
+            return False
+        return self.is_active(resource_name)
+
+    def _compile(self):
+        trie = {}
+        for prefix, resource_name in PATH_MAPPING.items():
+            node = trie
+            for segment in _segments(prefix):
+                node = node.setdefault(segment, {})
+            node[_ALLOWED] = self.is_effectively_active(resource_name)
+        return trie
+
+    def allows(self, path):
+        """Resultado do prefixo mapeado mais longo do caminho (caminho não mapeado passa direto)."""
+        allowed = True
+        node = self.trie
+        for segment in _segments(path):
+            node = node.get(segment)
+            if node is None:
+                break
+            allowed = node.get(_ALLOWED, allowed)
+        return allowed
+
+
+class ResourceSnapshotStore:
+    """
+    Snapshot dos recursos por processo. É montado com uma consulta e trocado
+    por inteiro quando a versão no cache muda (`invalidate`, chamado pelos
+    signals do SystemResource e pelas ações do admin), consultada no máximo a
+    cada CHECK_INTERVAL.
+    """
+
+    def __init__(self, check_interval=CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._checked_at = 0.0
+
+    def get(self):
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if snapshot is not None and now - self._checked_at < self.check_interval:
+            return snapshot
+
+        version = self._current_version()
+        if snapshot is None or snapshot.version != version:
+            with self._lock:
+                snapshot = self._snapshot
+                if snapshot is None or snapshot.version != version:
+                    snapshot = ResourceSnapshot(version, self._load_flags())
+                    self._snapshot = snapshot
+                    logger.debug(f"Snapshot de recursos recarregado (versão {version})")
+        self._checked_at = now
+        return snapshot
+
+    def _current_version(self):
+        try:
+            version = cache.get(VERSION_KEY)
+            if version is None:
+                cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+                version = cache.get(VERSION_KEY)
+            return version
+        except Exception as e:
+            logger.warning(f"Erro ao ler versão dos recursos no cache: {e}")
+            # Sem cache, mantém o snapshot atual até a próxima consulta
+            return self._snapshot.version if self._snapshot is not None else None
+
+    def _load_flags(self):
+        from .models import SystemResource
+        return dict(SystemResource.objects.values_list('name', 'is_active'))
+
+    def bump_version(self):
+        """Marca os snapshots de todos os processos como desatualizados."""
+        with self._lock:
+            self._snapshot = None
+        try:
+            cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+        except Exception as e:
+            logger.warning(f"Erro ao atualizar versão dos recursos no cache: {e}")
+
+    def invalidate(self):
+        """
+        Recursos alterados: troca a versão agora e de novo após o commit, já que
+        outro processo pode ter recarregado as linhas antigas com a versão nova.
+        """
+        self.bump_version()
+        transaction.on_commit(self.bump_version)
+
+
+# Instância global do snapshot de recursos
+resource_snapshot = ResourceSnapshotStore()
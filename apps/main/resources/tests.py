@@ -0,0 +1,92 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, TestCase
+
+from .middleware import ResourceAccessMiddleware
+from .models import SystemResource
+from .snapshot import VERSION_KEY, ResourceSnapshot, ResourceSnapshotStore, resource_snapshot
+
+
+class ResourceSnapshotTestCase(SimpleTestCase):
+
+    def test_longest_prefix_wins(self):
+        snapshot = ResourceSnapshot('v1', {'shop_checkout': False})
+        self.assertTrue(snapshot.allows('/app/shop/'))
+        self.assertTrue(snapshot.allows('/app/shop/cart/add-item/'))
+        self.assertFalse(snapshot.allows('/app/shop/cart/checkout/'))
+        self.assertFalse(snapshot.allows('/app/shop/cart/checkout/pix/2/'))
+        # Sem a barra final o último segmento não conta: cai no prefixo anterior
+        self.assertTrue(snapshot.allows('/app/shop/cart/checkout'))
+
+        snapshot = ResourceSnapshot('v1', {'shop_cart': False})
+        # '/app/shop/cart/' é mais longo que '/app/shop/' e bloqueia os subcaminhos
+        self.assertFalse(snapshot.allows('/app/shop/cart/qualquer/'))
+        self.assertTrue(snapshot.allows('/app/shop/purchases/'))
+
+    def test_parent_module_gates_children(self):
+        snapshot = ResourceSnapshot('v1', {'games_module': False, 'roulette': True})
+        self.assertFalse(snapshot.allows('/app/game/'))
+        self.assertFalse(snapshot.allows('/app/game/roulette/'))
+        self.assertFalse(snapshot.is_effectively_active('roulette'))
+        self.assertTrue(snapshot.is_active('roulette'))
+
+        snapshot = ResourceSnapshot('v1', {'games_module': True, 'roulette': False})
+        self.assertTrue(snapshot.allows('/app/game/battle-pass/'))
+        self.assertFalse(snapshot.allows('/app/game/roulette/'))
+
+    def test_unmapped_paths_pass_through(self):
+        snapshot = ResourceSnapshot('v1', {name: False for name in ('shop_module', 'wallet_module', 'social_module')})
+        for path in ('/', '/app/dashboard/', '/app/shopping/', '/app/shop', '/api/v1/server/siege/'):
+            self.assertTrue(snapshot.allows(path), path)
+        # Recurso sem linha no banco é considerado ativo
+        self.assertTrue(ResourceSnapshot('v1', {}).allows('/app/wallet/transfer/'))
+
+    def test_version_bump_reloads_snapshot(self):
+        cache.delete(VERSION_KEY)
+        flags = {'wallet_module': True}
+        store = ResourceSnapshotStore(check_interval=0)
+        with mock.patch.object(ResourceSnapshotStore, '_load_flags', side_effect=lambda: dict(flags)) as load:
+            for _ in range(20):
+                self.assertTrue(store.get().allows('/app/wallet/history/'))
+            self.assertEqual(load.call_count, 1)
+
+            # Outro processo altera o recurso e troca a versão no cache
+            flags['wallet_module'] = False
+            ResourceSnapshotStore().bump_version()
+            self.assertFalse(store.get().allows('/app/wallet/history/'))
+            self.assertEqual(load.call_count, 2)
+
+    def test_middleware_uses_snapshot(self):
+        middleware = ResourceAccessMiddleware(lambda request: 'ok')
+        snapshot = ResourceSnapshot('v1', {'auction_create': False})
+        with mock.patch.object(resource_snapshot, 'get', return_value=snapshot), \
+                mock.patch.object(middleware, '_handle_inactive_resource', return_value='404') as inactive:
+            factory = RequestFactory()
+            self.assertEqual(middleware(factory.get('/app/auction/list/')), 'ok')
+            self.assertEqual(middleware(factory.get('/app/auction/create/')), '404')
+        self.assertEqual(inactive.call_count, 1)
+
+
+class ResourceInvalidationTestCase(TestCase):
+
+    def test_save_bumps_version_again_after_commit(self):
+        resource = SystemResource.objects.create(name='roulette', display_name='Roleta', category='games')
+        resource_snapshot.get()
+        with mock.patch.object(resource_snapshot, 'bump_version') as bump, \
+                self.captureOnCommitCallbacks(execute=True):
+            resource.is_active = False
+            resource.save()
+            self.assertEqual(bump.call_count, 1)
+        self.assertEqual(bump.call_count, 2)
+
+    def test_admin_actions_invalidate_snapshot(self):
+        from django.contrib.admin.sites import site
+        SystemResource.objects.create(name='roulette', display_name='Roleta', category='games')
+        self.assertTrue(resource_snapshot.get().allows('/app/game/roulette/'))
+
+        admin = site._registry[SystemResource]
+        with mock.patch.object(admin, 'message_user'), self.captureOnCommitCallbacks(execute=True):
+            admin.deactivate_resources(None, SystemResource.objects.filter(name='roulette'))
+        self.assertFalse(SystemResource.is_resource_active('roulette'))
+        self.assertFalse(resource_snapshot.get().allows('/app/game/roulette/'))
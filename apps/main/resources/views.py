@@ -8,33 +8,12 @@ from django.views.decorators.csrf import csrf_exempt
 import json
 
 from .models import SystemResource
+from .snapshot import HIERARCHY
 
 
 def _get_parent_module(resource_name):
     """Retorna o módulo pai de um recurso"""
-    hierarchy = {
-        'battle_pass': 'games_module',
-        'box_opening': 'games_module', 
-        'roulette': 'games_module',
-        'shop_dashboard': 'shop_module',
-        'shop_items': 'shop_module',
-        'shop_packages': 'shop_module',
-        'shop_cart': 'shop_module',
-        'shop_checkout': 'shop_module',
-        'shop_purchases': 'shop_module',
-        'wallet_dashboard': 'wallet_module',
-        'wallet_transfer': 'wallet_module',
-        'wallet_history': 'wallet_module',
-        'social_feed': 'social_module',
-        'social_profile': 'social_module',
-        'social_search': 'social_module',
-        'auction_list': 'auction_module',
-        'auction_create': 'auction_module',
-        'inventory_dashboard': 'inventory_module',
-        'payment_process': 'payment_module',
-        'payment_history': 'payment_module',
-    }
-    return hierarchy.get(resource_name)
+    return HIERARCHY.get(resource_name)
 
 
 def _is_parent_active(resource_name):
@@ -43,6 +43,13 @@ def get_websocket_urlpatterns():
     except ImportError:
         pass
     
+    # Tenta importar as rotas do status do servidor (jogadores online e rankings)
+    try:
+        from apps.lineage.server.routing import websocket_urlpatterns as server_ws
+        patterns.extend(server_ws)
+    except ImportError:
+        pass
+    
     return patterns
 
 application = ProtocolTypeRouter({
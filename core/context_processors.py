@@ -1,7 +1,4 @@
 from django.conf import settings
-import os
-from django.utils.text import slugify
-from django.templatetags.static import static
 from django.utils.translation import get_language
 
 
@@ -26,56 +23,25 @@ def project_metadata(request):
 
 
 def active_theme(request):
-    from apps.main.administrator.models import Theme
+    from apps.main.administrator.theme_manifest import theme_manifest
 
-    theme = Theme.objects.filter(ativo=True).first()
-    base_template = "layouts/base-default.html"
-    theme_files = {}
-
-    if theme:
-        safe_slug = slugify(theme.slug)
-        theme_path = os.path.join(settings.BASE_DIR, 'themes', 'installed', safe_slug)
-
-        if os.path.isdir(theme_path):
-            theme_files = {
-                f: os.path.join('installed', safe_slug, f)
-                for f in os.listdir(theme_path)
-                if os.path.isfile(os.path.join(theme_path, f))
-            }
-
-        base_template = f"installed/{safe_slug}/base.html"
-    
-    return {
-        'active_theme': safe_slug if theme else None,
-        'base_template': base_template,
-        'theme_slug': safe_slug if theme else None,
-        'path_theme': f'/themes/installed/{safe_slug}' if theme else None,
-        'theme_files': theme_files,
-    }
+    return theme_manifest.get().context
 
 
 def background_setting(request):
-    from apps.main.administrator.models import BackgroundSetting
-
-    bg = BackgroundSetting.get_active()
-    if bg and bg.image:
-        bg_url = bg.image.url
-    else:
-        bg_url = static('assets/img/l2/bgs/bg.png')  # Caminho padrão
+    from apps.main.administrator.theme_manifest import theme_manifest
 
     return {
-        'background_url': bg_url
+        'background_url': theme_manifest.get().background_url
     }
 
 
 def theme_variables(request):
-    from apps.main.administrator.models import ThemeVariable
+    from apps.main.administrator.theme_manifest import theme_manifest
 
     lang_code = get_language()[:2]  # exemplo: 'pt', 'en', 'es'
 
-    variables = ThemeVariable.objects.all()
-    context = {var.nome: var.get_valor_convertido(lang_code) for var in variables}
-    return context
+    return theme_manifest.get().variables_for(lang_code)
 
 
 def slogan_flag(request):
@@ -553,6 +553,26 @@ else:
             'options': {'queue': 'default'},
             'args': (5,),
         },
+        'gravar-verificacoes-licenca-cada-5-minutos': {
+            'task': 'apps.main.licence.tasks.flush_license_verifications',
+            'schedule': crontab(minute='*/5'),
+        },
+        'processar-fila-entregas-cada-minuto': {
+            'task': 'apps.lineage.server.tasks.processar_entregas',
+            'schedule': crontab(minute='*'),
+        },
+        'atualizar-indice-busca-cada-10-minutos': {
+            'task': 'apps.lineage.server.tasks.atualizar_indice_busca',
+            'schedule': crontab(minute='*/10'),
+        },
+        'atualizar-agregado-adena-cada-2-minutos': {
+            'task': 'apps.lineage.server.tasks.atualizar_agregado_adena',
+            'schedule': crontab(minute='*/2'),
+        },
+        'atualizar-rankings-cada-5-minutos': {
+            'task': 'apps.lineage.server.tasks.atualizar_rankings',
+            'schedule': crontab(minute='*/5'),
+        },
     }
 
 CELERY_ACCEPT_CONTENT = ['application/json']
@@ -964,6 +984,9 @@ FAKE_PLAYERS_MAX = int(os.getenv('FAKE_PLAYERS_MAX', 0))
 LICENSE_CONFIG = {
     'ENCRYPTION_KEY': os.environ.get('PDL_ENCRYPTION_KEY', ''),  # Chave Fernet usada no script gerador
     'DNS_TIMEOUT': int(os.environ.get('PDL_DNS_TIMEOUT', '10')),
+    # Snapshot da licença usado nas requisições: tempo no cache e na memória de cada processo (segundos)
+    'SNAPSHOT_REFRESH_INTERVAL': int(os.environ.get('PDL_LICENSE_SNAPSHOT_REFRESH', '60')),
+    'SNAPSHOT_LOCAL_TTL': int(os.environ.get('PDL_LICENSE_SNAPSHOT_LOCAL_TTL', '5')),
 }
 
 # Web Push VAPID keys (gere usando pywebpush ou web-push)
@@ -1,7 +1,7 @@
 import logging
 
-from django_ratelimit.core import is_ratelimited, get_usage
 from django.http import JsonResponse
+from utils.rate_limit import RouteTable, bucket_key, client_identity, default_bucket
 from utils.urls_rate_limits import URL_RATE_LIMITS_DICT
 
 
@@ -11,6 +11,10 @@ logger = logging.getLogger(__name__)
 class RateLimitMiddleware:
     """
     Middleware para aplicar rate limiting em URLs específicas com configurações customizadas.
+
+    As rotas de URL_RATE_LIMITS_DICT são compiladas uma vez (RouteTable) e cada
+    requisição limitada custa uma chamada atômica ao balde de tokens no Redis.
+    Se o Redis estiver indisponível, a requisição passa (fail open).
     """
 
     URL_RATE_LIMITS = URL_RATE_LIMITS_DICT
@@ -21,6 +25,8 @@ class RateLimitMiddleware:
         Recebe get_response, necessário para os middlewares do Django.
         """
         self.get_response = get_response
+        self.routes = RouteTable(self.URL_RATE_LIMITS)
+        self.bucket = default_bucket()
 
     def __call__(self, request):
         """
@@ -34,39 +40,18 @@ class RateLimitMiddleware:
         return self.get_response(request)
 
     def process_request(self, request):
-        logger.debug("Middleware foi chamada para verificar rate limit")
-        
-        for path, config in self.URL_RATE_LIMITS.items():
-            logger.debug(f"Checking path {request.path} against {path}")
-            if request.path.rstrip('/') == path.rstrip('/'):
-
-                method = config.get("method", "GET")
-
-                was_limited = is_ratelimited(
-                    request=request,
-                    group=config["group"],
-                    key=config["key"],
-                    rate=config["rate"],
-                    method=method,
-                    increment=True,
-                )
-
-                if was_limited:
-                    logger.warning(f"Rate limit exceeded for path {path}")
-
-                    usage = get_usage(
-                        request=request,
-                        group=config["group"],
-                        key=config["key"],
-                        rate=config["rate"],
-                        method=method,
-                        increment=False
-                    )
-
-                    reset_time = usage['time_left']
-
-                    return JsonResponse(
-                        {"error": "Rate limit exceeded", "retry_after": reset_time},
-                        status=429
-                    )
-        return None
+        route = self.routes.match(request.path)
+        if route is None or (route.methods is not None and request.method not in route.methods):
+            return None
+
+        decision = self.bucket.hit(bucket_key(route, client_identity(request, route.key)), route)
+        if decision.allowed:
+            return None
+
+        logger.warning(f"Rate limit exceeded for path {route.path or '/'}")
+        response = JsonResponse(
+            {"error": "Rate limit exceeded", "retry_after": decision.retry_after},
+            status=429
+        )
+        response['Retry-After'] = str(decision.retry_after)
+        return response
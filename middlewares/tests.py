@@ -0,0 +1,29 @@
+import json
+
+from django.test import RequestFactory, SimpleTestCase
+
+from middlewares.rate_limit_api_external import RateLimitMiddleware
+from utils.rate_limit import LocalTokenBucket, RouteTable
+
+
+class RateLimitMiddlewareTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.table = RouteTable({
+            '/api/v1/clan/': {'rate': '2/m', 'key': 'ip', 'group': 'game-api'},
+            '/app/wallet/transfer/jogador/': {'rate': '5/m', 'key': 'user_or_ip', 'group': 'wallet', 'method': 'POST'},
+        })
+
+    def test_middleware_returns_429(self):
+        middleware = RateLimitMiddleware(lambda request: None)
+        middleware.routes = self.table
+        middleware.bucket = LocalTokenBucket()
+        factory = RequestFactory()
+        for _ in range(2):
+            self.assertIsNone(middleware.process_request(factory.get('/api/v1/clan/Guardians/')))
+        response = middleware.process_request(factory.get('/api/v1/clan/Outro/'))
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(json.loads(response.content)['retry_after'], int(response['Retry-After']))
+        # GET na transferência não é limitado (só POST)
+        for _ in range(10):
+            self.assertIsNone(middleware.process_request(factory.get('/app/wallet/transfer/jogador/')))
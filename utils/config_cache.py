@@ -0,0 +1,141 @@
+import logging
+import os
+import threading
+import time
+
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+logger = logging.getLogger(__name__)
+
+# Intervalo (segundos) entre as consultas da versão no Redis; dentro dele a leitura é só memória
+CHECK_INTERVAL = float(os.getenv('CONFIG_CACHE_CHECK_INTERVAL', '1'))
+# Validade da cópia no Redis (cada versão tem a sua chave)
+L2_TIMEOUT = int(os.getenv('CONFIG_CACHE_L2_TIMEOUT', '3600'))
+
+KEY_PREFIX = 'config_singleton:'
+
+
+class ConfigSingleton:
+    """
+    Cache de um modelo de configuração (uma linha lida por muitas requisições).
+
+    L1 é a instância na memória do processo; L2 é a cópia no Redis, por
+    versão. A versão é um contador no Redis incrementado a cada post_save /
+    post_delete do modelo (ou dos modelos em `depends_on`), então todos os
+    processos passam a ler a configuração nova em até CHECK_INTERVAL.
+
+    A instância retornada é compartilhada entre as requisições: não altere
+    e não salve; para editar, busque pelo ORM.
+    """
+
+    def __init__(self, model, loader=None, depends_on=(), check_interval=CHECK_INTERVAL):
+        self.model = model
+        self.loader = loader or (lambda: model.objects.first())
+        self.depends_on = tuple(depends_on)
+        self.check_interval = check_interval
+        self.version_key = f"{KEY_PREFIX}{model._meta.label_lower}:versao"
+        self._lock = threading.Lock()
+        # (versão, instância) da L1 e o momento da última consulta da versão
+        self._local = None
+        self._checked_at = 0.0
+
+    def get(self):
+        local = self._local
+        now = time.monotonic()
+        if local is not None and now - self._checked_at < self.check_interval:
+            return local[1]
+
+        version = self._current_version()
+        if local is None or version is None or local[0] != version:
+            local = (version, self._load(version))
+            with self._lock:
+                self._local = local
+        self._checked_at = now
+        return local[1]
+
+    def _current_version(self):
+        try:
+            version = cache.get(self.version_key)
+            if version is None:
+                # Início pelo relógio (ns): se a chave sumir do Redis, a nova versão não repete uma antiga
+                cache.add(self.version_key, time.time_ns(), None)
+                version = cache.get(self.version_key)
+            return version
+        except Exception as e:
+            logger.warning(f"Erro ao ler versão de {self.model._meta.label} no cache: {e}")
+            return None
+
+    def _load(self, version):
+        l2_key = f"{KEY_PREFIX}{self.model._meta.label_lower}:{version}"
+        if version is not None:
+            try:
+                # Guardado dentro de uma tupla: (None,) é "não existe configuração"
+                cached = cache.get(l2_key)
+                if cached is not None:
+                    return cached[0]
+            except Exception as e:
+                logger.warning(f"Erro ao ler {self.model._meta.label} do cache: {e}")
+
+        instance = self.loader()
+        if version is not None:
+            try:
+                cache.set(l2_key, (instance,), L2_TIMEOUT)
+            except Exception as e:
+                logger.warning(f"Erro ao salvar {self.model._meta.label} no cache: {e}")
+        return instance
+
+    def invalidate(self):
+        """Descarta a L1 e incrementa a versão (os outros processos recarregam)."""
+        with self._lock:
+            self._local = None
+        try:
+            cache.add(self.version_key, time.time_ns(), None)
+            cache.incr(self.version_key)
+        except Exception as e:
+            logger.warning(f"Erro ao incrementar versão de {self.model._meta.label}: {e}")
+
+
+# Modelos registrados, por classe
+_configs = {}
+
+
+def _invalidate_receiver(config):
+    def receiver(sender, **kwargs):
+        config.invalidate()
+        # De novo após o commit: um processo pode ter recarregado a linha antiga nesse meio-tempo
+        transaction.on_commit(config.invalidate)
+    return receiver
+
+
+def register_config(model, loader=None, depends_on=()):
+    """
+    Registra um modelo de configuração para `get_config`. Deve ser chamado na
+    importação do app (ex.: no models.py), para que qualquer processo que
+    salve o modelo também incremente a versão.
+
+    `loader` substitui o padrão `model.objects.first()` (ex.: filtro por ativa,
+    prefetch de traduções); `depends_on` lista modelos que também invalidam.
+    """
+    if model in _configs:
+        return _configs[model]
+
+    config = ConfigSingleton(model, loader, depends_on)
+    _configs[model] = config
+    receiver = _invalidate_receiver(config)
+    for sender in (model,) + config.depends_on:
+        uid = f"config_singleton:{model._meta.label_lower}:{sender._meta.label_lower}"
+        post_save.connect(receiver, sender=sender, weak=False, dispatch_uid=uid)
+        post_delete.connect(receiver, sender=sender, weak=False, dispatch_uid=uid)
+    return config
+
+
+def get_config(model):
+    """Instância de configuração do modelo (ou None), lida da memória do processo."""
+    try:
+        config = _configs[model]
+    except KeyError:
+        raise ImproperlyConfigured(f"{model._meta.label} não foi registrado com register_config().")
+    return config.get()
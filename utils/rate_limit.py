@@ -0,0 +1,154 @@
+import logging
+import math
+import re
+import threading
+import time
+from collections import namedtuple
+from typing import Dict, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'ratelimit:'
+
+# Unidades aceitas em "30/m", "5/s", "100/h", "1000/d" (mesmo formato do django-ratelimit)
+_PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+Route = namedtuple('Route', 'path group rate key methods capacity refill_per_ms')
+Decision = namedtuple('Decision', 'allowed remaining retry_after')
+
+ALLOW = Decision(True, None, 0)
+
+
+def parse_rate(rate: str):
+    """'30/m' -> (30, 60); '10/5m' -> (10, 300)."""
+    count, period = rate.split('/')
+    multiplier, unit = re.fullmatch(r'(\d*)([smhd])', period.strip()).groups()
+    return int(count), int(multiplier or 1) * _PERIODS[unit]
+
+
+class RouteTable:
+    """
+    Rotas com limite compiladas em uma única regex. Cada caminho configurado
+    vale para ele mesmo e para os subcaminhos (ex.: '/api/v1/clan/' cobre
+    '/api/v1/clan/<nome>/'); o caminho mais longo vence.
+    """
+
+    def __init__(self, config: Dict[str, dict]):
+        routes = []
+        for path, options in config.items():
+            count, period = parse_rate(options['rate'])
+            method = options.get('method', 'GET')
+            methods = None if method in (None, 'ALL') else frozenset(
+                [method] if isinstance(method, str) else method)
+            capacity = int(options.get('burst', count))
+            routes.append(Route(path.rstrip('/'), options['group'], options['rate'], options['key'], methods,
+                                capacity, count / (period * 1000.0)))
+        # Alternativas mais longas primeiro: '/siege-participants' antes de '/siege'
+        self.routes = sorted(routes, key=lambda route: len(route.path), reverse=True)
+        alternatives = '|'.join(f'(?P<r{index}>{re.escape(route.path)})' for index, route in enumerate(self.routes))
+        self._regex = re.compile(rf'(?:{alternatives})(?:/.*)?\Z' if self.routes else r'(?!)')
+
+    def match(self, path: str) -> Optional[Route]:
+        match = self._regex.match(path)
+        return self.routes[int(match.lastgroup[1:])] if match else None
+
+
+# Balde de tokens: enche `refill` tokens por ms até `capacity`; cada requisição gasta um.
+# O tempo vem do próprio Redis, então todos os workers usam o mesmo relógio.
+TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local refill = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil or ts == nil then
+    tokens = capacity
+    ts = now
+end
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * refill)
+local allowed = 0
+local retry_ms = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    retry_ms = math.ceil((1 - tokens) / refill)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / refill) + 1000)
+return {allowed, math.floor(tokens), retry_ms}
+"""
+
+
+class RedisTokenBucket:
+    """Um EVALSHA por requisição; com o Redis fora do ar, libera (fail open)."""
+
+    def __init__(self, client=None, error_log_interval=60):
+        self._client = client
+        self._script = None
+        self._error_log_interval = error_log_interval
+        self._last_error_log = 0.0
+
+    def _get_script(self):
+        if self._script is None:
+            client = self._client
+            if client is None:
+                from django_redis import get_redis_connection
+                client = get_redis_connection('default')
+            self._script = client.register_script(TOKEN_BUCKET_LUA)
+        return self._script
+
+    def hit(self, key: str, route: Route) -> Decision:
+        try:
+            allowed, remaining, retry_ms = self._get_script()(keys=[key], args=[route.capacity, route.refill_per_ms])
+        except Exception as e:
+            now = time.monotonic()
+            if now - self._last_error_log > self._error_log_interval:
+                self._last_error_log = now
+                logger.warning(f"Rate limit indisponível (Redis), liberando requisições: {e}")
+            return ALLOW
+        return Decision(bool(allowed), int(remaining), math.ceil(int(retry_ms) / 1000))
+
+
+class LocalTokenBucket:
+    """Mesmo algoritmo em memória, por processo (cache sem Redis, ex.: DEBUG com LocMem)."""
+
+    def __init__(self, clock=None):
+        self._clock = clock or (lambda: time.monotonic() * 1000)
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def hit(self, key: str, route: Route) -> Decision:
+        now = self._clock()
+        with self._lock:
+            tokens, ts = self._buckets.get(key, (route.capacity, now))
+            tokens = min(route.capacity, tokens + max(0.0, now - ts) * route.refill_per_ms)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                return Decision(True, int(tokens - 1), 0)
+            self._buckets[key] = (tokens, now)
+        return Decision(False, 0, math.ceil((1 - tokens) / route.refill_per_ms / 1000))
+
+
+def default_bucket():
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    return RedisTokenBucket() if 'redis' in backend.lower() else LocalTokenBucket()
+
+
+def client_identity(request, key: str) -> str:
+    """Identidade do balde: 'ip', ou 'user'/'user_or_ip' (id do usuário; IP para anônimos)."""
+    ip = request.META.get('REMOTE_ADDR', '')
+    if key in ('user', 'user_or_ip'):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return f'u{user.pk}'
+    return f'ip{ip}'
+
+
+def bucket_key(route: Route, identity: str) -> str:
+    # Rotas do mesmo grupo e taxa dividem o balde (como no django-ratelimit)
+    return f'{KEY_PREFIX}{route.group}:{route.rate}:{identity}'
@@ -1,4 +1,3 @@
-import os
 import logging
 from django.conf import settings
 from django.shortcuts import render
@@ -8,7 +7,7 @@ from django.http import HttpResponse
 from django.template.loader import render_to_string
 from django.template import Context
 
-from core.context_processors import active_theme
+from apps.main.administrator.theme_manifest import theme_manifest
 
 # Configure logger
 logger = logging.getLogger(__name__)
@@ -21,18 +20,18 @@ def render_theme_page(request, base_path, template_name, context=None):
     if context is None:
         context = {}
 
-    # Obtem contexto adicional do context processor
-    context_processor_data = active_theme(request)
+    # Manifesto do tema ativo: contexto do tema e templates instalados, sem consultas nem acesso a disco
+    manifest = theme_manifest.get()
+    context_processor_data = manifest.context
 
-    theme_slug = context_processor_data.get('theme_slug', '')
+    theme_slug = manifest.slug
 
     if theme_slug:
-        theme_path = os.path.join(settings.BASE_DIR, 'themes', 'installed', theme_slug)
-        theme_file_path = os.path.join(theme_path, template_name)
+        theme_template = manifest.template_path(template_name)
 
-        if os.path.isfile(theme_file_path):
+        if theme_template:
             try:
-                return render(request, f"installed/{theme_slug}/{template_name}", {**context, **context_processor_data})
+                return render(request, theme_template, {**context, **context_processor_data})
             except (TemplateDoesNotExist, TemplateSyntaxError) as e:
                 # Erro de template (arquivo não encontrado ou sintaxe inválida)
                 logger.error(f"Template error in theme '{theme_slug}': {str(e)}")
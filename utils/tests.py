@@ -0,0 +1,100 @@
+from unittest import mock
+
+from django.core.cache import cache as django_cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models.signals import post_save
+from django.test import SimpleTestCase
+
+from apps.lineage.server.models import ApiEndpointToggle, GameDelivery, IndexConfig, IndexConfigTranslation
+from utils import config_cache
+from utils.config_cache import ConfigSingleton, get_config
+from utils.rate_limit import LocalTokenBucket, RedisTokenBucket, RouteTable
+
+
+class ConfigSingletonTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.loader = mock.Mock(return_value=ApiEndpointToggle(pk=1, players_online=False))
+        self.config = ConfigSingleton(ApiEndpointToggle, loader=self.loader, check_interval=60)
+        django_cache.delete(self.config.version_key)
+
+    def test_reads_come_from_memory_until_the_version_changes(self):
+        for _ in range(100):
+            self.assertFalse(self.config.get().players_online)
+        self.assertEqual(self.loader.call_count, 1)
+
+        # Outro processo com a mesma versão lê a cópia do Redis, não o banco
+        other = ConfigSingleton(ApiEndpointToggle, loader=self.loader, check_interval=0)
+        self.assertFalse(other.get().players_online)
+        self.assertEqual(self.loader.call_count, 1)
+
+        # Alteração salva em outro processo: a versão muda no Redis
+        self.loader.return_value = ApiEndpointToggle(pk=1, players_online=True)
+        other.invalidate()
+        self.assertTrue(other.get().players_online)
+        self.assertFalse(self.config.get().players_online)  # ainda dentro do intervalo
+        self.config._checked_at = 0.0
+        self.assertTrue(self.config.get().players_online)
+        self.assertEqual(self.loader.call_count, 2)
+
+    def test_missing_config_is_cached(self):
+        self.loader.return_value = None
+        self.assertIsNone(self.config.get())
+        other = ConfigSingleton(ApiEndpointToggle, loader=self.loader)
+        self.assertIsNone(other.get())
+        self.assertEqual(self.loader.call_count, 1)
+
+    def test_registered_models_are_invalidated_by_signals(self):
+        config = config_cache._configs[IndexConfig]
+        with mock.patch.object(config, "invalidate") as invalidate, \
+                mock.patch.object(config_cache.transaction, "on_commit") as on_commit:
+            post_save.send(sender=IndexConfigTranslation, instance=None, created=False)
+        invalidate.assert_called_once_with()
+        # Repetida após o commit da transação que salvou a tradução
+        on_commit.assert_called_once_with(invalidate)
+        with self.assertRaises(ImproperlyConfigured):
+            get_config(GameDelivery)
+
+
+class RateLimitTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.table = RouteTable({
+            '/api/v1/server/siege/': {'rate': '30/m', 'key': 'ip', 'group': 'public-api'},
+            '/api/v1/server/siege-participants/': {'rate': '30/m', 'key': 'ip', 'group': 'public-api'},
+            '/api/v1/clan/': {'rate': '2/m', 'key': 'ip', 'group': 'game-api'},
+            '/app/wallet/transfer/jogador/': {'rate': '5/m', 'key': 'user_or_ip', 'group': 'wallet', 'method': 'POST'},
+        })
+
+    def test_routes_are_compiled_once(self):
+        self.assertEqual(self.table.match('/api/v1/server/siege').path, '/api/v1/server/siege')
+        self.assertEqual(self.table.match('/api/v1/server/siege-participants/').path,
+                         '/api/v1/server/siege-participants')
+        self.assertEqual(self.table.match('/api/v1/clan/Guardians/').group, 'game-api')
+        self.assertIsNone(self.table.match('/api/v1/clans/'))
+        self.assertIsNone(self.table.match('/app/dashboard/'))
+        self.assertEqual(self.table.match('/app/wallet/transfer/jogador/').methods, frozenset(['POST']))
+
+    def test_token_bucket_allows_burst_then_refills(self):
+        now = [0.0]
+        bucket = LocalTokenBucket(clock=lambda: now[0])
+        route = self.table.match('/api/v1/clan/')
+        self.assertTrue(bucket.hit('k', route).allowed)
+        self.assertTrue(bucket.hit('k', route).allowed)
+        denied = bucket.hit('k', route)
+        self.assertFalse(denied.allowed)
+        self.assertEqual(denied.retry_after, 30)
+        now[0] = 30000.0  # 2/m: um token a cada 30 s
+        self.assertTrue(bucket.hit('k', route).allowed)
+        self.assertFalse(bucket.hit('k', route).allowed)
+
+    def test_redis_bucket_uses_one_script_call_and_fails_open(self):
+        route = self.table.match('/api/v1/clan/')
+        client = mock.Mock()
+        client.register_script.return_value.return_value = [0, 0, 1500]
+        decision = RedisTokenBucket(client).hit('k', route)
+        self.assertEqual((decision.allowed, decision.retry_after), (False, 2))
+        client.register_script.return_value.assert_called_once_with(keys=['k'], args=[2, route.refill_per_ms])
+
+        client.register_script.return_value.side_effect = ConnectionError("redis fora do ar")
+        self.assertTrue(RedisTokenBucket(client).hit('k', route).allowed)
@@ -1,3 +1,6 @@
+# Caminho -> limite. O caminho cobre também os subcaminhos (o mais longo vence).
+# rate: "N/periodo" (s, m, h, d); key: 'ip', 'user' ou 'user_or_ip';
+# method: método limitado (padrão 'GET'; 'ALL' para todos); burst: tamanho do balde (padrão N).
 URL_RATE_LIMITS_DICT = {
     # APIs DRF (versão atual)
     '/api/v1/server/players-online/':                 {'rate': '30/m', 'key': 'ip', 'group': 'public-api'},
@@ -43,6 +46,6 @@ URL_RATE_LIMITS_DICT = {
     '/api/v1/cache/stats/':                           {'rate': '10/m', 'key': 'user', 'group': 'monitoring-api'},
 
     # Outras APIs
-    '/app/wallet/transfer/servidor/': {'rate': '5/m', 'key': 'user_or_ip', 'group': 'wallet-transfers'},
-    '/app/wallet/transfer/jogador/':  {'rate': '5/m', 'key': 'user_or_ip', 'group': 'wallet-transfers'},
+    '/app/wallet/transfer/servidor/': {'rate': '5/m', 'key': 'user_or_ip', 'group': 'wallet-transfers', 'method': 'POST'},
+    '/app/wallet/transfer/jogador/':  {'rate': '5/m', 'key': 'user_or_ip', 'group': 'wallet-transfers', 'method': 'POST'},
 }
@@ -0,0 +1,77 @@
+"""
+Whirlpool em Python puro, otimizado para hashes de senha.
+
+Usa as mesmas tabelas de `Whirlpool2003` (T0..T7 e constantes de rodada),
+mas com as rodadas desenroladas sobre inteiros locais (sem listas e sem
+`% 8` por consulta) e com o key schedule do primeiro bloco pré-calculado:
+com o estado inicial zerado as chaves das 10 rodadas são sempre as mesmas,
+e uma senha curta cabe num único bloco.
+"""
+import struct
+
+from utils.Whirlpool2003 import Whirlpool2003
+
+Whirlpool2003._init_tables()
+
+_BLOCK = struct.Struct(">8Q")
+_T = tuple(tuple(getattr(Whirlpool2003, f"T{i}")) for i in range(8))
+_RC = tuple(Whirlpool2003.rc)
+
+
+def _round(a, k, T0=_T[0], T1=_T[1], T2=_T[2], T3=_T[3], T4=_T[4], T5=_T[5], T6=_T[6], T7=_T[7]):
+    # Uma rodada (SubBytes, ShiftColumns, MixRows e a chave `k`) sobre as 8 palavras de 64 bits
+    a0, a1, a2, a3, a4, a5, a6, a7 = a
+    return (
+        T0[a0 >> 56] ^ T1[(a7 >> 48) & 0xFF] ^ T2[(a6 >> 40) & 0xFF] ^ T3[(a5 >> 32) & 0xFF] ^
+        T4[(a4 >> 24) & 0xFF] ^ T5[(a3 >> 16) & 0xFF] ^ T6[(a2 >> 8) & 0xFF] ^ T7[a1 & 0xFF] ^ k[0],
+        T0[a1 >> 56] ^ T1[(a0 >> 48) & 0xFF] ^ T2[(a7 >> 40) & 0xFF] ^ T3[(a6 >> 32) & 0xFF] ^
+        T4[(a5 >> 24) & 0xFF] ^ T5[(a4 >> 16) & 0xFF] ^ T6[(a3 >> 8) & 0xFF] ^ T7[a2 & 0xFF] ^ k[1],
+        T0[a2 >> 56] ^ T1[(a1 >> 48) & 0xFF] ^ T2[(a0 >> 40) & 0xFF] ^ T3[(a7 >> 32) & 0xFF] ^
+        T4[(a6 >> 24) & 0xFF] ^ T5[(a5 >> 16) & 0xFF] ^ T6[(a4 >> 8) & 0xFF] ^ T7[a3 & 0xFF] ^ k[2],
+        T0[a3 >> 56] ^ T1[(a2 >> 48) & 0xFF] ^ T2[(a1 >> 40) & 0xFF] ^ T3[(a0 >> 32) & 0xFF] ^
+        T4[(a7 >> 24) & 0xFF] ^ T5[(a6 >> 16) & 0xFF] ^ T6[(a5 >> 8) & 0xFF] ^ T7[a4 & 0xFF] ^ k[3],
+        T0[a4 >> 56] ^ T1[(a3 >> 48) & 0xFF] ^ T2[(a2 >> 40) & 0xFF] ^ T3[(a1 >> 32) & 0xFF] ^
+        T4[(a0 >> 24) & 0xFF] ^ T5[(a7 >> 16) & 0xFF] ^ T6[(a6 >> 8) & 0xFF] ^ T7[a5 & 0xFF] ^ k[4],
+        T0[a5 >> 56] ^ T1[(a4 >> 48) & 0xFF] ^ T2[(a3 >> 40) & 0xFF] ^ T3[(a2 >> 32) & 0xFF] ^
+        T4[(a1 >> 24) & 0xFF] ^ T5[(a0 >> 16) & 0xFF] ^ T6[(a7 >> 8) & 0xFF] ^ T7[a6 & 0xFF] ^ k[5],
+        T0[a6 >> 56] ^ T1[(a5 >> 48) & 0xFF] ^ T2[(a4 >> 40) & 0xFF] ^ T3[(a3 >> 32) & 0xFF] ^
+        T4[(a2 >> 24) & 0xFF] ^ T5[(a1 >> 16) & 0xFF] ^ T6[(a0 >> 8) & 0xFF] ^ T7[a7 & 0xFF] ^ k[6],
+        T0[a7 >> 56] ^ T1[(a6 >> 48) & 0xFF] ^ T2[(a5 >> 40) & 0xFF] ^ T3[(a4 >> 32) & 0xFF] ^
+        T4[(a3 >> 24) & 0xFF] ^ T5[(a2 >> 16) & 0xFF] ^ T6[(a1 >> 8) & 0xFF] ^ T7[a0 & 0xFF] ^ k[7],
+    )
+
+
+def _key_schedule(h):
+    keys = []
+    k = h
+    for rc in _RC:
+        k = _round(k, (rc, 0, 0, 0, 0, 0, 0, 0))
+        keys.append(k)
+    return keys
+
+
+# Chaves das rodadas para o estado inicial (zero): valem para todo primeiro bloco
+_ZERO_KEYS = _key_schedule((0,) * 8)
+
+
+def _compress(h, block, keys=None):
+    n = _BLOCK.unpack(block)
+    keys = keys or _key_schedule(h)
+    s = tuple(x ^ y for x, y in zip(n, h))
+    for k in keys:
+        s = _round(s, k)
+    # Miyaguchi-Preneel
+    return tuple(a ^ b ^ c for a, b, c in zip(h, s, n))
+
+
+def whirlpool_digest(data: bytes) -> bytes:
+    """Digest Whirlpool (64 bytes) de `data`, igual ao de `Whirlpool2003`."""
+    length = len(data)
+    # 0x80, zeros e o tamanho em bits em 256 bits, completando múltiplo de 64 bytes
+    padding = 33 + (-(length + 33)) % 64
+    message = data + b"\x80" + bytes(padding - 9) + (length * 8).to_bytes(8, "big")
+
+    h = _compress((0,) * 8, message[:64], _ZERO_KEYS)
+    for offset in range(64, len(message), 64):
+        h = _compress(h, message[offset:offset + 64])
+    return _BLOCK.pack(*h)